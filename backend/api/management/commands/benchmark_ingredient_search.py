@@ -0,0 +1,109 @@
+import csv
+import os
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.v1.ingredient_search import IngredientIndex
+
+csv_path = os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv')
+
+
+def read_ingredients():
+    with open(csv_path, encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        next(reader)
+        return [
+            (number, name, unit)
+            for number, (name, unit) in enumerate(reader, start=1)
+        ]
+
+
+def synthetic_ingredients(base, rows, rng):
+    """
+    Названия из случайных слов каталога с уникальным номером.
+    """
+    words = sorted({word for _, name, _ in base for word in name.split()})
+    units = sorted({unit for _, _, unit in base})
+    return [
+        (
+            number,
+            f'{" ".join(rng.sample(words, rng.randint(1, 3)))} {number}',
+            rng.choice(units),
+        )
+        for number in range(1, rows + 1)
+    ]
+
+
+def make_typo(text, rng):
+    if len(text) < 4:
+        return text
+    position = rng.randrange(1, len(text) - 2)
+    return (
+        text[:position] + text[position + 1] + text[position]
+        + text[position + 2:]
+    )
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+class Command(BaseCommand):
+    """
+    Замеряет построение и поиск по индексу ингредиентов в памяти
+    на каталоге из data/ingredients.csv и на синтетическом каталоге.
+    """
+    help = 'Замер скорости поиска ингредиентов по индексу в памяти.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            default=0,
+            help='Размер синтетического каталога (по умолчанию csv).',
+        )
+        parser.add_argument('--queries', type=int, default=1000)
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        ingredients = read_ingredients()
+        if options['rows']:
+            ingredients = synthetic_ingredients(
+                ingredients, options['rows'], rng
+            )
+        started = time.perf_counter()
+        index = IngredientIndex(ingredients)
+        build_time = time.perf_counter() - started
+        self.stdout.write(
+            f'Строк: {len(index)}, построение индекса: {build_time:.2f} с'
+        )
+        names = [name.lower() for _, name, _ in ingredients]
+        query_kinds = {
+            'prefix': lambda name: name[:3],
+            'substring': lambda name: name[len(name) // 3:][:4],
+            'typo': lambda name: make_typo(name.split()[0], rng),
+        }
+        for kind, make_query in query_kinds.items():
+            timings = []
+            for _ in range(options['queries']):
+                query = make_query(rng.choice(names))
+                started = time.perf_counter()
+                index.search(
+                    query,
+                    options['limit'],
+                    settings.INGREDIENT_SEARCH_SIMILARITY,
+                )
+                timings.append((time.perf_counter() - started) * 1000)
+            self.stdout.write(
+                f'{kind:>9}: '
+                f'p50 {statistics.median(timings):.3f} мс, '
+                f'p95 {percentile(timings, 95):.3f} мс, '
+                f'p99 {percentile(timings, 99):.3f} мс'
+            )
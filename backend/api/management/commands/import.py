@@ -1,9 +1,15 @@
 import csv
+import json
 import os
+import time
+from contextlib import nullcontext
+from itertools import islice
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
+from api.v1.cache import invalidate
 from recipe.models import Ingredient, Tag
 
 csv_path = os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv')
@@ -14,33 +20,205 @@ tags = {
     'Ужин': ('#800080', 'dinner')
 }
 
+CSV_HEADER = ['name', 'measurement_unit']
+JSON_READ_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    reader = csv.reader(file)
+    for row in reader:
+        if reader.line_num == 1 and row == CSV_HEADER:
+            continue
+        yield row
+
+
+def read_json(file):
+    """
+    Потоково читает JSON-массив или JSON Lines,
+    разбирая объекты по мере чтения файла.
+    Строка - объект с полями name и measurement_unit
+    или массив [name, measurement_unit].
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(JSON_READ_SIZE).lstrip()
+    eof = not buffer
+    is_array = buffer[:1] == '[' and buffer[1:].lstrip()[:1] in '[{]'
+    if is_array:
+        buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip()
+        if is_array:
+            buffer = buffer.lstrip(',').lstrip()
+        if (is_array and buffer.startswith(']')) or (eof and not buffer):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = file.read(JSON_READ_SIZE)
+            eof = not chunk
+            buffer += chunk
+            continue
+        buffer = buffer[end:]
+        if isinstance(item, dict):
+            yield [item.get('name'), item.get('measurement_unit')]
+        else:
+            yield item
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
 
 class Command(BaseCommand):
     """
-    Импортирует данные моделей из .csv файлов.
+    Импортирует данные моделей из .csv и .json файлов.
+
+    Ингредиенты читаются потоково пачками по --batch-size строк,
+    поэтому память не зависит от размера каталога. Каждая пачка
+    фиксируется своей транзакцией, чтобы импорт не держал одну
+    транзакцию и блокировки на все время загрузки, и только --dry-run
+    выполняется в одной транзакции, которая откатывается. Повторный
+    импорт не создает дублей: уже существующие записи пропускаются
+    по ограничению ingredients_unique_constraint, поэтому прерванный
+    импорт можно просто запустить снова.
     """
+    help = 'Импортирует тэги и ингредиенты.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=csv_path,
+            help='Файл с ингредиентами (по умолчанию data/ingredients.csv).',
+        )
+        parser.add_argument(
+            '--format',
+            choices=READERS,
+            help='Формат файла, по умолчанию определяется по расширению.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Кол-во строк, записываемых за один запрос.',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Показать, какие записи будут созданы, ничего не меняя.',
+        )
+
     def handle(self, *args, **options):
-        for name, (color, slug) in tags.items():
-            Tag.objects.get_or_create(
-                name=name,
-                color=color,
-                slug=slug,
-            )
-        self.stdout.write(
-            self.style.SUCCESS('Записи тэгов созданы.')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        file_format = options['format'] or (
+            'json'
+            if os.path.splitext(options['path'])[1] in ('.json', '.jsonl')
+            else 'csv'
         )
+        self.dry_run = options['dry_run']
         try:
-            with open(csv_path, encoding='utf-8', newline='') as f:
-                reader = csv.reader(f)
-                for name, unit in reader:
-                    Ingredient.objects.get_or_create(
-                        name=name,
-                        measurement_unit=unit,
-                    )
-                self.stdout.write(
-                    self.style.SUCCESS('Записи ингридиентов созданы.')
+            with transaction.atomic() if self.dry_run else nullcontext():
+                self.import_tags()
+                self.import_ingredients(
+                    options['path'],
+                    READERS[file_format],
+                    options['batch_size'],
                 )
+                if self.dry_run:
+                    transaction.set_rollback(True)
         except FileNotFoundError:
-            return 'Файл не найден.'
-        except csv.Error as err:
-            return f'Ошибка чтения CSV: {err}'
+            raise CommandError('Файл не найден.')
+        except (csv.Error, json.JSONDecodeError, ValueError) as err:
+            raise CommandError(f'Ошибка чтения {file_format}: {err}')
+        finally:
+            if not self.dry_run:
+                invalidate('tags', 'ingredients')
+
+    @transaction.atomic
+    def import_tags(self):
+        existing = set(
+            Tag.objects.filter(
+                slug__in=[slug for _, slug in tags.values()]
+            ).values_list('slug', flat=True)
+        )
+        new_tags = [
+            Tag(name=name, color=color, slug=slug)
+            for name, (color, slug) in tags.items()
+            if slug not in existing
+        ]
+        Tag.objects.bulk_create(new_tags, ignore_conflicts=True)
+        for tag in new_tags:
+            self.report_new('Тэг', tag.name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Записи тэгов созданы: {len(new_tags)}.'
+        ))
+
+    def import_ingredients(self, path, reader, batch_size):
+        started = time.perf_counter()
+        read = created = 0
+        with open(path, encoding='utf-8', newline='') as f:
+            rows = reader(f)
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                with transaction.atomic():
+                    created += self.import_batch(batch, read + 1)
+                read += len(batch)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'Прочитано {read}, создано {created}, '
+                    f'{read / elapsed:.0f} строк/с'
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f'Записи ингридиентов созданы: {created} из {read} строк '
+            f'за {time.perf_counter() - started:.2f} с.'
+        ))
+
+    def import_batch(self, batch, first_row):
+        """
+        Записывает пачку одним запросом, пропуская дубли
+        внутри пачки и уже существующие ингредиенты.
+        first_row - номер первой строки пачки в файле для ошибок.
+        """
+        unique = {}
+        for number, row in enumerate(batch, first_row):
+            if not (
+                isinstance(row, list)
+                and len(row) == 2
+                and all(isinstance(value, str) and value for value in row)
+            ):
+                raise ValueError(f'некорректная строка {number}: {row!r}')
+            name, unit = (value.strip() for value in row)
+            unique[(name, unit)] = Ingredient(
+                name=name,
+                measurement_unit=unit,
+            )
+        existing = set(
+            Ingredient.objects.filter(
+                name__in={name for name, _ in unique}
+            ).values_list('name', 'measurement_unit')
+        )
+        new_ingredients = [
+            ingredient for key, ingredient in unique.items()
+            if key not in existing
+        ]
+        Ingredient.objects.bulk_create(
+            new_ingredients,
+            ignore_conflicts=True,
+        )
+        for ingredient in new_ingredients:
+            self.report_new(
+                'Ингредиент',
+                f'{ingredient.name}, {ingredient.measurement_unit}',
+            )
+        return len(new_ingredients)
+
+    def report_new(self, kind, description):
+        if self.dry_run:
+            self.stdout.write(f'+ {kind}: {description}')
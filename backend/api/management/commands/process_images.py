@@ -0,0 +1,80 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from recipe.images import cleanup_variants, get_queue, process_recipe_image
+from recipe.models import Recipe
+
+
+class Command(BaseCommand):
+    """
+    Обработчик очереди картинок рецептов: удаляет EXIF из оригинала,
+    считает хеш содержимого и создает уменьшенные копии в WebP и JPEG.
+    """
+    help = 'Разбирает очередь картинок рецептов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Завершиться, когда очередь опустеет.',
+        )
+        parser.add_argument(
+            '--timeout',
+            type=int,
+            default=5,
+            help='Сколько секунд ждать новую задачу.',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Обработать картинки всех рецептов без копий и выйти.',
+        )
+        parser.add_argument(
+            '--cleanup',
+            action='store_true',
+            help='Удалить копии, на которые не ссылается ни один рецепт, '
+                 'и выйти.',
+        )
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            removed = cleanup_variants(settings.IMAGE_VARIANTS_CLEANUP_AGE)
+            self.stdout.write(f'Удалено наборов копий: {removed}')
+            return
+        if options['all']:
+            recipe_ids = Recipe.objects.exclude(image='').exclude(
+                image__isnull=True,
+            ).filter(image_hash='').values_list('pk', flat=True)
+            for recipe_id in recipe_ids.iterator():
+                self.process(recipe_id)
+            return
+        queue = get_queue()
+        if not queue.is_worker_queue:
+            raise CommandError(
+                f'IMAGE_QUEUE_BACKEND={settings.IMAGE_QUEUE_BACKEND} '
+                f'обрабатывает картинки сразу в запросе, очереди нет. '
+                f'Задайте IMAGE_QUEUE_BACKEND=redis.'
+            )
+        while True:
+            recipe_id = queue.pop(options['timeout'])
+            if recipe_id is None:
+                if options['burst']:
+                    return
+                continue
+            self.process(recipe_id)
+
+    def process(self, recipe_id):
+        close_old_connections()
+        started = time.perf_counter()
+        try:
+            process_recipe_image(recipe_id)
+        except Exception as error:
+            self.stderr.write(f'recipe={recipe_id}: {error!r}')
+            return
+        self.stdout.write(
+            f'recipe={recipe_id}: '
+            f'{(time.perf_counter() - started) * 1000:.0f} мс'
+        )
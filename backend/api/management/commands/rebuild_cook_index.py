@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipe.cook_index import live_postings, pack
+from recipe.models import IngredientPosting
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    """
+    Пересобирает индекс ингредиент -> рецепты для поиска
+    рецептов по ингредиентам в наличии или сверяет его с рецептами.
+    """
+    help = 'Пересобирает или проверяет индекс рецептов по ингредиентам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сверить индекс, ничего не меняя.',
+        )
+
+    def handle(self, *args, **options):
+        postings = live_postings()
+        if options['verify']:
+            return self.verify(postings)
+        with transaction.atomic():
+            IngredientPosting.objects.all().delete()
+            IngredientPosting.objects.bulk_create(
+                (
+                    IngredientPosting(
+                        ingredient_id=ingredient_id,
+                        block=block,
+                        recipes=pack(offsets),
+                        sizes=pack(sizes),
+                    )
+                    for (ingredient_id, block), (offsets, sizes)
+                    in postings.items()
+                ),
+                batch_size=BATCH_SIZE,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс пересобран: {len(postings)} блоков.'
+        ))
+
+    def verify(self, postings):
+        stored = {
+            (ingredient_id, block): (bytes(recipes), bytes(sizes))
+            for ingredient_id, block, recipes, sizes
+            in IngredientPosting.objects.values_list(
+                'ingredient_id', 'block', 'recipes', 'sizes',
+            ).iterator()
+        }
+        mismatches = 0
+        for key in sorted({*postings, *stored}):
+            live = postings.get(key)
+            if live is not None:
+                live = (pack(live[0]), pack(live[1]))
+            if live != stored.get(key):
+                mismatches += 1
+                self.stdout.write(
+                    f'ingredient={key[0]} block={key[1]}: '
+                    f'блок расходится с рецептами'
+                )
+        if mismatches:
+            raise CommandError(
+                f'Найдено расхождений: {mismatches}. '
+                f'Запустите команду без --verify, чтобы пересобрать индекс.'
+            )
+        self.stdout.write(self.style.SUCCESS('Индекс актуален.'))
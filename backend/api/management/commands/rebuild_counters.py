@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+
+from foodgram.counters import live_count
+from recipe.models import FavoriteRecipe, Recipe, ShoppingCart
+from users.models import Follow, User
+
+COUNTERS = (
+    (Recipe, 'favorites_count', FavoriteRecipe, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'author'),
+)
+
+
+def drifted(model, field, related_model, related_field):
+    """
+    Строки, у которых счетчик расходится с реальным кол-вом.
+    """
+    return model.objects.annotate(
+        live=live_count(related_model, related_field),
+    ).exclude(
+        **{field: F('live')}
+    ).values_list('pk', field, 'live').order_by('pk')
+
+
+class Command(BaseCommand):
+    """
+    Сверяет денормализованные счетчики рецептов и пользователей
+    с реальным кол-вом строк и исправляет расхождения.
+    """
+    help = (
+        'Пересчитывает или проверяет счетчики избранного, корзин, '
+        'рецептов и подписчиков.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сверить счетчики, ничего не меняя.',
+        )
+
+    def handle(self, *args, **options):
+        mismatches = 0
+        with transaction.atomic():
+            for model, field, related_model, related_field in COUNTERS:
+                rows = drifted(model, field, related_model, related_field)
+                for pk, stored, live in rows.iterator():
+                    mismatches += 1
+                    self.stdout.write(
+                        f'{model._meta.model_name}={pk} {field}: '
+                        f'ожидалось {live}, сохранено {stored}'
+                    )
+                if not options['verify']:
+                    model.objects.filter(
+                        pk__in=rows.values('pk')
+                    ).update(
+                        **{field: live_count(related_model, related_field)}
+                    )
+        if options['verify'] and mismatches:
+            raise CommandError(
+                f'Найдено расхождений: {mismatches}. '
+                f'Запустите команду без --verify, чтобы исправить счетчики.'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Счетчики актуальны.' if options['verify']
+            else f'Исправлено расхождений: {mismatches}.'
+        ))
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipe.feed import live_entries
+from recipe.models import TimelineEntry
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    """
+    Пересобирает ленты подписок или сверяет их с подписками.
+    Нужна после импорта данных мимо сигналов и после того,
+    как авторы перешли пороги FEED_FANOUT_MAX_FOLLOWERS
+    и FEED_FANOUT_MAX_RECIPES в любую сторону.
+    """
+    help = 'Пересобирает или проверяет ленты подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сверить ленты, ничего не меняя.',
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            return self.verify()
+        with transaction.atomic():
+            TimelineEntry.objects.all().delete()
+            entries = TimelineEntry.objects.bulk_create(
+                (
+                    TimelineEntry(
+                        user_id=user_id,
+                        recipe_id=recipe_id,
+                        author_id=author_id,
+                        pub_date=pub_date,
+                    )
+                    for user_id, recipe_id, author_id, pub_date
+                    in live_entries()
+                ),
+                batch_size=BATCH_SIZE,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Ленты пересобраны: {len(entries)} записей.'
+        ))
+
+    def verify(self):
+        live = {
+            (user_id, recipe_id)
+            for user_id, recipe_id, _, _ in live_entries()
+        }
+        stored = set(TimelineEntry.objects.values_list(
+            'user_id', 'recipe_id',
+        ).iterator())
+        mismatches = 0
+        for user_id, recipe_id in sorted(live - stored):
+            mismatches += 1
+            self.stdout.write(
+                f'user={user_id} recipe={recipe_id}: нет в ленте'
+            )
+        for user_id, recipe_id in sorted(stored - live):
+            mismatches += 1
+            self.stdout.write(
+                f'user={user_id} recipe={recipe_id}: лишняя запись'
+            )
+        if mismatches:
+            raise CommandError(
+                f'Найдено расхождений: {mismatches}. '
+                f'Запустите команду без --verify, чтобы пересобрать ленты.'
+            )
+        self.stdout.write(self.style.SUCCESS('Ленты актуальны.'))
@@ -0,0 +1,113 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from recipe.models import IngredientQuantity, ShoppingListItem
+
+BATCH_SIZE = 1000
+
+
+def live_totals():
+    """
+    Суммы ингредиентов корзин, посчитанные по рецептам.
+    """
+    return IngredientQuantity.objects.filter(
+        recipe__shopping_cart__isnull=False,
+    ).values_list(
+        'recipe__shopping_cart__user_id',
+        'ingredient_id',
+    ).annotate(
+        total_amount=Sum('amount'),
+    ).order_by(
+        'recipe__shopping_cart__user_id',
+        'ingredient_id',
+    )
+
+
+def stored_totals():
+    return ShoppingListItem.objects.values_list(
+        'user_id',
+        'ingredient_id',
+        'total_amount',
+    ).order_by(
+        'user_id',
+        'ingredient_id',
+    )
+
+
+def diff_totals(live, stored):
+    """
+    Сравнивает две упорядоченные по (user_id, ingredient_id)
+    последовательности слиянием, не загружая их в память.
+    Возвращает (user_id, ingredient_id, live_amount, stored_amount)
+    для расходящихся строк.
+    """
+    live, stored = iter(live), iter(stored)
+    live_row, stored_row = next(live, None), next(stored, None)
+    while live_row or stored_row:
+        live_key = live_row[:2] if live_row else None
+        stored_key = stored_row[:2] if stored_row else None
+        if stored_key is None or (live_key and live_key < stored_key):
+            yield (*live_key, live_row[2], None)
+            live_row = next(live, None)
+        elif live_key is None or stored_key < live_key:
+            yield (*stored_key, None, stored_row[2])
+            stored_row = next(stored, None)
+        else:
+            if live_row[2] != stored_row[2]:
+                yield (*live_key, live_row[2], stored_row[2])
+            live_row, stored_row = next(live, None), next(stored, None)
+
+
+class Command(BaseCommand):
+    """
+    Пересобирает материализованные списки покупок
+    или сверяет их с суммами по корзинам.
+    """
+    help = 'Пересобирает или проверяет списки покупок пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сверить списки покупок, ничего не меняя.',
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            return self.verify()
+        with transaction.atomic():
+            ShoppingListItem.objects.all().delete()
+            batch = []
+            for user_id, ingredient_id, total_amount in live_totals():
+                batch.append(ShoppingListItem(
+                    user_id=user_id,
+                    ingredient_id=ingredient_id,
+                    total_amount=total_amount,
+                ))
+                if len(batch) == BATCH_SIZE:
+                    ShoppingListItem.objects.bulk_create(batch)
+                    batch = []
+            ShoppingListItem.objects.bulk_create(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересобраны: '
+            f'{ShoppingListItem.objects.count()} записей.'
+        ))
+
+    def verify(self):
+        mismatches = 0
+        for user_id, ingredient_id, live, stored in diff_totals(
+            live_totals().iterator(),
+            stored_totals().iterator(),
+        ):
+            mismatches += 1
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'ожидалось {live}, сохранено {stored}'
+            )
+        if mismatches:
+            raise CommandError(
+                f'Найдено расхождений: {mismatches}. '
+                f'Запустите команду без --verify, чтобы пересобрать списки.'
+            )
+        self.stdout.write(self.style.SUCCESS('Списки покупок актуальны.'))
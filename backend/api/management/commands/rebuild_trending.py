@@ -0,0 +1,73 @@
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from recipe.models import FavoriteRecipe, Recipe, ShoppingCart
+
+BATCH_SIZE = 1000
+ACTIVITY_MODELS = (FavoriteRecipe, ShoppingCart)
+
+
+def trending_scores(now, window, half_life):
+    """
+    Сумма добавлений рецепта в избранное и корзины за окно,
+    где каждое добавление весит 0.5 ** (возраст / период полураспада).
+    """
+    scores = defaultdict(float)
+    decay = math.log(2) / half_life.total_seconds()
+    for model in ACTIVITY_MODELS:
+        activity = model.objects.filter(
+            created_at__gte=now - window,
+        ).values_list('recipe_id', 'created_at').order_by()
+        for recipe_id, created_at in activity.iterator():
+            age = max((now - created_at).total_seconds(), 0)
+            scores[recipe_id] += math.exp(-decay * age)
+    return scores
+
+
+class Command(BaseCommand):
+    """
+    Пересчитывает Recipe.trending_score для ?ordering=trending.
+    Запускается периодически, например из cron раз в 10-15 минут.
+    """
+    help = 'Пересчитывает рейтинг популярности рецептов за последние дни.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--window-days',
+            type=int,
+            default=settings.TRENDING_WINDOW_DAYS,
+        )
+        parser.add_argument(
+            '--half-life-hours',
+            type=float,
+            default=settings.TRENDING_HALF_LIFE_HOURS,
+        )
+
+    def handle(self, *args, **options):
+        scores = trending_scores(
+            timezone.now(),
+            timedelta(days=options['window_days']),
+            timedelta(hours=options['half_life_hours']),
+        )
+        with transaction.atomic():
+            Recipe.objects.filter(
+                trending_score__gt=0,
+            ).update(trending_score=0)
+            recipes = [
+                Recipe(pk=recipe_id, trending_score=score)
+                for recipe_id, score in scores.items()
+            ]
+            Recipe.objects.bulk_update(
+                recipes,
+                ('trending_score',),
+                batch_size=BATCH_SIZE,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Рейтинг пересчитан для {len(scores)} рецептов.'
+        ))
@@ -0,0 +1,50 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from api.metrics import report, reset
+
+COLUMNS = ('queries', 'db_ms', 'encode_ms', 'total_ms', 'size_bytes')
+
+
+class Command(BaseCommand):
+    """
+    Выводит гистограммы, собранные RequestMetricsMiddleware.
+    """
+    help = 'Показывает кол-во запросов и время по эндпоинтам API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Вывести гистограммы целиком в JSON.',
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Очистить гистограммы после вывода.',
+        )
+
+    def handle(self, *args, **options):
+        metrics = report()
+        if options['json']:
+            self.stdout.write(json.dumps(metrics, indent=2))
+        else:
+            self.stdout.write(
+                f'{"endpoint":<45} {"n":>6} '
+                + ' '.join(f'{column + " avg/p95":>22}' for column in COLUMNS)
+            )
+            for endpoint, endpoint_metrics in metrics.items():
+                count = endpoint_metrics.get('total_ms', {}).get('count', 0)
+                cells = []
+                for column in COLUMNS:
+                    metric = endpoint_metrics.get(column)
+                    cells.append(
+                        f'{metric["avg"]:>12} / {metric["p95"]:<7}'
+                        if metric else f'{"-":>22}'
+                    )
+                self.stdout.write(
+                    f'{endpoint:<45} {count:>6} ' + ' '.join(cells)
+                )
+        if options['reset']:
+            reset()
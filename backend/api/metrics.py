@@ -0,0 +1,157 @@
+from django.core.cache import cache
+from django.dispatch import Signal
+
+ENDPOINTS_KEY = 'metrics:endpoints'
+ENDPOINTS_COUNT_KEY = f'{ENDPOINTS_KEY}:count'
+BUCKETS = {
+    'queries': (1, 2, 5, 10, 20, 50, 100),
+    'db_ms': (1, 5, 10, 25, 50, 100, 250, 500, 1000),
+    'encode_ms': (1, 5, 10, 25, 50, 100, 250),
+    'total_ms': (5, 10, 25, 50, 100, 250, 500, 1000, 2500),
+    'size_bytes': (1024, 10240, 102400, 1048576, 10485760),
+}
+INF = 'inf'
+
+# Отправляется после каждого измеренного запроса:
+# sender - класс представления, endpoint, metrics.
+request_measured = Signal()
+
+
+def bucket_for(value, bounds):
+    for bound in bounds:
+        if value <= bound:
+            return bound
+    return INF
+
+
+def metric_key(endpoint, metric, suffix):
+    endpoint = endpoint.replace(' ', ':')
+    return f'metrics:{endpoint}:{metric}:{suffix}'
+
+
+def incr(key, delta=1):
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        cache.set(key, delta, None)
+
+
+def incr_many(deltas):
+    """
+    Прибавляет значения к счетчикам: в Redis одним pipeline,
+    в остальных кешах по одному ключу.
+    """
+    get_client = getattr(getattr(cache, 'client', None), 'get_client', None)
+    if get_client is None:
+        for key, delta in deltas.items():
+            incr(key, delta)
+        return
+    pipeline = get_client(write=True).pipeline(transaction=False)
+    for key, delta in deltas.items():
+        pipeline.incrby(cache.make_key(key), delta)
+    pipeline.execute()
+
+
+def endpoint_key(endpoint):
+    endpoint = endpoint.replace(' ', ':')
+    return f'metrics:endpoint:{endpoint}'
+
+
+def register_endpoint(endpoint):
+    """
+    Эндпоинт добавляется в реестр ровно одним процессом:
+    cache.add атомарен, а номер в реестре выдает incr.
+    """
+    if cache.add(endpoint_key(endpoint), True, None):
+        cache.add(ENDPOINTS_COUNT_KEY, 0, None)
+        number = cache.incr(ENDPOINTS_COUNT_KEY)
+        cache.set(f'{ENDPOINTS_KEY}:{number}', endpoint, None)
+
+
+def registered_endpoints():
+    count = cache.get(ENDPOINTS_COUNT_KEY) or 0
+    return sorted(set(cache.get_many([
+        f'{ENDPOINTS_KEY}:{number}' for number in range(1, count + 1)
+    ]).values()))
+
+
+def record(endpoint, metrics):
+    """
+    Добавляет значения запроса в гистограммы эндпоинта.
+    Гистограммы хранятся в кеше, поэтому собираются
+    со всех процессов, если кеш общий (Redis).
+    """
+    register_endpoint(endpoint)
+    deltas = {}
+    for metric, bounds in BUCKETS.items():
+        value = metrics.get(metric)
+        if value is None:
+            continue
+        deltas[metric_key(endpoint, metric, bucket_for(value, bounds))] = 1
+        deltas[metric_key(endpoint, metric, 'count')] = 1
+        deltas[metric_key(endpoint, metric, 'sum')] = round(value)
+    incr_many(deltas)
+
+
+def estimate_percentile(buckets, count, percent):
+    """
+    Верхняя граница корзины, в которую попадает перцентиль.
+    """
+    threshold = count * percent / 100
+    seen = 0
+    for bound, bucket_count in buckets.items():
+        seen += bucket_count
+        if seen >= threshold:
+            return bound
+    return INF
+
+
+def report():
+    """
+    {endpoint: {metric: {count, sum, avg, p50, p95, buckets}}}
+    """
+    endpoints = registered_endpoints()
+    result = {}
+    for endpoint in endpoints:
+        keys = [
+            metric_key(endpoint, metric, suffix)
+            for metric, bounds in BUCKETS.items()
+            for suffix in (*bounds, INF, 'count', 'sum')
+        ]
+        values = cache.get_many(keys)
+        result[endpoint] = {}
+        for metric, bounds in BUCKETS.items():
+            count = values.get(metric_key(endpoint, metric, 'count'), 0)
+            if not count:
+                continue
+            buckets = {
+                bound: values.get(metric_key(endpoint, metric, bound), 0)
+                for bound in (*bounds, INF)
+            }
+            total = values.get(metric_key(endpoint, metric, 'sum'), 0)
+            result[endpoint][metric] = {
+                'count': count,
+                'sum': total,
+                'avg': round(total / count, 2),
+                'p50': estimate_percentile(buckets, count, 50),
+                'p95': estimate_percentile(buckets, count, 95),
+                'buckets': buckets,
+            }
+    return result
+
+
+def reset():
+    endpoints = registered_endpoints()
+    count = cache.get(ENDPOINTS_COUNT_KEY) or 0
+    cache.delete_many([
+        metric_key(endpoint, metric, suffix)
+        for endpoint in endpoints
+        for metric, bounds in BUCKETS.items()
+        for suffix in (*bounds, INF, 'count', 'sum')
+    ])
+    cache.delete_many([
+        *(endpoint_key(endpoint) for endpoint in endpoints),
+        *(f'{ENDPOINTS_KEY}:{number}' for number in range(1, count + 1)),
+        ENDPOINTS_COUNT_KEY,
+    ])
@@ -0,0 +1,262 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from foodgram.db_router import replica_reads
+
+from .metrics import record, request_measured
+
+logger = logging.getLogger('foodgram.requests')
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PRIMARY_COOKIE = 'db_primary_until'
+
+# QueryRecorder текущего запроса. Контекст переходит в потоки,
+# в которых sync_to_async выполняет представления,
+# там recorder подключается к соединениям потока (api/v1/async_views.py).
+current_recorder = ContextVar('current_recorder', default=None)
+
+
+class QueryRecorder:
+    """
+    Обертка execute_wrapper: считает запросы и время в БД.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.seconds += time.perf_counter() - started
+
+
+@contextmanager
+def record_queries(recorder):
+    """
+    Подключает recorder ко всем соединениям текущего потока.
+    """
+    with ExitStack() as stack:
+        if recorder is not None:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+        yield
+
+
+def endpoint_name(request):
+    match = request.resolver_match
+    if match is None or not match.view_name:
+        return None
+    return f'{request.method} {match.view_name}'
+
+
+class RequestMetricsMiddleware:
+    """
+    Замеряет кол-во SQL-запросов, время в БД, время кодирования
+    ответа рендерером (encode_ms: JSON и другие форматы), общее время
+    и размер ответа для каждого эндпоинта API. Сериализаторы
+    DRF выполняются в представлении, их время входит только в total_ms.
+
+    Включается настройкой REQUEST_METRICS_ENABLED. Результат
+    отдается в заголовке Server-Timing, пишется в лог
+    foodgram.requests и добавляется в гистограммы в кеше
+    (python manage.py request_metrics). У потоковых ответов
+    запросы, выполненные во время отдачи тела, не учитываются.
+
+    Работает и в ASGI, не занимая общий поток синхронного кода.
+    Там запросы к БД считаются у представлений, выполняемых
+    в пуле потоков (api/v1/async_views.py).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Как в MiddlewareMixin: Django вызывает экземпляр
+            # как корутину, если он помечен так.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.REQUEST_METRICS_ENABLED:
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        request.encode_seconds = None
+        started = time.perf_counter()
+        token = current_recorder.set(recorder)
+        try:
+            with record_queries(recorder):
+                response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.measured(request, response, recorder, started)
+
+    async def __acall__(self, request):
+        if not settings.REQUEST_METRICS_ENABLED:
+            return await self.get_response(request)
+        recorder = QueryRecorder()
+        request.encode_seconds = None
+        started = time.perf_counter()
+        token = current_recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return await sync_to_async(self.measured, thread_sensitive=False)(
+            request, response, recorder, started,
+        )
+
+    def measured(self, request, response, recorder, started):
+        total = time.perf_counter() - started
+        endpoint = endpoint_name(request)
+        if endpoint is None:
+            return response
+        metrics = {
+            'queries': recorder.queries,
+            'db_ms': recorder.seconds * 1000,
+            'encode_ms': (
+                request.encode_seconds * 1000
+                if request.encode_seconds is not None else None
+            ),
+            'total_ms': total * 1000,
+            'size_bytes': (
+                None if response.streaming else len(response.content)
+            ),
+        }
+        response['Server-Timing'] = self.server_timing(metrics)
+        logger.info(json.dumps({
+            'endpoint': endpoint,
+            'status': response.status_code,
+            **metrics,
+        }))
+        record(endpoint, metrics)
+        request_measured.send(
+            sender=getattr(request.resolver_match.func, 'cls', None),
+            endpoint=endpoint,
+            metrics=metrics,
+        )
+        return response
+
+    def process_template_response(self, request, response):
+        """
+        Ответы DRF рендерятся после этого хука, время кодирования
+        считается до post-render callback'а.
+        """
+        if settings.REQUEST_METRICS_ENABLED:
+            started = time.perf_counter()
+
+            def encoded(response):
+                request.encode_seconds = time.perf_counter() - started
+
+            response.add_post_render_callback(encoded)
+        return response
+
+    @staticmethod
+    def server_timing(metrics):
+        timings = [
+            f'db;dur={metrics["db_ms"]:.1f};'
+            f'desc="{metrics["queries"]} queries"',
+        ]
+        if metrics['encode_ms'] is not None:
+            timings.append(f'encode;dur={metrics["encode_ms"]:.1f}')
+        timings.append(f'total;dur={metrics["total_ms"]:.1f}')
+        return ', '.join(timings)
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Разрешает чтение с реплик (foodgram/db_router.py) безопасным
+    запросам к представлениям с атрибутом replica_reads = True.
+    Остальные запросы, в том числе админка, работают с основной БД.
+
+    После успешного изменяющего запроса ответ ставит куку, и следующие
+    REPLICA_STICKY_SECONDS секунд пользователь читает с основной БД,
+    чтобы видеть свои изменения, даже если реплики отстают.
+    У клиентов API с токеном кук обычно нет, поэтому то же время
+    запоминается в кеше по заголовку Authorization.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = replica_reads.set(False)
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        return self.stick_to_primary(request, response)
+
+    async def __acall__(self, request):
+        token = replica_reads.set(False)
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        return self.stick_to_primary(request, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None)
+        if (
+            request.method in SAFE_METHODS
+            and getattr(view_class, 'replica_reads', False)
+            and not self.is_sticky(request)
+        ):
+            replica_reads.set(True)
+
+    @staticmethod
+    def sticky_key(request):
+        authorization = request.headers.get('Authorization')
+        if not authorization:
+            return None
+        digest = hashlib.sha1(authorization.encode()).hexdigest()
+        return f'{PRIMARY_COOKIE}:{digest}'
+
+    def is_sticky(self, request):
+        try:
+            until = int(request.COOKIES.get(PRIMARY_COOKIE, 0))
+        except ValueError:
+            until = 0
+        if until > time.time():
+            return True
+        key = self.sticky_key(request)
+        return key is not None and cache.get(key) is not None
+
+    def stick_to_primary(self, request, response):
+        if (
+            settings.DATABASE_REPLICAS
+            and request.method not in SAFE_METHODS
+            and response.status_code < 400
+        ):
+            key = self.sticky_key(request)
+            if key is not None:
+                cache.set(key, True, settings.REPLICA_STICKY_SECONDS)
+            response.set_cookie(
+                PRIMARY_COOKIE,
+                str(int(time.time()) + settings.REPLICA_STICKY_SECONDS),
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
@@ -1,17 +1,33 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from api.v1.async_views import offload_views
 from api.v1.views import (DjoserCustomUserViewSet, IngredientViewSet,
                           RecipeViewSet, TagViewSet)
 
+# Эндпоинты чтения, которые в ASGI выполняются в пуле потоков.
+ASYNC_VIEW_NAMES = (
+    'recipes-list',
+    'recipes-detail',
+    'recipes-download-shopping-cart',
+    'tags-list',
+    'tags-detail',
+    'ingredients-search',
+)
+
 router_v1 = DefaultRouter()
 router_v1.register(r'ingredients', IngredientViewSet, basename='ingredients')
 router_v1.register(r'tags', TagViewSet, basename='tags')
 router_v1.register(r'recipes', RecipeViewSet, basename='recipes')
 router_v1.register(r'users', DjoserCustomUserViewSet, basename='users')
 
+router_urls = router_v1.urls
+if settings.ASYNC_VIEWS:
+    router_urls = offload_views(router_urls, ASYNC_VIEW_NAMES)
+
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
-    path('', include(router_v1.urls)),
+    path('', include(router_urls)),
     path('', include('djoser.urls')),
 ]
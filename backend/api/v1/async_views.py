@@ -0,0 +1,130 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections, connections
+from django.urls import URLPattern
+
+from api.middleware import current_recorder, record_queries
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+executor = None
+
+
+def get_executor():
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=settings.ASYNC_VIEWS_THREADS,
+            thread_name_prefix='async-views',
+        )
+    return executor
+
+
+def run_view(view, request, *args, **kwargs):
+    """
+    Выполняет представление в потоке пула. Соединения с БД у потоков
+    свои, поэтому проверяются и закрываются здесь же, как Django
+    делает это по сигналам начала и конца запроса. Тело потокового
+    ответа здесь не читается, его по частям отдает StreamingASGIHandler.
+    """
+    close_old_connections()
+    try:
+        with record_queries(current_recorder.get()):
+            return view(request, *args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+class StreamingASGIHandler(ASGIHandler):
+    """
+    ASGI-обработчик, который читает тело потокового ответа
+    в отдельном потоке.
+
+    Django 3.2 перебирает генератор потокового ответа прямо
+    в event loop'е, где обращаться к БД нельзя, а собирать выгрузку
+    списка покупок в памяти целиком не хочется. Поэтому обработчику
+    Django отдается пустое тело, а перед завершающим сообщением
+    части настоящего читаются по одной через sync_to_async. Поток
+    у ответа один: курсор iterator() привязан к соединению потока.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        parts = iter(response.streaming_content)
+        response.streaming_content = ()
+
+        async def send_with_body(message):
+            if message['type'] == 'http.response.body' and not message.get(
+                'more_body'
+            ):
+                await self.send_parts(parts, send)
+            await send(message)
+
+        await super().send_response(response, send_with_body)
+
+    async def send_parts(self, parts, send):
+        with ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix='async-stream',
+        ) as worker:
+            read = sync_to_async(
+                next, thread_sensitive=False, executor=worker,
+            )
+            try:
+                while True:
+                    part = await read(parts, None)
+                    if part is None:
+                        break
+                    for chunk, _ in self.chunk_bytes(part):
+                        await send({
+                            'type': 'http.response.body',
+                            'body': chunk,
+                            'more_body': True,
+                        })
+            finally:
+                await sync_to_async(
+                    connections.close_all,
+                    thread_sensitive=False,
+                    executor=worker,
+                )()
+
+
+def offload(view):
+    """
+    Асинхронная обертка синхронного представления.
+
+    В ASGI Django 3.2 выполняет синхронные представления в одном общем
+    потоке, и медленные запросы встают в очередь друг за другом.
+    Асинхронного ORM в Django 3.2 нет, поэтому чтение выполняется
+    в пуле из ASYNC_VIEWS_THREADS потоков, а изменяющие запросы -
+    как обычно, в общем потоке.
+    """
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        if request.method not in SAFE_METHODS:
+            return await sync_to_async(view)(request, *args, **kwargs)
+        return await sync_to_async(
+            run_view,
+            thread_sensitive=False,
+            executor=get_executor(),
+        )(view, request, *args, **kwargs)
+    return async_view
+
+
+def offload_views(patterns, names):
+    return [
+        URLPattern(
+            pattern.pattern,
+            offload(pattern.callback),
+            pattern.default_args,
+            pattern.name,
+        )
+        if isinstance(pattern, URLPattern) and pattern.name in names
+        else pattern
+        for pattern in patterns
+    ]
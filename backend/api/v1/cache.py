@@ -0,0 +1,124 @@
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from foodgram.db_router import primary_reads
+
+REFERENCE_NAMESPACES = ('tags', 'ingredients')
+
+
+def version_key(namespace):
+    return f'{namespace}:version'
+
+
+def get_version(namespace):
+    """
+    Текущая версия данных пространства имен.
+
+    Версия — время последней инвалидации в наносекундах,
+    поэтому она же служит значением Last-Modified.
+    """
+    version = cache.get(version_key(namespace))
+    if version is None:
+        cache.add(version_key(namespace), time.time_ns(), None)
+        version = cache.get(version_key(namespace))
+    return version
+
+
+def invalidate(*namespaces):
+    """
+    Сдвигает версию, после чего все закешированные
+    ответы пространства имен перестают читаться.
+    """
+    cache.set_many(
+        {version_key(namespace): time.time_ns() for namespace in namespaces},
+        None,
+    )
+
+
+def get_or_set(namespace, name, build):
+    """
+    Значение, посчитанное build() для текущей версии данных
+    пространства имен, например словарь slug -> id тэгов.
+    build() читает с основной БД.
+    """
+    key = f'{namespace}:{get_version(namespace)}:{name}'
+    value = cache.get(key)
+    if value is None:
+        with primary_reads():
+            value = build()
+        cache.set(key, value, settings.REFERENCE_CACHE_TIMEOUT)
+    return value
+
+
+def payload_key(namespace, version, params):
+    params_hash = hashlib.sha1(
+        json.dumps(params, ensure_ascii=False).encode()
+    ).hexdigest()
+    return f'{namespace}:{version}:{params_hash}'
+
+
+def build_payload(version, build):
+    """
+    Ответ вместе со строгим ETag и Last-Modified,
+    build() читает с основной БД.
+    """
+    with primary_reads():
+        data = build()
+    return {
+        'data': data,
+        'etag': hashlib.sha1(
+            json.dumps(data, ensure_ascii=False).encode()
+        ).hexdigest(),
+        'last_modified': version // 10 ** 9,
+    }
+
+
+def get_or_set_payload(namespace, params, build):
+    """
+    Возвращает закешированный ответ для текущей версии данных,
+    собирая его через build(), если в кеше его нет.
+
+    params — нормализованные параметры запроса, от которых зависит
+    ответ. Ответ без параметров хранится REFERENCE_CACHE_TIMEOUT,
+    с параметрами — PAYLOAD_CACHE_FILTERED_TIMEOUT, чтобы ключи
+    поисковых запросов не копились в кеше. При params=None
+    ответ собирается без кеша.
+    """
+    version = get_version(namespace)
+    if params is None:
+        return build_payload(version, build)
+    key = payload_key(namespace, version, params)
+    payload = cache.get(key)
+    if payload is None:
+        payload = build_payload(version, build)
+        cache.set(
+            key,
+            payload,
+            settings.PAYLOAD_CACHE_FILTERED_TIMEOUT if params
+            else settings.REFERENCE_CACHE_TIMEOUT,
+        )
+    return payload
+
+
+def recipe_versions():
+    """
+    Версии тэгов и ингредиентов: их изменение меняет
+    представление всех рецептов сразу.
+    """
+    return get_version('tags'), get_version('ingredients')
+
+
+def recipe_key(recipe_id, versions):
+    tags_version, ingredients_version = versions
+    return f'recipe:{tags_version}:{ingredients_version}:{recipe_id}'
+
+
+def invalidate_recipes(recipe_ids):
+    versions = recipe_versions()
+    cache.delete_many([
+        recipe_key(recipe_id, versions) for recipe_id in recipe_ids
+    ])
@@ -0,0 +1,101 @@
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+
+
+def resolve_pks(queryset, pks, message):
+    """
+    Загружает объекты по списку первичных ключей одним запросом in_bulk.
+    Если каких-то объектов нет, сообщает сразу обо всех.
+    """
+    objects = queryset.in_bulk(set(pks))
+    missing = [pk for pk in dict.fromkeys(pks) if pk not in objects]
+    if missing:
+        raise serializers.ValidationError(
+            message.format(pk_values=', '.join(map(str, missing)))
+        )
+    return [objects[pk] for pk in pks]
+
+
+class BulkPrimaryKeyListField(serializers.ListField):
+    """
+    Список первичных ключей, который, в отличие от
+    PrimaryKeyRelatedField(many=True), проверяется одним запросом.
+    """
+    default_error_messages = {
+        'does_not_exist': 'Недопустимые первичные ключи: {pk_values}.',
+    }
+
+    def __init__(self, queryset, **kwargs):
+        self.queryset = queryset
+        kwargs['child'] = serializers.IntegerField(min_value=1)
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        return resolve_pks(
+            self.queryset,
+            super().to_internal_value(data),
+            self.error_messages['does_not_exist'],
+        )
+
+    def to_representation(self, value):
+        if hasattr(value, 'all'):
+            value = value.all()
+        return [obj.pk for obj in value]
+
+
+class BulkRelatedListSerializer(serializers.ListSerializer):
+    """
+    Список вложенных объектов, в котором поле related_field
+    содержит первичный ключ. Ключи всех элементов
+    заменяются объектами одним запросом.
+    """
+    related_field = None
+    queryset = None
+    default_error_messages = {
+        'does_not_exist': 'Недопустимые первичные ключи: {pk_values}.',
+    }
+
+    def to_internal_value(self, data):
+        items = super().to_internal_value(data)
+        objects = resolve_pks(
+            self.queryset,
+            [item[self.related_field] for item in items],
+            self.error_messages['does_not_exist'],
+        )
+        for item, obj in zip(items, objects):
+            item[self.related_field] = obj
+        return items
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """
+    Ссылки на уменьшенные копии картинки:
+    {размер: {формат: url}}. Пока картинка не обработана,
+    отдается пустой словарь.
+    """
+
+    def to_representation(self, variants):
+        request = self.context.get('request')
+        return {
+            variant: {
+                file_format: (
+                    request.build_absolute_uri(default_storage.url(name))
+                    if request else default_storage.url(name)
+                )
+                for file_format, name in formats.items()
+            }
+            for variant, formats in (variants or {}).items()
+        }
+
+
+class RecipeImageField(Base64ImageField):
+    """
+    Картинка строкой base64 (JSON) или файлом (multipart/form-data).
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            return serializers.ImageField.to_internal_value(self, data)
+        return super().to_internal_value(data)
@@ -1,17 +1,50 @@
+from django.db import connection
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
 
-from recipe.models import Recipe
+from recipe.models import Recipe, RecipeTag, Tag
+from recipe.search import search_recipes
+
+from .cache import get_or_set
+
+RECIPE_ORDERINGS = {
+    'popular': ('-favorites_count', '-id'),
+    'trending': ('-trending_score', '-id'),
+}
+
+
+def get_tag_ids():
+    """
+    Словарь slug -> id тэгов из кеша, сбрасывается при изменении тэгов.
+    """
+    return get_or_set(
+        'tags',
+        'ids',
+        lambda: dict(Tag.objects.values_list('slug', 'pk')),
+    )
+
+
+def tag_choices():
+    return [(slug, slug) for slug in get_tag_ids()]
 
 
 class RecipeFilterSet(filters.FilterSet):
     """
     Позволяет применять различные фильтры для поиска рецептов в списке.
     """
-    tags = filters.AllValuesMultipleFilter(field_name='tags__slug', )
+    tags = filters.MultipleChoiceFilter(
+        choices=tag_choices,
+        method='filter_tags',
+    )
     is_favorited = filters.BooleanFilter(method='filter_is_favorite')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='filter_search')
+    ordering = filters.ChoiceFilter(
+        choices=[(ordering, ordering) for ordering in RECIPE_ORDERINGS],
+        method='filter_ordering',
+    )
 
     class Meta:
         model = Recipe
@@ -20,6 +53,18 @@ class RecipeFilterSet(filters.FilterSet):
             'author',
         )
 
+    def filter_tags(self, queryset, name, value):
+        """
+        Рецепты хотя бы с одним из тэгов. Подзапрос EXISTS
+        не размножает рецепты с несколькими тэгами, поэтому
+        DISTINCT не нужен, а slug в id переводятся по кешу.
+        """
+        tag_ids = get_tag_ids()
+        return queryset.filter(Exists(RecipeTag.objects.filter(
+            recipe=OuterRef('pk'),
+            tag_id__in=[tag_ids[slug] for slug in value],
+        )))
+
     def filter_is_favorite(self, queryset, name, value):
         """
         Применяет фильтр для избранных рецептов текущего пользователя.
@@ -35,3 +80,17 @@ class RecipeFilterSet(filters.FilterSet):
         if value:
             return queryset.filter(shopping_cart__user=self.request.user)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        """
+        Полнотекстовый поиск по названию и описанию с ранжированием.
+        Явная сортировка ?ordering= применяется после и важнее ранга.
+        """
+        return search_recipes(queryset, value, connection.vendor)
+
+    def filter_ordering(self, queryset, name, value):
+        """
+        Сортировка по популярности или рейтингу за последние дни.
+        Оба поля хранятся в таблице рецептов и покрыты индексами.
+        """
+        return queryset.order_by(*RECIPE_ORDERINGS[value])
@@ -0,0 +1,252 @@
+import heapq
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, Value, When
+
+from foodgram.db_router import primary_reads
+from recipe.models import Ingredient
+
+from .cache import get_version
+
+PREFIX_RANK = 2
+SUBSTRING_RANK = 1
+FUZZY_RANK = 0
+
+
+def trigrams(text):
+    """
+    Триграммы строки с отступами по краям, как в pg_trgm.
+    """
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class IngredientIndex:
+    """
+    Индекс ингредиентов в памяти процесса.
+
+    Названия хранятся отсортированными, поэтому совпадения по префиксу
+    находятся бинарным поиском. Для поиска по подстроке и с опечатками
+    строится триграммный индекс: триграмма -> номера названий.
+    """
+
+    def __init__(self, ingredients):
+        rows = sorted(
+            ingredients,
+            key=lambda ingredient: (ingredient[1].lower(), ingredient[0]),
+        )
+        self.ids = array('q', (row[0] for row in rows))
+        self.names = [row[1] for row in rows]
+        self.units = [row[2] for row in rows]
+        self.keys = [name.lower() for name in self.names]
+        self.trigram_counts = array('H')
+        postings = defaultdict(lambda: array('I'))
+        for position, key in enumerate(self.keys):
+            key_trigrams = trigrams(key)
+            self.trigram_counts.append(min(len(key_trigrams), 0xFFFF))
+            for trigram in key_trigrams:
+                postings[trigram].append(position)
+        self.postings = dict(postings)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _prefix(self, query, limit):
+        start = bisect_left(self.keys, query)
+        end = min(start + limit, len(self.keys))
+        for position in range(start, end):
+            if not self.keys[position].startswith(query):
+                break
+            yield position
+
+    def _postings(self, query_trigrams):
+        return sorted(
+            (self.postings.get(trigram, ()) for trigram in query_trigrams),
+            key=len,
+        )
+
+    def _substring(self, query, exclude, limit):
+        query_trigrams = {query[i:i + 3] for i in range(len(query) - 2)}
+        if not query_trigrams:
+            return []
+        postings = self._postings(query_trigrams)
+        candidates = set(postings[0])
+        if len(postings) > 1 and candidates:
+            candidates.intersection_update(postings[1])
+        matches = (
+            position for position in candidates
+            if position not in exclude and query in self.keys[position]
+        )
+        return heapq.nsmallest(
+            limit,
+            matches,
+            key=lambda position: (
+                self.keys[position].index(query),
+                self.keys[position],
+            ),
+        )
+
+    def _fuzzy(self, query, exclude, threshold, limit):
+        """
+        Похожие названия по мере сходства триграмм, как в pg_trgm.
+        """
+        query_trigrams = trigrams(query)
+        shared = Counter()
+        for posting in self._postings(query_trigrams):
+            shared.update(posting)
+        similar = []
+        for position, count in shared.items():
+            if position in exclude:
+                continue
+            similarity = count / (
+                len(query_trigrams) + self.trigram_counts[position] - count
+            )
+            if similarity >= threshold:
+                similar.append((-similarity, self.keys[position], position))
+        return [position for _, _, position in heapq.nsmallest(limit, similar)]
+
+    def search(self, query, limit, threshold=0.3):
+        """
+        Сначала совпадения по префиксу, затем по подстроке,
+        затем похожие по триграммам названия.
+        """
+        query = query.strip().lower()
+        if not query:
+            return []
+        found = list(self._prefix(query, limit))
+        if len(found) < limit:
+            found.extend(
+                self._substring(query, set(found), limit - len(found))
+            )
+        if len(found) < limit and len(query) >= 3:
+            found.extend(self._fuzzy(
+                query, set(found), threshold, limit - len(found)
+            ))
+        return [
+            {
+                'id': self.ids[position],
+                'name': self.names[position],
+                'measurement_unit': self.units[position],
+            }
+            for position in found[:limit]
+        ]
+
+
+_current = None
+_index_lock = threading.Lock()
+
+
+def load_index(version):
+    """
+    Собирает индекс версии version и подменяет им текущий.
+    Читается с основной БД, чтобы не собрать индекс новой версии
+    по отстающей реплике.
+    """
+    global _current
+    with _index_lock:
+        if _current is not None and _current[0] == version:
+            return _current[1]
+        with primary_reads():
+            index = IngredientIndex(
+                Ingredient.objects.values_list(
+                    'id', 'name', 'measurement_unit'
+                ).order_by().iterator()
+            )
+        _current = (version, index)
+        return index
+
+
+def refresh_index(version):
+    try:
+        load_index(version)
+    finally:
+        connections.close_all()
+
+
+def warm_index():
+    """
+    Собирает индекс в фоне при старте воркера,
+    чтобы первый поиск не ждал сборки.
+    """
+    threading.Thread(
+        target=refresh_index,
+        args=(get_version('ingredients'),),
+        daemon=True,
+    ).start()
+
+
+def get_index():
+    """
+    Первый поиск в процессе ждет сборки индекса. Когда меняется версия
+    ингредиентов в кеше, новый индекс собирается в фоновом потоке,
+    а поиск до его готовности идет по старому.
+    """
+    version = get_version('ingredients')
+    current = _current
+    if current is None:
+        return load_index(version)
+    if current[0] != version and not _index_lock.locked():
+        threading.Thread(
+            target=refresh_index,
+            args=(version,),
+            daemon=True,
+        ).start()
+    return current[1]
+
+
+def search_memory(query, limit):
+    return get_index().search(
+        query,
+        limit,
+        settings.INGREDIENT_SEARCH_SIMILARITY,
+    )
+
+
+def search_trigram(query, limit):
+    """
+    Поиск средствами PostgreSQL: pg_trgm и GIN-индекс по названию.
+    Модули django.contrib.postgres требуют psycopg2,
+    поэтому импортируются только для этого бэкенда;
+    лукап trigram_similar регистрируется в RecipeConfig.ready().
+    """
+    from django.contrib.postgres.search import TrigramSimilarity
+
+    query = query.strip()
+    if not query:
+        return []
+    return list(
+        Ingredient.objects.annotate(
+            rank=Case(
+                When(name__istartswith=query, then=Value(PREFIX_RANK)),
+                When(name__icontains=query, then=Value(SUBSTRING_RANK)),
+                default=Value(FUZZY_RANK),
+                output_field=IntegerField(),
+            ),
+            similarity=TrigramSimilarity('name', query),
+        ).filter(
+            Q(name__icontains=query) | Q(name__trigram_similar=query)
+        ).order_by(
+            '-rank',
+            '-similarity',
+            'name',
+        ).values(
+            'id',
+            'name',
+            'measurement_unit',
+        )[:limit]
+    )
+
+
+SEARCH_BACKENDS = {
+    'memory': search_memory,
+    'trigram': search_trigram,
+}
+
+
+def search_ingredients(query, limit):
+    return SEARCH_BACKENDS[settings.INGREDIENT_SEARCH_BACKEND](query, limit)
@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.utils.http import (http_date, parse_etags, parse_http_date_safe,
+                               quote_etag)
+from rest_framework import status
+from rest_framework.response import Response
+
+from .cache import get_or_set_payload
+
+
+class CachedListMixin:
+    """
+    Отдает список объектов из версионированного кеша
+    и отвечает 304 на условные запросы.
+
+    cache_namespace: пространство имен кеша, версия которого
+    сдвигается при изменении данных.
+    cache_params: параметры запроса, от которых зависит ответ
+    (поиск SearchFilter); остальные параметры в ключ кеша не входят.
+    """
+    cache_namespace = None
+    cache_params = ()
+
+    def get_cache_params(self, request):
+        """
+        Значения cache_params, приведенные к тому, как их разбирает
+        SearchFilter. Слишком длинные запросы не кешируются.
+        """
+        params = []
+        for name in self.cache_params:
+            terms = request.query_params.get(name, '')
+            terms = ' '.join(
+                terms.replace('\x00', '').replace(',', ' ').split()
+            )
+            if len(terms) > settings.PAYLOAD_CACHE_MAX_PARAM_LENGTH:
+                return None
+            if terms:
+                params.append([name, terms])
+        return params
+
+    def list(self, request, *args, **kwargs):
+        payload = get_or_set_payload(
+            self.cache_namespace,
+            self.get_cache_params(request),
+            lambda: self.get_serializer(
+                self.filter_queryset(self.get_queryset()),
+                many=True,
+            ).data,
+        )
+        etag = quote_etag(payload['etag'])
+        headers = {
+            'ETag': etag,
+            'Last-Modified': http_date(payload['last_modified']),
+        }
+        if self.is_not_modified(request, etag, payload['last_modified']):
+            return Response(status=status.HTTP_304_NOT_MODIFIED,
+                            headers=headers)
+        return Response(payload['data'], headers=headers)
+
+    @staticmethod
+    def is_not_modified(request, etag, last_modified):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            etags = {
+                tag[2:] if tag.startswith('W/') else tag
+                for tag in parse_etags(if_none_match)
+            }
+            return '*' in etags or etag in etags
+        if_modified_since = parse_http_date_safe(
+            request.headers.get('If-Modified-Since', '')
+        )
+        return (
+            if_modified_since is not None
+            and last_modified <= if_modified_since
+        )
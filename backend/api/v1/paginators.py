@@ -1,9 +1,287 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (BasePagination, CursorPagination,
+                                       PageNumberPagination)
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+COUNT_NONE = 'none'
+COUNT_APPROXIMATE = 'approximate'
+COUNT_EXACT = 'exact'
+
+
+def approximate_count(queryset):
+    """
+    Оценка кол-ва строк по плану запроса PostgreSQL без COUNT(*).
+    На других БД возвращает точное значение.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']['Plan Rows']
+
+
+def reverse_ordering(ordering):
+    return tuple(
+        field[1:] if field.startswith('-') else f'-{field}'
+        for field in ordering
+    )
+
+
+def keyset_filter(ordering, values):
+    """
+    Условие "после позиции" для сортировки по нескольким полям:
+    (a, b) после (x, y), если a после x или a = x и b после y.
+    """
+    condition = None
+    for field, value in reversed(list(zip(ordering, values))):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        after = Q(**{f'{name}__{lookup}': value})
+        if condition is not None:
+            after |= Q(**{name: value}) & condition
+        condition = after
+    return condition
+
+
+class CountCursorPaginator(CursorPagination):
+    """
+    Курсорный пагинатор: следующая страница выбирается условием
+    по ключу сортировки, а не через OFFSET, поэтому глубокие
+    страницы стоят столько же, сколько первая.
+
+    Общее кол-во объектов по умолчанию не считается,
+    параметр ?count=approximate|exact включает оценку или COUNT(*).
+    """
+    page_size_query_param = 'limit'
+    page_size = 6
+    count_query_param = 'count'
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Сортировка, заданная queryset'у явно (например, фильтром
+        ?ordering=), иначе сортировка пагинатора по умолчанию.
+        Если в ней нет id, он добавляется последним, чтобы позиция
+        была уникальной.
+        """
+        if queryset.query.order_by:
+            ordering = tuple(queryset.query.order_by)
+        else:
+            ordering = super().get_ordering(request, queryset, view)
+        if not {'id', 'pk'} & {field.lstrip('-') for field in ordering}:
+            ordering += ('-id' if ordering[-1].startswith('-') else 'id',)
+        return ordering
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param, COUNT_NONE)
+        if mode == COUNT_EXACT:
+            return queryset.count()
+        if mode == COUNT_APPROXIMATE:
+            return approximate_count(queryset)
+        return None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Позиция курсора - значения всех полей сортировки, и следующая
+        страница выбирается условием по всему кортежу. Курсор DRF
+        фильтрует только по первому полю, а одинаковые значения
+        пропускает через OFFSET, который ограничен offset_cutoff,
+        поэтому на популярных сортировках с тысячами равных
+        счетчиков страницы начинали повторяться.
+        """
+        self.count = self.get_count(queryset, request)
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor.position if self.cursor else None
+
+        ordering = reverse_ordering(self.ordering) if reverse else (
+            self.ordering
+        )
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(
+                keyset_filter(ordering, json.loads(position))
+            )
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following_position = None
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering,
+            )
+
+        if reverse:
+            self.page.reverse()
+            self.next_position = position
+            self.previous_position = following_position
+        else:
+            self.next_position = following_position
+            self.previous_position = position
+        self.has_next = self.next_position is not None
+        self.has_previous = self.previous_position is not None
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            values = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not (
+            isinstance(values, list)
+            and len(values) == len(self.ordering)
+            and all(isinstance(value, str) for value in values)
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor._replace(offset=0)
+
+    def _get_position_from_instance(self, instance, ordering):
+        return json.dumps([
+            str(instance[field.lstrip('-')] if isinstance(instance, dict)
+                else getattr(instance, field.lstrip('-')))
+            for field in ordering
+        ])
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+
+class RecipeCursorPaginator(CountCursorPaginator):
+    ordering = ('-pub_date', '-id')
+
+
+class SubscriptionCursorPaginator(CountCursorPaginator):
+    ordering = ('username',)
 
 
 class CustomPageNumberPaginator(PageNumberPagination):
     """
-    Кастомный пагинатор
+    Кастомный пагинатор.
+
+    Если задан cursor_paginator_class, запрос с ?pagination=cursor
+    или с параметром cursor обрабатывает курсорный пагинатор.
     """
     page_size_query_param = 'limit'
     page_size = 6
+    cursor_paginator_class = None
+    cursor_query_param = 'cursor'
+
+    def use_cursor(self, request):
+        return self.cursor_paginator_class is not None and (
+            request.query_params.get('pagination') == 'cursor'
+            or self.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if self.use_cursor(request):
+            self.cursor_paginator = self.cursor_paginator_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class RecipePaginator(CustomPageNumberPaginator):
+    cursor_paginator_class = RecipeCursorPaginator
+
+
+class SubscriptionPaginator(CustomPageNumberPaginator):
+    cursor_paginator_class = SubscriptionCursorPaginator
+
+
+class FeedPaginator(BasePagination):
+    """
+    Курсорный пагинатор ленты подписок. Лента собирается
+    из нескольких источников (recipe/feed.py), поэтому страница
+    выбирается функцией read(limit, cursor), которая возвращает
+    пары (pub_date, recipe_id) от новых к старым, а курсор -
+    последняя пара страницы.
+    """
+    page_size_query_param = 'limit'
+    page_size = 6
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(
+                self.page_size_query_param, self.page_size
+            ))
+        except ValueError:
+            page_size = self.page_size
+        return min(max(page_size, 1), settings.FEED_MAX_LIMIT)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            pub_date, recipe_id = b64decode(
+                encoded.encode('ascii')
+            ).decode('ascii').rsplit(',', 1)
+            cursor = parse_datetime(pub_date), int(recipe_id)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if cursor[0] is None:
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    @staticmethod
+    def encode_cursor(key):
+        pub_date, recipe_id = key
+        return b64encode(
+            f'{pub_date.isoformat()},{recipe_id}'.encode('ascii')
+        ).decode('ascii')
+
+    def paginate_keys(self, read, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+        keys = read(page_size + 1, self.decode_cursor(request))
+        self.next_key = keys[page_size - 1] if len(keys) > page_size else None
+        return keys[:page_size]
+
+    def get_next_link(self):
+        if self.next_key is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.next_key),
+        )
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
@@ -0,0 +1,132 @@
+import json
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http.multipartparser import \
+    MultiPartParser as DjangoMultiPartParser
+from django.http.multipartparser import MultiPartParserError
+from django.utils.datastructures import MultiValueDict
+from PIL import Image, UnidentifiedImageError
+from rest_framework.exceptions import ParseError, ValidationError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+IMAGE_FIELD = 'image'
+IMAGE_HEADER_LIMIT = 256 * 1024
+
+
+class ImageUploadHandler(TemporaryFileUploadHandler):
+    """
+    Пишет загружаемый файл во временный файл по частям.
+
+    Размер проверяется на каждом куске, а формат и размеры
+    картинки - по заголовку, как только он получен,
+    поэтому слишком большие файлы отклоняются до конца загрузки.
+    """
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.received = 0
+        self.header = b''
+        self.header_checked = field_name != IMAGE_FIELD
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_UPLOAD_MAX_SIZE:
+            self.fail(
+                f'Файл больше '
+                f'{settings.IMAGE_UPLOAD_MAX_SIZE // (1024 * 1024)} МБ.'
+            )
+        if not self.header_checked:
+            self.header += raw_data
+            self.check_header()
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if not self.header_checked:
+            self.fail('Загрузите корректное изображение.')
+        return super().file_complete(file_size)
+
+    def check_header(self):
+        try:
+            with Image.open(BytesIO(self.header)) as image:
+                width, height = image.size
+                image_format = image.format
+        except Image.DecompressionBombError:
+            self.fail('Слишком большое изображение.')
+        except (UnidentifiedImageError, OSError):
+            if len(self.header) >= IMAGE_HEADER_LIMIT:
+                self.fail('Загрузите корректное изображение.')
+            return
+        self.header_checked = True
+        self.header = b''
+        if image_format not in settings.IMAGE_UPLOAD_FORMATS:
+            self.fail(f'Формат {image_format} не поддерживается.')
+        if (
+            max(width, height) > settings.IMAGE_UPLOAD_MAX_DIMENSION
+            or width * height > settings.IMAGE_UPLOAD_MAX_PIXELS
+        ):
+            self.fail(f'Слишком большое изображение: {width}x{height}.')
+
+    def fail(self, message):
+        if self.file is not None:
+            self.file.close()
+        raise ValidationError({IMAGE_FIELD: [message]})
+
+
+class ParsedData(dict):
+    """
+    Словарь полей формы. DRF объединяет поля с файлами через
+    data.copy().update(files), а files - MultiValueDict, который
+    без приведения попал бы в словарь списками значений.
+    Сами files остаются MultiValueDict, чтобы Django закрыл
+    временные файлы в конце запроса.
+    """
+
+    def copy(self):
+        return ParsedData(self)
+
+    def update(self, other):
+        if isinstance(other, MultiValueDict):
+            other = other.dict()
+        super().update(other)
+
+
+class RecipeMultiPartParser(MultiPartParser):
+    """
+    multipart/form-data для создания и изменения рецепта.
+
+    Картинка передается файлом, а списки ingredients и tags -
+    JSON-строками или повторяющимися полями.
+    """
+    list_fields = ('ingredients', 'tags')
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        request = parser_context['request']
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        meta = request.META.copy()
+        meta['CONTENT_TYPE'] = media_type
+        upload_handlers = [ImageUploadHandler(request._request)]
+        try:
+            data, files = DjangoMultiPartParser(
+                meta, stream, upload_handlers, encoding
+            ).parse()
+        except MultiPartParserError as exc:
+            raise ParseError(f'Multipart form parse error - {exc}')
+        return DataAndFiles(self.decode(data), files)
+
+    def decode(self, data):
+        decoded = ParsedData()
+        for key, values in data.lists():
+            if key not in self.list_fields:
+                decoded[key] = values[-1]
+                continue
+            try:
+                values = [json.loads(value) for value in values]
+            except ValueError:
+                raise ParseError(f'Поле {key} должно содержать JSON.')
+            if len(values) == 1 and isinstance(values[0], list):
+                values = values[0]
+            decoded[key] = values
+        return decoded
@@ -0,0 +1,99 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from foodgram.db_router import primary_reads
+from recipe.models import Recipe
+
+from .cache import recipe_key, recipe_versions
+from .serializers import RecipeSerializer
+
+USER_FIELDS = ('is_favorited', 'is_in_shopping_cart')
+
+
+def build_payloads(recipe_ids):
+    """
+    Общая для всех пользователей часть представления рецептов:
+    сериализуется без запроса, поэтому без флагов пользователя
+    и с относительными ссылками на картинки.
+
+    Читается с основной БД: после изменения рецепта отстающая
+    реплика положила бы в кеш старое представление под новым ключом.
+    """
+    recipes = Recipe.objects.filter(pk__in=recipe_ids).select_related(
+        'author',
+    ).prefetch_related(
+        'recipe_ingredient__ingredient',
+        'tags',
+    ).defer('search_vector')
+    with primary_reads():
+        return {
+            payload['id']: dict(payload)
+            for payload in RecipeSerializer(recipes, many=True).data
+        }
+
+
+def absolute_url(request, url):
+    return request.build_absolute_uri(url) if url else url
+
+
+def overlay(payload, recipe, request):
+    """
+    Добавляет к закешированному представлению флаги пользователя,
+    подписку на автора, счетчики и абсолютные ссылки.
+    Все это берется из строки рецепта, выбранной для страницы.
+    """
+    values = {
+        'author': {
+            **payload['author'],
+            'is_subscribed': getattr(recipe, 'author_is_subscribed', False),
+            'recipes_count': recipe.author.recipes_count,
+            'followers_count': recipe.author.followers_count,
+        },
+        'favorites_count': recipe.favorites_count,
+        'in_carts_count': recipe.in_carts_count,
+        'image': absolute_url(request, payload['image']),
+        'image_variants': {
+            variant: {
+                file_format: absolute_url(request, url)
+                for file_format, url in formats.items()
+            }
+            for variant, formats in payload['image_variants'].items()
+        },
+    }
+    for field in USER_FIELDS:
+        if hasattr(recipe, field):
+            values[field] = getattr(recipe, field)
+    return {
+        field: values[field] if field in values else payload[field]
+        for field in RecipeSerializer.Meta.fields
+        if field in values or field in payload
+    }
+
+
+def recipe_payloads(recipes, request):
+    """
+    Представления рецептов в порядке recipes, как у RecipeSerializer.
+
+    recipes - строки рецептов с автором и аннотациями пользователя
+    (annotate_user_fields), без ингредиентов и тэгов. Общая часть
+    представлений читается из кеша одним get_many, недостающие
+    собираются одним набором запросов и кладутся в кеш.
+    """
+    versions = recipe_versions()
+    keys = {recipe.pk: recipe_key(recipe.pk, versions) for recipe in recipes}
+    cached = cache.get_many(keys.values())
+    missing = [
+        recipe_id for recipe_id, key in keys.items() if key not in cached
+    ]
+    if missing:
+        built = {
+            keys[recipe_id]: payload
+            for recipe_id, payload in build_payloads(missing).items()
+        }
+        cache.set_many(built, settings.RECIPE_CACHE_TIMEOUT)
+        cached.update(built)
+    return [
+        overlay(cached[keys[recipe.pk]], recipe, request)
+        for recipe in recipes
+        if keys[recipe.pk] in cached
+    ]
@@ -0,0 +1,41 @@
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class ShoppingCartRenderer(BaseRenderer):
+    """
+    Рендерер формата списка покупок.
+
+    Сам файл отдается потоком в обход рендерера,
+    через render проходят только ответы с ошибками.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+
+class PlainTextRenderer(ShoppingCartRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CSVRenderer(ShoppingCartRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class PDFRenderer(ShoppingCartRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+
+
+SHOPPING_CART_RENDERERS = (
+    PlainTextRenderer,
+    CSVRenderer,
+    JSONRenderer,
+    PDFRenderer,
+)
@@ -1,12 +1,19 @@
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from djoser.serializers import UserSerializer
-from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
 from foodgram import constants
+from recipe.cook_index import reindex_recipe
 from recipe.models import (FavoriteRecipe, Ingredient, IngredientQuantity,
-                           Recipe, ShoppingCart, Tag)
+                           Recipe, RecipeTag, ShoppingCart, ShoppingListItem,
+                           Tag)
 from users.models import Follow
 
+from .cache import invalidate_recipes
+from .fields import (BulkPrimaryKeyListField, BulkRelatedListSerializer,
+                     ImageVariantsField, RecipeImageField)
+
 
 class CustomUserSerializer(UserSerializer):
     """
@@ -21,11 +28,23 @@ class CustomUserSerializer(UserSerializer):
             'username',
             'first_name',
             'last_name',
-            'is_subscribed'
+            'is_subscribed',
+            'recipes_count',
+            'followers_count',
+        )
+        read_only_fields = (
+            'is_subscribed',
+            'recipes_count',
+            'followers_count',
         )
-        read_only_fields = ('is_subscribed',)
 
     def get_is_subscribed(self, author):
+        """
+        Берет значение из аннотации queryset'а,
+        если она есть, иначе делает запрос в БД.
+        """
+        if hasattr(author, 'is_subscribed'):
+            return author.is_subscribed
         request = self.context.get('request')
         return (request and request.user.is_authenticated
                 and author.following.filter(user=request.user).exists())
@@ -103,6 +122,7 @@ class RecipeSerializer(serializers.ModelSerializer):
     tags = TagSerializer(many=True)
     is_favorited = serializers.BooleanField(read_only=True)
     is_in_shopping_cart = serializers.BooleanField(read_only=True)
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -120,11 +140,49 @@ class RecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
+            'favorites_count',
+            'in_carts_count',
+        )
+
+    def to_representation(self, recipe):
+        """
+        Передает автору аннотацию подписки,
+        чтобы не делать запрос на каждого автора.
+        """
+        if hasattr(recipe, 'author_is_subscribed'):
+            recipe.author.is_subscribed = recipe.author_is_subscribed
+        return super().to_representation(recipe)
+
+
+class CookableRecipeSerializer(RecipeSerializer):
+    """
+    Рецепт в поиске по ингредиентам в наличии: доля имеющихся
+    ингредиентов и ингредиенты, которых не хватает.
+    """
+    coverage = serializers.FloatField(read_only=True)
+    missing_ingredients = IngredientSerializer(many=True, read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + (
+            'coverage',
+            'missing_ingredients',
         )
 
 
+class CreateRecipeIngredientsListSerializer(BulkRelatedListSerializer):
+    """
+    Загружает все ингредиенты рецепта одним запросом.
+    """
+    related_field = 'ingredient'
+    queryset = Ingredient.objects.all()
+    default_error_messages = {
+        'does_not_exist': 'Ингредиенты с id {pk_values} не существуют.',
+    }
+
+
 class CreateRecipeIngredientsSerializer(serializers.ModelSerializer):
     """
     Сериализатор для создания связи Рецепта и Количества ингредиента.
@@ -132,10 +190,7 @@ class CreateRecipeIngredientsSerializer(serializers.ModelSerializer):
     - id: Поле связи с ингредиентом по его ID.
     - amount: Количество ингредиента в рецепте.
     """
-    id = serializers.PrimaryKeyRelatedField(
-        source='ingredient',
-        queryset=Ingredient.objects.all()
-    )
+    id = serializers.IntegerField(source='ingredient', min_value=1)
     amount = serializers.IntegerField(
         min_value=constants.MIN_INGREDIENT_AMOUNT,
         max_value=constants.MAX_INGREDIENT_AMOUNT,
@@ -143,6 +198,7 @@ class CreateRecipeIngredientsSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = IngredientQuantity
+        list_serializer_class = CreateRecipeIngredientsListSerializer
         fields = (
             'id',
             'amount',
@@ -154,11 +210,13 @@ class CreateUpdateRecipeSerializer(serializers.ModelSerializer):
     Сериализатор для создания и обновления Рецепта.
     """
     ingredients = CreateRecipeIngredientsSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True,
+    tags = BulkPrimaryKeyListField(
         queryset=Tag.objects.all(),
+        error_messages={
+            'does_not_exist': 'Тэги с id {pk_values} не существуют.',
+        },
     )
-    image = Base64ImageField(required=True)
+    image = RecipeImageField(required=True)
     cooking_time = serializers.IntegerField(
         min_value=constants.MIN_COOKING_TIME,
         max_value=constants.MAX_COOKING_TIME,
@@ -178,7 +236,14 @@ class CreateUpdateRecipeSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         """
         Преобразует объект рецепта в данные для сериализации.
+        Ингредиенты и тэги загружаются заранее,
+        чтобы не делать запрос на каждый ингредиент.
         """
+        prefetch_related_objects(
+            [instance],
+            'recipe_ingredient__ingredient',
+            'tags',
+        )
         return RecipeSerializer(instance, context=self.context).data
 
     @staticmethod
@@ -196,6 +261,12 @@ class CreateUpdateRecipeSerializer(serializers.ModelSerializer):
             )
         ]
         IngredientQuantity.objects.bulk_create(ingredient_quantities)
+        reindex_recipe(
+            recipe.id,
+            (),
+            [ingredient['ingredient'].id for ingredient in ingredients],
+        )
+        transaction.on_commit(lambda: invalidate_recipes([recipe.id]))
 
     def create(self, validated_data):
         """
@@ -206,33 +277,138 @@ class CreateUpdateRecipeSerializer(serializers.ModelSerializer):
         recipe_author = self.context.get('request').user
         recipe = Recipe.objects.create(author=recipe_author, **validated_data)
         self.recipe_ingredients_tags_save(recipe, ingredients, tags)
+        # Счетчик увеличен в БД сигналом, а автор - это request.user,
+        # загруженный до создания рецепта.
+        recipe.author.refresh_from_db(fields=['recipes_count'])
         return recipe
 
+    @staticmethod
+    def update_ingredients(recipe, existing, ingredients):
+        """
+        Сравнивает новые ингредиенты с сохраненными и выполняет
+        только нужные вставки, удаления и изменения количества.
+        existing - {ingredient_id: IngredientQuantity}, прочитанные
+        после блокировки рецепта. Возвращает изменения количества
+        {ingredient_id: delta} для списков покупок.
+        """
+        amounts = {
+            ingredient['ingredient'].id: ingredient['amount']
+            for ingredient in ingredients
+        }
+        amount_deltas = {}
+        to_create, to_update = [], []
+        for ingredient in sorted(
+            ingredients,
+            key=lambda x: x['ingredient'].name,
+        ):
+            ingredient_id = ingredient['ingredient'].id
+            if ingredient_id not in existing:
+                to_create.append(IngredientQuantity(
+                    recipe=recipe,
+                    ingredient=ingredient['ingredient'],
+                    amount=ingredient['amount'],
+                ))
+                amount_deltas[ingredient_id] = ingredient['amount']
+        to_delete = []
+        for ingredient_id, item in existing.items():
+            if ingredient_id not in amounts:
+                to_delete.append(item.pk)
+                amount_deltas[ingredient_id] = -item.amount
+            elif amounts[ingredient_id] != item.amount:
+                amount_deltas[ingredient_id] = (
+                    amounts[ingredient_id] - item.amount
+                )
+                item.amount = amounts[ingredient_id]
+                to_update.append(item)
+        if to_delete:
+            IngredientQuantity.objects.filter(pk__in=to_delete).delete()
+        if to_update:
+            IngredientQuantity.objects.bulk_update(to_update, ('amount',))
+        if to_create:
+            IngredientQuantity.objects.bulk_create(to_create)
+        return amount_deltas
+
+    @staticmethod
+    def update_tags(recipe, tags):
+        existing = {tag.id for tag in recipe.tags.all()}
+        new = {tag.id for tag in tags}
+        if existing - new:
+            RecipeTag.objects.filter(
+                recipe=recipe,
+                tag_id__in=existing - new,
+            ).delete()
+        if new - existing:
+            RecipeTag.objects.bulk_create(
+                RecipeTag(recipe=recipe, tag_id=tag_id)
+                for tag_id in new - existing
+            )
+
     def update(self, recipe, validated_data):
         """
         Метод обновляет существующий рецепт.
+
+        Записываются только изменившиеся поля и строки связей,
+        поэтому PATCH без изменений не пишет в БД.
+
+        Перед изменением ингредиентов строка рецепта блокируется,
+        а сохраненные ингредиенты перечитываются в транзакции:
+        набор, загруженный представлением заранее, мог устареть
+        из-за параллельного изменения рецепта или добавления в корзину.
         """
-        ingredients = validated_data.pop('ingredients', [])
-        tags = validated_data.pop('tags', [])
-        recipe.ingredients.clear()
-        self.recipe_ingredients_tags_save(recipe, ingredients, tags)
-        return super().update(recipe, validated_data)
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        changed_fields = [
+            field for field, value in validated_data.items()
+            if getattr(recipe, field) != value
+        ]
+        with transaction.atomic():
+            if ingredients is not None:
+                Recipe.objects.lock(recipe.id)
+                existing = {
+                    item.ingredient_id: item
+                    for item in IngredientQuantity.objects.filter(
+                        recipe_id=recipe.id,
+                    )
+                }
+                old_ids = list(existing)
+                ShoppingListItem.objects.change_recipe(
+                    recipe.id,
+                    self.update_ingredients(recipe, existing, ingredients),
+                )
+                reindex_recipe(recipe.id, old_ids, [
+                    ingredient['ingredient'].id for ingredient in ingredients
+                ])
+            if tags is not None:
+                self.update_tags(recipe, tags)
+            if ingredients is not None or tags is not None:
+                transaction.on_commit(
+                    lambda: invalidate_recipes([recipe.id])
+                )
+            if changed_fields:
+                for field in changed_fields:
+                    setattr(recipe, field, validated_data[field])
+                recipe.save(update_fields=changed_fields)
+        return recipe
 
     def validate(self, recipe):
-        ingredients = recipe['ingredients']
-        tags = recipe['tags']
-        if not tags:
-            raise serializers.ValidationError('Тэги не указаны!')
-        if len(tags) != len(set(tags)):
-            raise serializers.ValidationError('Тэги должны быть уникальны!')
-        if not ingredients:
-            raise serializers.ValidationError('Ингридиенты не указаны!')
-        if len(ingredients) != len(
-                {ingredient['ingredient'] for ingredient in ingredients}
-        ):
-            raise serializers.ValidationError(
-                'Ингридиенты должны быть уникальны!'
-            )
+        ingredients = recipe.get('ingredients')
+        tags = recipe.get('tags')
+        if tags is not None:
+            if not tags:
+                raise serializers.ValidationError('Тэги не указаны!')
+            if len(tags) != len(set(tags)):
+                raise serializers.ValidationError(
+                    'Тэги должны быть уникальны!'
+                )
+        if ingredients is not None:
+            if not ingredients:
+                raise serializers.ValidationError('Ингридиенты не указаны!')
+            if len(ingredients) != len(
+                    {ingredient['ingredient'] for ingredient in ingredients}
+            ):
+                raise serializers.ValidationError(
+                    'Ингридиенты должны быть уникальны!'
+                )
         return recipe
 
 
@@ -240,6 +416,7 @@ class SubscriptionAuthorRecipesSerializer(serializers.ModelSerializer):
     """
     Сериализатор для чтения Подписки на Автора рецепта
     """
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -248,6 +425,7 @@ class SubscriptionAuthorRecipesSerializer(serializers.ModelSerializer):
             'id',
             'name',
             'image',
+            'image_variants',
             'cooking_time',
         )
 
@@ -289,6 +467,14 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
                 'Этот рецепт уже в корзине.')
         return attrs
 
+    def create(self, validated_data):
+        """
+        Добавление в корзину и пересчет списка покупок
+        выполняются в одной транзакции.
+        """
+        with transaction.atomic():
+            return super().create(validated_data)
+
     def to_representation(self, instance):
         return SubscriptionAuthorRecipesSerializer(
             instance.recipe,
@@ -301,7 +487,6 @@ class UserSubscriptionSerializer(CustomUserSerializer):
     Сериализатор для чтения подписок Юзера.
     """
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.ReadOnlyField(source='recipe.count')
 
     class Meta(CustomUserSerializer.Meta):
         fields = (
@@ -313,24 +498,39 @@ class UserSubscriptionSerializer(CustomUserSerializer):
             'is_subscribed',
             'recipes',
             'recipes_count',
+            'followers_count',
         )
 
-    def get_recipes(self, user):
+    @staticmethod
+    def get_recipes_limit(request):
         """
-        Метод отдает все рецепты Автора
-        на которого подписан юзер.
-
         Recipes_limit: ограничение кол-ва
         рецептов автора в выдаче.
         """
-        request = self.context.get('request')
         try:
-            recipes_limit = int(request.GET.get('recipes_limit', 0))
+            return int(request.GET.get('recipes_limit', 0))
         except (ValueError, TypeError) as error:
             raise error
-        queryset = user.recipe.all()
+
+    def get_recipes(self, user):
+        """
+        Метод отдает все рецепты Автора
+        на которого подписан юзер.
+
+        Берет рецепты, предзагруженные в limited_recipes,
+        если они есть, иначе делает запрос в БД.
+        """
+        if hasattr(user, 'limited_recipes'):
+            queryset = user.limited_recipes
+        else:
+            queryset = user.recipe.all()
+            recipes_limit = self.get_recipes_limit(
+                self.context.get('request')
+            )
+            if recipes_limit:
+                queryset = queryset[:recipes_limit]
         return SubscriptionAuthorRecipesSerializer(
-            queryset[:recipes_limit] if recipes_limit else queryset,
+            queryset,
             many=True,
         ).data
 
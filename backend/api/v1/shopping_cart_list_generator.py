@@ -1,18 +1,96 @@
-from io import BytesIO
+import csv
+import json
 
-from django.http import FileResponse
+from django.conf import settings
+from django.http import StreamingHttpResponse
 
+from .shopping_cart_pdf import StreamingPDFWriter, load_font
 
-def generate_shopping_cart_file(queryset):
-    cart_list = BytesIO()
-    for ingredient in queryset:
-        line = (
-            f'{ingredient["ingredient__name"]}: '
-            f'{ingredient["amount"]}'
-            f'{ingredient["ingredient__measurement_unit"]}\n'
+SHOPPING_CART_FILENAME = 'your_shopping_list'
+CSV_HEADER = ('name', 'amount', 'measurement_unit')
+
+
+class Echo:
+    """
+    Объект с интерфейсом файла для csv.writer,
+    который возвращает строку вместо записи в буфер.
+    """
+
+    def write(self, value):
+        return value
+
+
+def format_line(ingredient):
+    return (
+        f'{ingredient["ingredient__name"]}: '
+        f'{ingredient["amount"]}'
+        f'{ingredient["ingredient__measurement_unit"]}'
+    )
+
+
+def generate_txt(ingredients):
+    for ingredient in ingredients:
+        yield f'{format_line(ingredient)}\n'.encode('utf-8')
+
+
+def generate_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER).encode('utf-8')
+    for ingredient in ingredients:
+        yield writer.writerow((
+            ingredient['ingredient__name'],
+            ingredient['amount'],
+            ingredient['ingredient__measurement_unit'],
+        )).encode('utf-8')
+
+
+def generate_json(ingredients):
+    separator = ''
+    yield b'['
+    for ingredient in ingredients:
+        item = json.dumps(
+            {
+                'name': ingredient['ingredient__name'],
+                'amount': ingredient['amount'],
+                'measurement_unit': ingredient[
+                    'ingredient__measurement_unit'
+                ],
+            },
+            ensure_ascii=False,
         )
-        cart_list.write(line.encode('utf-8'))
-    cart_list.seek(0)
-    return FileResponse(
-        cart_list, content_type='text/plain', filename='your_shopping_list.txt'
+        yield f'{separator}{item}'.encode('utf-8')
+        separator = ','
+    yield b']'
+
+
+def generate_pdf(ingredients):
+    writer = StreamingPDFWriter(load_font(settings.SHOPPING_CART_PDF_FONT))
+    return writer.generate(
+        format_line(ingredient) for ingredient in ingredients
+    )
+
+
+SHOPPING_CART_FORMATS = {
+    'txt': ('text/plain; charset=utf-8', generate_txt),
+    'csv': ('text/csv; charset=utf-8', generate_csv),
+    'json': ('application/json', generate_json),
+    'pdf': ('application/pdf', generate_pdf),
+}
+
+
+def generate_shopping_cart_file(queryset, file_format='txt'):
+    """
+    Отдает список покупок потоком.
+
+    Строки читаются из БД через iterator(), поэтому
+    список целиком не загружается в память.
+    """
+    content_type, generator = SHOPPING_CART_FORMATS[file_format]
+    response = StreamingHttpResponse(
+        generator(queryset.iterator()),
+        content_type=content_type,
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{SHOPPING_CART_FILENAME}.{file_format}"'
     )
+    return response
@@ -0,0 +1,291 @@
+import textwrap
+import zlib
+from functools import lru_cache
+from struct import unpack_from
+
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 50
+FONT_SIZE = 11
+LINE_HEIGHT = 16
+TITLE = 'Список покупок'
+
+CATALOG_ID = 1
+PAGES_ID = 2
+FONT_ID = 3
+CID_FONT_ID = 4
+FONT_DESCRIPTOR_ID = 5
+FONT_FILE_ID = 6
+TO_UNICODE_ID = 7
+FIRST_PAGE_ID = 8
+
+BFCHAR_BLOCK_SIZE = 100
+
+
+class TrueTypeFont:
+    """
+    Минимальный читатель TrueType-шрифта.
+
+    Достает из файла только то, что нужно для встраивания шрифта в PDF:
+    таблицу cmap (формат 4) для перевода символов в номера глифов
+    и метрики моноширинного шрифта.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as font_file:
+            self.data = font_file.read()
+        self.tables = self._read_tables()
+        head = self.tables['head']
+        self.units_per_em = unpack_from('>H', self.data, head + 18)[0]
+        self.bbox = [
+            self._scale(value)
+            for value in unpack_from('>4h', self.data, head + 36)
+        ]
+        hhea = self.tables['hhea']
+        ascent, descent = unpack_from('>2h', self.data, hhea + 4)
+        self.ascent = self._scale(ascent)
+        self.descent = self._scale(descent)
+        self.width = self._scale(
+            unpack_from('>H', self.data, self.tables['hmtx'])[0]
+        )
+        self.cmap = self._read_cmap()
+        self.compressed_data = zlib.compress(self.data)
+
+    def _scale(self, value):
+        return round(value * 1000 / self.units_per_em)
+
+    def _read_tables(self):
+        num_tables = unpack_from('>H', self.data, 4)[0]
+        tables = {}
+        for index in range(num_tables):
+            tag, _, offset, _ = unpack_from(
+                '>4sIII', self.data, 12 + index * 16
+            )
+            tables[tag.decode('latin-1')] = offset
+        return tables
+
+    def _read_cmap(self):
+        cmap = self.tables['cmap']
+        num_subtables = unpack_from('>H', self.data, cmap + 2)[0]
+        for index in range(num_subtables):
+            platform, encoding, offset = unpack_from(
+                '>HHI', self.data, cmap + 4 + index * 8
+            )
+            subtable = cmap + offset
+            if (
+                (platform, encoding) == (3, 1)
+                and unpack_from('>H', self.data, subtable)[0] == 4
+            ):
+                return self._read_cmap_format_4(subtable)
+        raise ValueError('В шрифте нет таблицы cmap формата 4.')
+
+    def _read_cmap_format_4(self, subtable):
+        seg_count = unpack_from('>H', self.data, subtable + 6)[0] // 2
+        end_codes = subtable + 14
+        start_codes = end_codes + seg_count * 2 + 2
+        id_deltas = start_codes + seg_count * 2
+        id_range_offsets = id_deltas + seg_count * 2
+        cmap = {}
+        for segment in range(seg_count):
+            end = unpack_from('>H', self.data, end_codes + segment * 2)[0]
+            start = unpack_from('>H', self.data, start_codes + segment * 2)[0]
+            delta = unpack_from('>h', self.data, id_deltas + segment * 2)[0]
+            range_offset_position = id_range_offsets + segment * 2
+            range_offset = unpack_from(
+                '>H', self.data, range_offset_position
+            )[0]
+            for code in range(start, min(end, 0xFFFE) + 1):
+                if range_offset:
+                    glyph = unpack_from(
+                        '>H',
+                        self.data,
+                        range_offset_position
+                        + range_offset
+                        + (code - start) * 2,
+                    )[0]
+                    if glyph:
+                        glyph = (glyph + delta) % 0x10000
+                else:
+                    glyph = (code + delta) % 0x10000
+                if glyph:
+                    cmap[chr(code)] = glyph
+        return cmap
+
+
+@lru_cache(maxsize=None)
+def load_font(path):
+    """
+    Шрифт читается один раз на процесс.
+    """
+    return TrueTypeFont(path)
+
+
+class StreamingPDFWriter:
+    """
+    Формирует PDF постранично.
+
+    Каждая страница отдается сразу после заполнения,
+    в памяти хранятся только смещения объектов для таблицы xref.
+    Объекты, которые зависят от всего документа (дерево страниц,
+    ToUnicode-карта использованных глифов), пишутся в конце файла.
+    """
+
+    def __init__(self, font):
+        self.font = font
+        self.offsets = {}
+        self.position = 0
+        self.page_ids = []
+        self.used_glyphs = {}
+        self.lines_per_page = (PAGE_HEIGHT - 2 * MARGIN) // LINE_HEIGHT
+        self.chars_per_line = int(
+            (PAGE_WIDTH - 2 * MARGIN) * 1000 / (font.width * FONT_SIZE)
+        )
+
+    def _write(self, data):
+        self.position += len(data)
+        return data
+
+    def _object(self, object_id, body):
+        self.offsets[object_id] = self.position
+        return self._write(
+            f'{object_id} 0 obj\n'.encode() + body + b'\nendobj\n'
+        )
+
+    def _stream(self, object_id, data, extra=''):
+        return self._object(
+            object_id,
+            f'<< /Length {len(data)} /Filter /FlateDecode {extra}>>\n'
+            f'stream\n'.encode() + data + b'\nendstream',
+        )
+
+    def _encode(self, text):
+        glyphs = []
+        for char in text:
+            glyph = self.font.cmap.get(char, 0)
+            if glyph:
+                self.used_glyphs[glyph] = char
+            glyphs.append(f'{glyph:04X}')
+        return ''.join(glyphs)
+
+    def _header(self):
+        font = self.font
+        yield self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        yield self._object(
+            CATALOG_ID,
+            f'<< /Type /Catalog /Pages {PAGES_ID} 0 R >>'.encode(),
+        )
+        yield self._object(
+            FONT_ID,
+            f'<< /Type /Font /Subtype /Type0 /BaseFont /ShoppingListFont '
+            f'/Encoding /Identity-H /DescendantFonts [{CID_FONT_ID} 0 R] '
+            f'/ToUnicode {TO_UNICODE_ID} 0 R >>'.encode(),
+        )
+        yield self._object(
+            CID_FONT_ID,
+            f'<< /Type /Font /Subtype /CIDFontType2 '
+            f'/BaseFont /ShoppingListFont '
+            f'/CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) '
+            f'/Supplement 0 >> /FontDescriptor {FONT_DESCRIPTOR_ID} 0 R '
+            f'/DW {font.width} /CIDToGIDMap /Identity >>'.encode(),
+        )
+        yield self._object(
+            FONT_DESCRIPTOR_ID,
+            f'<< /Type /FontDescriptor /FontName /ShoppingListFont '
+            f'/Flags 5 /FontBBox [{" ".join(map(str, font.bbox))}] '
+            f'/ItalicAngle 0 /Ascent {font.ascent} /Descent {font.descent} '
+            f'/CapHeight {font.ascent} /StemV 80 '
+            f'/FontFile2 {FONT_FILE_ID} 0 R >>'.encode(),
+        )
+        yield self._stream(
+            FONT_FILE_ID,
+            font.compressed_data,
+            f'/Length1 {len(font.data)} ',
+        )
+
+    def _page(self, lines):
+        content_id = FIRST_PAGE_ID + len(self.page_ids) * 2
+        page_id = content_id + 1
+        self.page_ids.append(page_id)
+        commands = [
+            f'BT /F1 {FONT_SIZE} Tf {LINE_HEIGHT} TL '
+            f'{MARGIN} {PAGE_HEIGHT - MARGIN} Td'
+        ]
+        commands.extend(f'<{self._encode(line)}> Tj T*' for line in lines)
+        commands.append('ET')
+        yield self._stream(
+            content_id,
+            zlib.compress('\n'.join(commands).encode()),
+        )
+        yield self._object(
+            page_id,
+            f'<< /Type /Page /Parent {PAGES_ID} 0 R '
+            f'/MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] '
+            f'/Resources << /Font << /F1 {FONT_ID} 0 R >> >> '
+            f'/Contents {content_id} 0 R >>'.encode(),
+        )
+
+    def _to_unicode(self):
+        glyphs = sorted(self.used_glyphs.items())
+        blocks = []
+        for start in range(0, len(glyphs), BFCHAR_BLOCK_SIZE):
+            block = glyphs[start:start + BFCHAR_BLOCK_SIZE]
+            blocks.append(f'{len(block)} beginbfchar')
+            blocks.extend(
+                f'<{glyph:04X}> <{ord(char):04X}>' for glyph, char in block
+            )
+            blocks.append('endbfchar')
+        cmap = '\n'.join((
+            '/CIDInit /ProcSet findresource begin',
+            '12 dict begin',
+            'begincmap',
+            '/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) '
+            '/Supplement 0 >> def',
+            '/CMapName /Adobe-Identity-UCS def',
+            '/CMapType 2 def',
+            '1 begincodespacerange',
+            '<0000> <FFFF>',
+            'endcodespacerange',
+            *blocks,
+            'endcmap',
+            'CMapName currentdict /CMapName get exch defineresource pop',
+            'end',
+            'end',
+        ))
+        return self._stream(TO_UNICODE_ID, zlib.compress(cmap.encode()))
+
+    def _trailer(self):
+        yield self._to_unicode()
+        kids = ' '.join(f'{page_id} 0 R' for page_id in self.page_ids)
+        yield self._object(
+            PAGES_ID,
+            f'<< /Type /Pages /Kids [{kids}] '
+            f'/Count {len(self.page_ids)} >>'.encode(),
+        )
+        xref_position = self.position
+        size = max(self.offsets) + 1
+        xref = [f'xref\n0 {size}\n', '0000000000 65535 f \n']
+        xref.extend(
+            f'{self.offsets[object_id]:010d} 00000 n \n'
+            if object_id in self.offsets else '0000000000 65535 f \n'
+            for object_id in range(1, size)
+        )
+        xref.append(
+            f'trailer\n<< /Size {size} /Root {CATALOG_ID} 0 R >>\n'
+            f'startxref\n{xref_position}\n%%EOF\n'
+        )
+        yield self._write(''.join(xref).encode())
+
+    def generate(self, lines):
+        """
+        Генератор байтов PDF-документа из итератора строк.
+        """
+        yield from self._header()
+        page = [TITLE, '']
+        for line in lines:
+            for part in textwrap.wrap(line, self.chars_per_line) or ['']:
+                if len(page) == self.lines_per_page:
+                    yield from self._page(page)
+                    page = []
+                page.append(part)
+        yield from self._page(page)
+        yield from self._trailer()
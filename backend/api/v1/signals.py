@@ -0,0 +1,58 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipe.images import image_processed
+from recipe.models import Ingredient, Recipe, Tag
+from users.models import User
+
+from .cache import invalidate, invalidate_recipes
+
+# Поля пользователя, которые входят в закешированное представление
+# его рецептов. Счетчики подставляются при каждом запросе.
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tags(sender, **kwargs):
+    """
+    Версия сдвигается после коммита, иначе параллельный запрос
+    закеширует под новой версией данные до изменения.
+    """
+    transaction.on_commit(lambda: invalidate('tags'))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredients(sender, **kwargs):
+    transaction.on_commit(lambda: invalidate('ingredients'))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    """
+    Кеш сбрасывается после коммита, чтобы параллельный запрос
+    не положил в него данные до изменения. Тэги и ингредиенты
+    админка сохраняет в той же транзакции, что и рецепт,
+    а изменения только их через API сбрасывает сериализатор.
+    """
+    recipe_id = instance.pk
+    transaction.on_commit(lambda: invalidate_recipes([recipe_id]))
+
+
+@receiver(image_processed, sender=Recipe)
+def invalidate_recipe_image(sender, recipe_id, **kwargs):
+    invalidate_recipes([recipe_id])
+
+
+@receiver(post_save, sender=User)
+def invalidate_author_recipes(sender, instance, update_fields, **kwargs):
+    if update_fields is not None and not AUTHOR_FIELDS & set(update_fields):
+        return
+    recipe_ids = list(
+        Recipe.objects.filter(author=instance).values_list('pk', flat=True)
+    )
+    if recipe_ids:
+        transaction.on_commit(lambda: invalidate_recipes(recipe_ids))
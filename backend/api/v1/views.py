@@ -1,22 +1,35 @@
-from django.db.models import Sum
+from django.conf import settings
+from django.db.models import F, Prefetch
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.filters import SearchFilter
-from rest_framework.permissions import AllowAny
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
 from rest_framework.viewsets import ModelViewSet
 
-from recipe.models import (FavoriteRecipe, Ingredient, IngredientQuantity,
-                           Recipe, ShoppingCart, Tag)
+from recipe.cook_index import match_recipes
+from recipe.feed import read_feed
+from recipe.models import (FavoriteRecipe, Ingredient, Recipe, ShoppingCart,
+                           ShoppingListItem, Tag)
 from users.models import Follow, User
 
 from .filters import RecipeFilterSet
-from .paginators import CustomPageNumberPaginator
+from .ingredient_search import search_ingredients
+from .mixins import CachedListMixin
+from .parsers import RecipeMultiPartParser
+from .paginators import (CustomPageNumberPaginator, FeedPaginator,
+                         RecipePaginator, SubscriptionPaginator)
 from .permissions import AuthorOrReadOnly
-from .serializers import (CreateUpdateRecipeSerializer,
+from .recipe_cache import recipe_payloads
+from .renderers import SHOPPING_CART_RENDERERS
+from .serializers import (CookableRecipeSerializer,
+                          CreateUpdateRecipeSerializer,
                           CreateUserSubscriptionSerializer, FavoriteSerializer,
                           IngredientSerializer, RecipeSerializer,
                           ShoppingCartSerializer, TagSerializer,
@@ -25,10 +38,16 @@ from .shopping_cart_list_generator import generate_shopping_cart_file
 
 
 class DjoserCustomUserViewSet(UserViewSet):
+    replica_reads = True
     queryset = User.objects.all()
     permission_classes = (AllowAny,)
     pagination_class = CustomPageNumberPaginator
 
+    def get_queryset(self):
+        return super().get_queryset().annotate_is_subscribed(
+            self.request.user.id
+        )
+
     @action(methods=['post'], detail=True)
     def subscribe(self, request, id=None):
         serializer = CreateUserSubscriptionSerializer(
@@ -44,9 +63,28 @@ class DjoserCustomUserViewSet(UserViewSet):
         get_object_or_404(Follow, user=request.user, author_id=id).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
-    @action(methods=['GET'], detail=False)
+    @action(
+        methods=['GET'],
+        detail=False,
+        pagination_class=SubscriptionPaginator,
+    )
     def subscriptions(self, request):
-        subscriptions = User.objects.filter(following__user=request.user)
+        recipes_limit = UserSubscriptionSerializer.get_recipes_limit(request)
+        subscriptions = User.objects.filter(
+            following__user=request.user
+        ).annotate_is_subscribed(
+            request.user.id
+        ).prefetch_related(
+            Prefetch(
+                'recipe',
+                queryset=Recipe.objects.limit_per_author(
+                    recipes_limit,
+                ).defer('search_vector'),
+                to_attr='limited_recipes',
+            )
+        ).order_by(
+            *User._meta.ordering
+        )
         paginated_subscription = self.paginate_queryset(subscriptions)
         serializer = UserSubscriptionSerializer(
             paginated_subscription,
@@ -56,7 +94,10 @@ class DjoserCustomUserViewSet(UserViewSet):
         return self.get_paginated_response(serializer.data)
 
 
-class IngredientViewSet(ModelViewSet):
+class IngredientViewSet(CachedListMixin, ModelViewSet):
+    replica_reads = True
+    cache_namespace = 'ingredients'
+    cache_params = (api_settings.SEARCH_PARAM,)
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = [AllowAny]
@@ -64,8 +105,28 @@ class IngredientViewSet(ModelViewSet):
     filter_backends = (SearchFilter,)
     search_fields = ('$name',)
 
+    @action(methods=['get'], detail=False)
+    def search(self, request):
+        """
+        Поиск ингредиентов для автодополнения по параметру ?name=.
+        Совпадения по началу названия идут первыми,
+        затем по подстроке и похожие названия.
+        """
+        try:
+            limit = int(request.query_params.get(
+                'limit', settings.INGREDIENT_SEARCH_LIMIT
+            ))
+        except ValueError:
+            limit = settings.INGREDIENT_SEARCH_LIMIT
+        limit = min(max(limit, 1), settings.INGREDIENT_SEARCH_MAX_LIMIT)
+        return Response(
+            search_ingredients(request.query_params.get('name', ''), limit)
+        )
+
 
-class TagViewSet(ModelViewSet):
+class TagViewSet(CachedListMixin, ModelViewSet):
+    replica_reads = True
+    cache_namespace = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = [AllowAny]
@@ -73,14 +134,33 @@ class TagViewSet(ModelViewSet):
 
 
 class RecipeViewSet(ModelViewSet):
+    replica_reads = True
     permission_classes = (AuthorOrReadOnly,)
+    pagination_class = RecipePaginator
+    parser_classes = (JSONParser, RecipeMultiPartParser)
     http_method_names = ['get', 'patch', 'delete', 'post']
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilterSet
 
+    # Действия, которые собирают ответ из кеша рецептов
+    # (recipe_cache.py) и выбирают только строки рецептов.
+    cached_actions = ('list', 'retrieve', 'feed')
+
     def get_queryset(self):
+        if self.action in self.cached_actions:
+            return Recipe.objects.select_related(
+                'author',
+            ).defer(
+                'text',
+                'search_vector',
+                'image_variants',
+            ).annotate_user_fields(
+                self.request.user.id
+            )
         return Recipe.objects.select_related(
             'author',
+        ).defer(
+            'search_vector',
         ).prefetch_related(
             'recipe_ingredient__ingredient',
             'tags',
@@ -88,22 +168,127 @@ class RecipeViewSet(ModelViewSet):
             self.request.user.id
         )
 
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset())
+        )
+        return self.get_paginated_response(recipe_payloads(page, request))
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(recipe_payloads([self.get_object()], request)[0])
+
     def get_serializer_class(self):
         if self.action in ['create', 'partial_update']:
             return CreateUpdateRecipeSerializer
         return RecipeSerializer
 
-    @action(methods=['get'], detail=False)
+    @action(
+        methods=['get'],
+        detail=False,
+        renderer_classes=SHOPPING_CART_RENDERERS,
+    )
     def download_shopping_cart(self, request):
-        ingredients = IngredientQuantity.objects.filter(
-            recipe__shopping_cart__user_id=request.user.id
+        """
+        Отдает список покупок в формате из параметра ?format=
+        (txt, csv, json или pdf), по умолчанию txt.
+        """
+        ingredients = ShoppingListItem.objects.filter(
+            user_id=request.user.id
         ).values(
             'ingredient__name',
             'ingredient__measurement_unit',
-        ).annotate(
-            amount=Sum('amount')
+            amount=F('total_amount'),
         ).order_by('ingredient__name')
-        return generate_shopping_cart_file(ingredients)
+        return generate_shopping_cart_file(
+            ingredients,
+            request.accepted_renderer.format,
+        )
+
+    @action(methods=['get'], detail=False)
+    def can_cook(self, request):
+        """
+        Рецепты по ингредиентам в наличии ?ingredients=1,2&ingredients=3,
+        от рецептов, для которых есть все ингредиенты, к тем,
+        для которых есть меньшая их доля. Рецепты подбираются
+        по индексу ингредиент -> рецепты (recipe/cook_index.py).
+        """
+        ingredient_ids = self.get_ingredient_ids(request)
+        try:
+            limit = int(request.query_params.get(
+                'limit', settings.CAN_COOK_LIMIT
+            ))
+        except ValueError:
+            limit = settings.CAN_COOK_LIMIT
+        limit = min(max(limit, 1), settings.CAN_COOK_MAX_LIMIT)
+        count, matches = match_recipes(ingredient_ids, limit)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in matches]
+        )
+        results = []
+        for recipe_id, matched, total in matches:
+            recipe = recipes.get(recipe_id)
+            if recipe is None:
+                continue
+            recipe.coverage = round(matched / total, 4)
+            recipe.missing_ingredients = [
+                item.ingredient for item in recipe.recipe_ingredient.all()
+                if item.ingredient_id not in ingredient_ids
+            ]
+            results.append(recipe)
+        return Response({
+            'count': count,
+            'results': CookableRecipeSerializer(
+                results,
+                many=True,
+                context=self.get_serializer_context(),
+            ).data,
+        })
+
+    @action(
+        methods=['get'],
+        detail=False,
+        permission_classes=[IsAuthenticated],
+    )
+    def feed(self, request):
+        """
+        Рецепты авторов из подписок, от новых к старым,
+        с курсорной пагинацией ?cursor=&limit=.
+        """
+        paginator = FeedPaginator()
+        keys = paginator.paginate_keys(
+            lambda limit, cursor: read_feed(request.user.id, limit, cursor),
+            request,
+        )
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for _, recipe_id in keys]
+        )
+        return paginator.get_paginated_response(recipe_payloads(
+            [
+                recipes[recipe_id] for _, recipe_id in keys
+                if recipe_id in recipes
+            ],
+            request,
+        ))
+
+    @staticmethod
+    def get_ingredient_ids(request):
+        try:
+            ingredient_ids = {
+                int(value)
+                for values in request.query_params.getlist('ingredients')
+                for value in values.split(',') if value.strip()
+            }
+        except ValueError:
+            raise ValidationError(
+                {'ingredients': ['Укажите id ингредиентов числами.']}
+            )
+        if not ingredient_ids:
+            raise ValidationError({'ingredients': ['Ингредиенты не указаны.']})
+        if len(ingredient_ids) > settings.CAN_COOK_MAX_INGREDIENTS:
+            raise ValidationError({'ingredients': [
+                f'Не больше {settings.CAN_COOK_MAX_INGREDIENTS} ингредиентов.'
+            ]})
+        return ingredient_ids
 
     @staticmethod
     def create_instance(serializer, pk, request):
@@ -0,0 +1,208 @@
+import random
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+
+from api.v1.cache import invalidate
+from recipe.models import (FavoriteRecipe, Ingredient, IngredientQuantity,
+                           Recipe, RecipeTag, ShoppingCart, Tag)
+from recipe.search import fill_search_vectors
+from users.models import Follow, User
+
+USERNAME_PREFIX = 'bench_'
+PASSWORD = 'benchmark-password'
+TAGS_COUNT = 10
+INGREDIENTS_COUNT = 500
+
+
+def zipf_weights(size, skew):
+    """
+    Накопленные веса рангов 1..size по закону Ципфа:
+    чем больше skew, тем сильнее выделяются первые элементы.
+    """
+    return list(accumulate(1 / rank ** skew for rank in range(1, size + 1)))
+
+
+def sample_pairs(rng, count, left, right, right_weights, exclude_same=False):
+    """
+    count уникальных пар (left, right), где right выбирается по весам.
+    Если столько пар набрать нельзя, возвращает сколько получилось.
+    """
+    pairs = set()
+    attempts = count * 10
+    while len(pairs) < count and attempts:
+        attempts -= 1
+        first = rng.choice(left)
+        second = rng.choices(right, cum_weights=right_weights)[0]
+        if exclude_same and first == second:
+            continue
+        pairs.add((first, second))
+    return sorted(pairs)
+
+
+def clear():
+    """
+    Удаляет пользователей прошлой генерации вместе с их рецептами,
+    подписками, избранным и корзинами.
+    """
+    User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+
+def ensure_reference_data(rng):
+    tags = list(Tag.objects.values_list('pk', flat=True))
+    if len(tags) < TAGS_COUNT:
+        Tag.objects.bulk_create(
+            Tag(
+                name=f'Тэг {number}',
+                slug=f'bench-{number}',
+                color=f'#{rng.randrange(0x1000000):06X}',
+            )
+            for number in range(len(tags), TAGS_COUNT)
+        )
+    ingredients_count = Ingredient.objects.count()
+    if ingredients_count < INGREDIENTS_COUNT:
+        Ingredient.objects.bulk_create(
+            (
+                Ingredient(
+                    name=f'Ингредиент {number}',
+                    measurement_unit=rng.choice(('г', 'мл', 'шт.')),
+                )
+                for number in range(ingredients_count, INGREDIENTS_COUNT)
+            ),
+            ignore_conflicts=True,
+        )
+    invalidate('tags', 'ingredients')
+    return (
+        list(Tag.objects.values_list('pk', flat=True)),
+        list(Ingredient.objects.values_list('pk', flat=True)),
+    )
+
+
+def generate(
+        users,
+        recipes,
+        follows,
+        favorites,
+        carts,
+        skew=1.1,
+        seed=0,
+        batch_size=1000,
+):
+    """
+    Создает синтетический набор данных с перекосом, как в жизни:
+    у немногих авторов большая часть рецептов и подписчиков,
+    а избранное и корзины приходятся на немногие популярные рецепты.
+    При одном seed набор данных получается одинаковым.
+
+    Объекты создаются через bulk_create, поэтому сигналы не вызываются:
+    счетчики, списки покупок, рейтинг и индекс рецептов по ингредиентам
+    нужно пересчитать после генерации.
+    Поисковые векторы рецептов заполняются здесь же.
+    Возвращает кол-во созданных объектов каждого вида.
+    """
+    rng = random.Random(seed)
+    with transaction.atomic():
+        tag_ids, ingredient_ids = ensure_reference_data(random.Random(seed))
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            (
+                User(
+                    username=f'{USERNAME_PREFIX}{number}',
+                    email=f'{USERNAME_PREFIX}{number}@example.com',
+                    first_name='Имя',
+                    last_name=f'Фамилия {number}',
+                    password=password,
+                )
+                for number in range(users)
+            ),
+            batch_size=batch_size,
+        )
+        user_ids = list(User.objects.filter(
+            username__startswith=USERNAME_PREFIX,
+        ).order_by('pk').values_list('pk', flat=True))
+        popular_users = rng.sample(user_ids, len(user_ids))
+        user_weights = zipf_weights(len(popular_users), skew)
+
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    author_id=rng.choices(
+                        popular_users, cum_weights=user_weights
+                    )[0],
+                    name=f'Рецепт {number}',
+                    text=f'Описание рецепта {number}',
+                    cooking_time=rng.randint(5, 180),
+                )
+                for number in range(recipes)
+            ),
+            batch_size=batch_size,
+        )
+        recipe_ids = list(Recipe.objects.filter(
+            author__username__startswith=USERNAME_PREFIX,
+        ).order_by('pk').values_list('pk', flat=True))
+        fill_search_vectors(
+            Recipe.objects.filter(pk__in=recipe_ids), connection.vendor,
+        )
+        IngredientQuantity.objects.bulk_create(
+            (
+                IngredientQuantity(
+                    recipe_id=recipe_id,
+                    ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 500),
+                )
+                for recipe_id in recipe_ids
+                for ingredient_id in rng.sample(
+                    ingredient_ids,
+                    min(rng.randint(3, 12), len(ingredient_ids)),
+                )
+            ),
+            batch_size=batch_size,
+        )
+        RecipeTag.objects.bulk_create(
+            (
+                RecipeTag(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in recipe_ids
+                for tag_id in rng.sample(
+                    tag_ids, min(rng.randint(1, 3), len(tag_ids))
+                )
+            ),
+            batch_size=batch_size,
+        )
+
+        Follow.objects.bulk_create(
+            (
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id, author_id in sample_pairs(
+                    rng,
+                    follows,
+                    user_ids,
+                    popular_users,
+                    user_weights,
+                    exclude_same=True,
+                )
+            ),
+            batch_size=batch_size,
+        )
+        popular_recipes = rng.sample(recipe_ids, len(recipe_ids))
+        recipe_weights = zipf_weights(len(popular_recipes), skew)
+        counts = {}
+        activity = ((FavoriteRecipe, favorites), (ShoppingCart, carts))
+        for model, count in activity:
+            pairs = sample_pairs(
+                rng, count, user_ids, popular_recipes, recipe_weights
+            ) if recipe_ids else []
+            model.objects.bulk_create(
+                (
+                    model(user_id=user_id, recipe_id=recipe_id)
+                    for user_id, recipe_id in pairs
+                ),
+                batch_size=batch_size,
+            )
+            counts[model._meta.model_name] = len(pairs)
+    return {
+        'users': len(user_ids),
+        'recipes': len(recipe_ids),
+        'follows': Follow.objects.filter(user_id__in=user_ids).count(),
+        **counts,
+    }
@@ -0,0 +1,65 @@
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from benchmarks import dataset
+
+
+class Command(BaseCommand):
+    """
+    Генерирует синтетический набор данных для нагрузочных замеров.
+    Пользователи прошлой генерации удаляются вместе со всеми их данными.
+    """
+    help = 'Создает пользователей, рецепты, подписки, избранное и корзины.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--follows', type=int, default=10000)
+        parser.add_argument('--favorites', type=int, default=20000)
+        parser.add_argument('--carts', type=int, default=5000)
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=1.1,
+            help='Показатель закона Ципфа для авторов и рецептов.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Только удалить данные прошлой генерации.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        dataset.clear()
+        if options['clear']:
+            return
+        created = dataset.generate(
+            users=options['users'],
+            recipes=options['recipes'],
+            follows=options['follows'],
+            favorites=options['favorites'],
+            carts=options['carts'],
+            skew=options['skew'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+        )
+        for command in (
+            'rebuild_counters',
+            'rebuild_shopping_lists',
+            'rebuild_trending',
+            'rebuild_cook_index',
+            'rebuild_feed',
+        ):
+            output = StringIO()
+            call_command(command, stdout=output)
+            self.stdout.write(output.getvalue().splitlines()[-1])
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{name}: {count}' for name, count in created.items())
+            + f' за {time.perf_counter() - started:.1f} с'
+        ))
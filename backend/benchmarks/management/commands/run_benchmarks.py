@@ -0,0 +1,114 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.runner import (CLIENT_MODES, CONNECTION_MODES, SYNC, Runner,
+                               compare)
+from benchmarks.scenarios import SCENARIOS
+
+
+class Command(BaseCommand):
+    """
+    Замеряет p50/p95 времени ответа и кол-во SQL-запросов
+    основных эндпоинтов API на данных из generate_dataset.
+    """
+    help = 'Нагрузочные замеры API с сохранением результатов в JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=100)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--scenario',
+            action='append',
+            choices=[scenario.name for scenario in SCENARIOS],
+            help='Запустить только этот сценарий (можно несколько раз).',
+        )
+        parser.add_argument(
+            '--connections',
+            choices=CONNECTION_MODES,
+            help=(
+                'Держать соединение с БД между запросами или открывать '
+                'новое на каждый запрос. По умолчанию - по CONN_MAX_AGE.'
+            ),
+        )
+        parser.add_argument(
+            '--client',
+            choices=CLIENT_MODES,
+            default=SYNC,
+            help=(
+                'sync - WSGI-обработчик, async - ASGI-обработчик, '
+                'как под uvicorn.'
+            ),
+        )
+        parser.add_argument(
+            '--output',
+            help='Файл, в который записать результаты в JSON.',
+        )
+        parser.add_argument(
+            '--compare',
+            help='JSON прошлого прогона, с которым сравнить результаты.',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=20,
+            help='Допустимый рост p95 в процентах при --compare.',
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as file:
+                    baseline = json.load(file)
+            except (OSError, ValueError) as error:
+                raise CommandError(
+                    f'Не удалось прочитать {options["compare"]}: {error}'
+                )
+        scenarios = [
+            scenario for scenario in SCENARIOS
+            if not options['scenario'] or scenario.name in options['scenario']
+        ]
+        report = Runner(
+            options['iterations'],
+            options['warmup'],
+            options['seed'],
+            options['connections'],
+            options['client'],
+        ).run(scenarios)
+        if not report['results']:
+            raise CommandError(
+                'Нет данных для замеров, запустите generate_dataset.'
+            )
+        self.stdout.write(
+            f'{"scenario":<30} {"p50, мс":>10} {"p95, мс":>10} '
+            f'{"запросов":>9} {"статусы":>10}'
+        )
+        for name, result in report['results'].items():
+            self.stdout.write(
+                f'{name:<30} {result["p50_ms"]:>10.2f} '
+                f'{result["p95_ms"]:>10.2f} {result["queries_max"]:>9} '
+                f'{",".join(map(str, result["statuses"])):>10}'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if baseline is not None:
+            self.compare(baseline, report, options['threshold'])
+
+    def compare(self, baseline, report, threshold):
+        rows, regressions = compare(baseline, report, threshold)
+        self.stdout.write(
+            f'\nСравнение с {baseline.get("commit") or "прошлым прогоном"}:'
+        )
+        for name, metric, before, after, change in rows:
+            self.stdout.write(
+                f'{name:<30} {metric:<12} {before:>10} -> {after:<10} '
+                f'{change:+.1f}%'
+            )
+        if regressions:
+            raise CommandError(
+                'Регрессии:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет.'))
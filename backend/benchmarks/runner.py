@@ -0,0 +1,251 @@
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from urllib.parse import urlencode
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import connections, transaction
+from django.test import AsyncClient
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.middleware import QueryRecorder, current_recorder, record_queries
+from recipe.models import FavoriteRecipe, Recipe, ShoppingCart
+from users.models import Follow, User
+
+from .dataset import USERNAME_PREFIX
+
+
+PERSISTENT = 'persistent'
+PER_REQUEST = 'per-request'
+CONNECTION_MODES = (PERSISTENT, PER_REQUEST)
+SYNC = 'sync'
+ASYNC = 'async'
+CLIENT_MODES = (SYNC, ASYNC)
+
+
+class Rollback(Exception):
+    pass
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'),
+            capture_output=True,
+            check=True,
+            cwd=settings.BASE_DIR,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def default_connection_mode():
+    """
+    Режим соединений, как у веб-сервера с текущими настройками.
+    """
+    if connections['default'].settings_dict['CONN_MAX_AGE'] == 0:
+        return PER_REQUEST
+    return PERSISTENT
+
+
+def dataset_size():
+    return {
+        'users': User.objects.filter(
+            username__startswith=USERNAME_PREFIX,
+        ).count(),
+        'recipes': Recipe.objects.count(),
+        'follows': Follow.objects.count(),
+        'favorites': FavoriteRecipe.objects.count(),
+        'carts': ShoppingCart.objects.count(),
+    }
+
+
+class Runner:
+    """
+    Выполняет сценарии через тестовый клиент Django внутри процесса,
+    без сети и веб-сервера: замеряется время обработки запроса
+    приложением и кол-во SQL-запросов. Изменяющие сценарии выполняются
+    в откатываемой транзакции, их кол-во запросов включает SAVEPOINT
+    вложенных atomic-блоков.
+
+    Тестовый клиент не закрывает соединения с БД после запроса,
+    поэтому в режиме per-request они закрываются перед каждым
+    запросом, как при CONN_MAX_AGE = 0, и время установки
+    соединения попадает в замер.
+
+    В режиме async запросы идут через AsyncClient и ASGI-обработчик
+    Django, как под uvicorn; с ASYNC_VIEWS=True эндпоинты чтения
+    выполняются в пуле потоков.
+    """
+
+    def __init__(
+        self,
+        iterations,
+        warmup,
+        seed,
+        connection_mode=None,
+        client_mode=SYNC,
+    ):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.connection_mode = connection_mode or default_connection_mode()
+        self.client_mode = client_mode
+        self.rng = random.Random(seed)
+        self.client = APIClient()
+        self.async_client = AsyncClient()
+        self.authorization = None
+        self.tokens = {}
+
+    def authenticate(self, user):
+        if user is None:
+            self.authorization = None
+            self.client.credentials()
+            return
+        if user.pk not in self.tokens:
+            self.tokens[user.pk] = Token.objects.get_or_create(
+                user=user,
+            )[0].key
+        self.authorization = f'Token {self.tokens[user.pk]}'
+        self.client.credentials(HTTP_AUTHORIZATION=self.authorization)
+
+    def send(self, method, url, data):
+        send = getattr(self.client, method)
+        kwargs = {} if method == 'get' else {'format': 'json'}
+        return send(url, data, **kwargs)
+
+    async def send_async(self, method, url, data):
+        """
+        AsyncClient в Django 3.2 теряет параметры GET-запроса,
+        переданные словарем, поэтому они добавляются в url.
+        """
+        send = getattr(self.async_client, method)
+        kwargs = {}
+        if method == 'get':
+            if data:
+                url = f'{url}?{urlencode(data, doseq=True)}'
+            data = None
+        else:
+            kwargs['content_type'] = 'application/json'
+        if self.authorization is not None:
+            kwargs['authorization'] = self.authorization
+        return await send(url, data, **kwargs)
+
+    def request(self, method, url, data):
+        """
+        Время в мс, кол-во SQL-запросов и код ответа одного запроса.
+        Тело потоковых ответов вычитывается внутри замера.
+        """
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        try:
+            with record_queries(recorder):
+                started = time.perf_counter()
+                if self.client_mode == ASYNC:
+                    response = async_to_sync(self.send_async)(
+                        method, url, data,
+                    )
+                else:
+                    response = self.send(method, url, data)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                elapsed = time.perf_counter() - started
+        finally:
+            current_recorder.reset(token)
+        return elapsed * 1000, recorder.queries, response.status_code
+
+    def measure(self, scenario):
+        user, method, url, data = scenario.prepare(self.rng)
+        self.authenticate(user)
+        if self.connection_mode == PER_REQUEST:
+            connections.close_all()
+        if not scenario.write:
+            return self.request(method, url, data)
+        try:
+            with transaction.atomic():
+                result = self.request(method, url, data)
+                raise Rollback
+        except Rollback:
+            return result
+
+    def run_scenario(self, scenario):
+        for _ in range(self.warmup):
+            self.measure(scenario)
+        timings, queries, statuses = [], [], set()
+        for _ in range(self.iterations):
+            elapsed, query_count, status = self.measure(scenario)
+            timings.append(elapsed)
+            queries.append(query_count)
+            statuses.add(status)
+        return {
+            'iterations': self.iterations,
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'mean_ms': round(statistics.mean(timings), 3),
+            'queries_p50': statistics.median(queries),
+            'queries_max': max(queries),
+            'statuses': sorted(statuses),
+        }
+
+    def run(self, scenarios):
+        """
+        Результаты по сценариям и сведения о прогоне для сравнения
+        между коммитами. Сценарии, для которых не хватает данных,
+        пропускаются.
+        """
+        results = {}
+        allowed_hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        with tempfile.TemporaryDirectory() as media_root, override_settings(
+            ALLOWED_HOSTS=allowed_hosts,
+            MEDIA_ROOT=media_root,
+        ):
+            for scenario in scenarios:
+                scenario.setup()
+                if not scenario.ready():
+                    continue
+                results[scenario.name] = self.run_scenario(scenario)
+        return {
+            'commit': git_commit(),
+            'created_at': timezone.now().isoformat(),
+            'database': connections['default'].vendor,
+            'connections': self.connection_mode,
+            'client': self.client_mode,
+            'async_views': settings.ASYNC_VIEWS,
+            'dataset': dataset_size(),
+            'results': results,
+        }
+
+
+def compare(baseline, current, threshold):
+    """
+    Сравнивает два прогона. Возвращает строки отчета
+    (scenario, metric, было, стало, изменение в %) и список регрессий:
+    p95 выросло больше чем на threshold процентов
+    или выросло кол-во SQL-запросов.
+    """
+    rows, regressions = [], []
+    for name, result in current['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        for metric in ('p50_ms', 'p95_ms', 'queries_max'):
+            before, after = base[metric], result[metric]
+            change = (after - before) / before * 100 if before else 0.0
+            rows.append((name, metric, before, after, change))
+            if (
+                metric == 'p95_ms' and change > threshold
+                or metric == 'queries_max' and after > before
+            ):
+                regressions.append(f'{name} {metric}: {before} -> {after}')
+    return rows, regressions
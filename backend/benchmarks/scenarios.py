@@ -0,0 +1,240 @@
+from django.urls import reverse
+
+from recipe.models import IngredientQuantity, Recipe, ShoppingCart, Tag
+from users.models import Follow, User
+
+from .dataset import USERNAME_PREFIX
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAf'
+    'FcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=='
+)
+
+
+class Scenario:
+    """
+    Один вид запроса к API.
+
+    prepare(rng) вызывается перед каждым запросом вне замера и возвращает
+    (user, method, url, data): user - от чьего имени запрос
+    (None - аноним), data - параметры GET или тело запроса.
+    Изменяющие сценарии (write=True) откатываются после каждого запроса,
+    чтобы набор данных не менялся между прогонами.
+    """
+    write = False
+
+    def __init__(self, name):
+        self.name = name
+
+    def setup(self):
+        """
+        Выбирает объекты набора данных, с которыми работает сценарий.
+        """
+        self.users = []
+
+    def ready(self):
+        """
+        Хватает ли данных для сценария.
+        """
+        return bool(self.users)
+
+    def prepare(self, rng):
+        raise NotImplementedError
+
+
+def bench_users():
+    return User.objects.filter(username__startswith=USERNAME_PREFIX)
+
+
+class RecipeList(Scenario):
+    def __init__(self, name, authenticated, params=None):
+        super().__init__(name)
+        self.authenticated = authenticated
+        self.params = params or {}
+
+    def setup(self):
+        self.users = list(bench_users().order_by('?')[:50])
+        self.tags = list(Tag.objects.values_list('slug', flat=True))
+
+    def prepare(self, rng):
+        params = dict(self.params)
+        if params.get('tags') == 'random':
+            params['tags'] = rng.sample(self.tags, min(2, len(self.tags)))
+        user = rng.choice(self.users) if self.authenticated else None
+        return user, 'get', reverse('recipes-list'), params
+
+
+class RecipeDetail(Scenario):
+    def setup(self):
+        self.users = list(bench_users().order_by('?')[:50])
+        self.recipe_ids = list(Recipe.objects.filter(
+            author__username__startswith=USERNAME_PREFIX,
+        ).order_by('-favorites_count').values_list('pk', flat=True)[:500])
+
+    def prepare(self, rng):
+        return (
+            rng.choice(self.users),
+            'get',
+            reverse('recipes-detail', args=[rng.choice(self.recipe_ids)]),
+            {},
+        )
+
+
+class CanCook(Scenario):
+    """
+    Поиск рецептов по нескольким ингредиентам из популярных рецептов.
+    """
+
+    def setup(self):
+        self.users = list(bench_users().order_by('?')[:50])
+        self.ingredient_ids = list(IngredientQuantity.objects.filter(
+            recipe__author__username__startswith=USERNAME_PREFIX,
+        ).values_list('ingredient_id', flat=True).distinct()[:200])
+
+    def prepare(self, rng):
+        return rng.choice(self.users), 'get', reverse('recipes-can-cook'), {
+            'ingredients': ','.join(
+                map(str, rng.sample(
+                    self.ingredient_ids, min(8, len(self.ingredient_ids)),
+                ))
+            ),
+        }
+
+
+class Subscriptions(Scenario):
+    def setup(self):
+        self.users = list(bench_users().filter(
+            pk__in=Follow.objects.values('user_id'),
+        ).order_by('?')[:50])
+
+    def prepare(self, rng):
+        return (
+            rng.choice(self.users),
+            'get',
+            reverse('users-subscriptions'),
+            {'recipes_limit': 3},
+        )
+
+
+class Feed(Scenario):
+    def setup(self):
+        self.users = list(bench_users().filter(
+            pk__in=Follow.objects.values('user_id'),
+        ).order_by('?')[:50])
+
+    def prepare(self, rng):
+        return rng.choice(self.users), 'get', reverse('recipes-feed'), {}
+
+
+class DownloadShoppingCart(Scenario):
+    def __init__(self, name, file_format):
+        super().__init__(name)
+        self.file_format = file_format
+
+    def setup(self):
+        self.users = list(bench_users().filter(
+            pk__in=ShoppingCart.objects.values('user_id'),
+        ).order_by('?')[:50])
+
+    def prepare(self, rng):
+        return (
+            rng.choice(self.users),
+            'get',
+            reverse('recipes-download-shopping-cart'),
+            {'format': self.file_format},
+        )
+
+
+class RecipeCreate(Scenario):
+    write = True
+
+    def setup(self):
+        self.users = list(bench_users().order_by('?')[:50])
+        self.tag_ids = list(Tag.objects.values_list('pk', flat=True))
+        self.ingredient_ids = list(
+            IngredientQuantity.objects.values_list(
+                'ingredient_id', flat=True,
+            ).distinct()[:500]
+        )
+
+    def prepare(self, rng):
+        return rng.choice(self.users), 'post', reverse('recipes-list'), {
+            'ingredients': [
+                {'id': ingredient_id, 'amount': rng.randint(1, 500)}
+                for ingredient_id in rng.sample(self.ingredient_ids, 8)
+            ],
+            'tags': rng.sample(self.tag_ids, 2),
+            'image': IMAGE,
+            'name': 'Новый рецепт',
+            'text': 'Описание',
+            'cooking_time': rng.randint(5, 180),
+        }
+
+
+class RecipeUpdate(Scenario):
+    """
+    Меняет время приготовления и кол-во одного ингредиента.
+    """
+    write = True
+
+    def setup(self):
+        self.recipes = list(Recipe.objects.filter(
+            author__username__startswith=USERNAME_PREFIX,
+        ).select_related('author').prefetch_related(
+            'recipe_ingredient', 'tags',
+        ).order_by('-in_carts_count')[:100])
+
+    def ready(self):
+        return bool(self.recipes)
+
+    def prepare(self, rng):
+        recipe = rng.choice(self.recipes)
+        ingredients = [
+            {'id': item.ingredient_id, 'amount': item.amount}
+            for item in recipe.recipe_ingredient.all()
+        ]
+        ingredients[0]['amount'] = ingredients[0]['amount'] % 500 + 1
+        return (
+            recipe.author,
+            'patch',
+            reverse('recipes-detail', args=[recipe.pk]),
+            {
+                'ingredients': ingredients,
+                'tags': [tag.pk for tag in recipe.tags.all()],
+                'cooking_time': rng.randint(5, 180),
+            },
+        )
+
+
+SCENARIOS = [
+    RecipeList('recipes-list-anonymous', authenticated=False),
+    RecipeList('recipes-list', authenticated=True),
+    RecipeList(
+        'recipes-list-tags',
+        authenticated=True,
+        params={'tags': 'random'},
+    ),
+    RecipeList(
+        'recipes-list-favorited',
+        authenticated=True,
+        params={'is_favorited': 1},
+    ),
+    RecipeList(
+        'recipes-list-search',
+        authenticated=True,
+        params={'search': 'рецепт 1'},
+    ),
+    RecipeList(
+        'recipes-list-popular',
+        authenticated=True,
+        params={'ordering': 'popular'},
+    ),
+    RecipeDetail('recipes-detail'),
+    CanCook('recipes-can-cook'),
+    Subscriptions('subscriptions'),
+    Feed('recipes-feed'),
+    DownloadShoppingCart('download-shopping-cart-txt', 'txt'),
+    DownloadShoppingCart('download-shopping-cart-pdf', 'pdf'),
+    RecipeCreate('recipes-create'),
+    RecipeUpdate('recipes-update'),
+]
@@ -0,0 +1,20 @@
+"""
+ASGI config for foodgram project.
+
+Запускается через gunicorn с воркерами uvicorn (SERVER_MODE=asgi),
+эндпоинты чтения из api.urls.ASYNC_VIEW_NAMES становятся асинхронными,
+а тело потоковых ответов читается вне event loop'а.
+"""
+
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+os.environ.setdefault('ASYNC_VIEWS', 'True')
+
+django.setup(set_prefix=False)
+
+from api.v1.async_views import StreamingASGIHandler  # noqa: E402
+
+application = StreamingASGIHandler()
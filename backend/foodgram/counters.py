@@ -0,0 +1,50 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def change_counter(model, pk, field, delta):
+    """
+    Атомарно меняет счетчик одним UPDATE с F(),
+    не опускаясь ниже нуля.
+    """
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def live_count(related_model, field):
+    """
+    Подзапрос, считающий строки related_model,
+    у которых field ссылается на текущую строку.
+    """
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                count=Count('pk')
+            ).values('count'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+class CounterFieldsMixin:
+    """
+    Не перезаписывает счетчики при сохранении объекта.
+
+    Счетчики меняются только через change_counter, поэтому
+    save() загруженного ранее объекта не должен затирать их
+    устаревшими значениями из памяти.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
@@ -0,0 +1,53 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Разрешено ли текущему запросу читать с реплик.
+# Выставляется ReplicaRoutingMiddleware (api/middleware.py).
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+@contextmanager
+def primary_reads():
+    """
+    Чтение внутри блока идет с основной БД. Нужно там,
+    где прочитанное кладется в общий кеш: отстающая реплика
+    иначе закешировала бы старые данные под новой версией.
+    """
+    token = replica_reads.set(False)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Отправляет чтение на случайную реплику из DATABASE_REPLICAS,
+    если это разрешено текущему запросу, остальное - на основную БД.
+
+    Внутри транзакции основной БД чтение остается на ней:
+    select_for_update и чтение после блокировки должны видеть
+    ту же транзакцию.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (
+            not settings.DATABASE_REPLICAS
+            or not replica_reads.get()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
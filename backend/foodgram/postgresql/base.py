@@ -0,0 +1,43 @@
+from django.db.backends.postgresql import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL с проверкой постоянных соединений (CONN_MAX_AGE > 0).
+
+    С CONN_HEALTH_CHECKS соединение, оставшееся от прошлого запроса,
+    проверяется перед первым запросом к БД и при обрыве (рестарт
+    PostgreSQL или PgBouncer, таймаут простоя) переоткрывается,
+    вместо того чтобы запрос упал с OperationalError.
+    Проверка выполняется не чаще раза за HTTP-запрос.
+    """
+
+    health_check_done = False
+
+    @property
+    def health_check_enabled(self):
+        return self.settings_dict.get('CONN_HEALTH_CHECKS', False)
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def close_if_health_check_failed(self):
+        if (
+            self.connection is None
+            or not self.health_check_enabled
+            or self.health_check_done
+            or self.in_atomic_block
+        ):
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
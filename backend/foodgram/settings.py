@@ -28,6 +28,7 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'api.v1.apps.ApiV1Config',
     'recipe.apps.RecipeConfig',
+    'benchmarks.apps.BenchmarksConfig',
 ]
 
 REST_FRAMEWORK = {
@@ -51,6 +52,8 @@ DJOSER = {
 }
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
+    'api.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,26 +84,160 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
+ASGI_APPLICATION = 'foodgram.asgi.application'
+
+# Асинхронные эндпоинты чтения (api/v1/async_views.py),
+# по умолчанию включены в foodgram/asgi.py.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+ASYNC_VIEWS_THREADS = int(os.getenv('ASYNC_VIEWS_THREADS', 10))
 
 if os.getenv('SQLITE'):
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
-        }
+        },
+        # Та же БД под видом реплики, для проверки маршрутизации
+        # чтения в тестах (DATABASE_REPLICAS = ['replica']).
+        'replica': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'TEST': {'MIRROR': 'default'},
+        },
     }
+    DATABASE_REPLICAS = []
 else:
     DATABASES = {
         'default': {
-            'ENGINE': 'django.db.backends.postgresql',
+            # PostgreSQL с проверкой постоянных соединений
+            # (foodgram/postgresql/base.py).
+            'ENGINE': 'foodgram.postgresql',
             'NAME': os.getenv('POSTGRES_DB', 'django'),
             'USER': os.getenv('POSTGRES_USER', 'django'),
             'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
             'HOST': os.getenv('DB_HOST', ''),
-            'PORT': os.getenv('DB_PORT', 5432)
+            'PORT': os.getenv('DB_PORT', 5432),
+            # Сколько секунд держать соединение между запросами,
+            # 0 — новое соединение на каждый запрос.
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': (
+                os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True'
+            ),
+            # PgBouncer в режиме transaction: серверные курсоры
+            # (iterator()) не переживают смену соединения
+            # между транзакциями.
+            'DISABLE_SERVER_SIDE_CURSORS': (
+                os.getenv('DB_PGBOUNCER', 'False') == 'True'
+            ),
+            'OPTIONS': {
+                'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+            },
+        }
+    }
+    # Реплики для чтения: DB_REPLICA_HOSTS=replica1,replica2,
+    # с теми же именем БД, пользователем и паролем.
+    DATABASE_REPLICAS = []
+    for number, host in enumerate(
+        filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), 1
+    ):
+        alias = f'replica_{number}'
+        DATABASES[alias] = {
+            **DATABASES['default'],
+            'HOST': host.strip(),
+            'TEST': {'MIRROR': 'default'},
+        }
+        DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['foodgram.db_router.ReplicaRouter']
+# Сколько секунд после изменяющего запроса пользователь читает
+# с основной БД, чтобы видеть свои изменения несмотря на отставание реплик.
+REPLICA_STICKY_SECONDS = int(os.getenv('DB_REPLICA_STICKY_SECONDS', 10))
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
         }
     }
 
+REFERENCE_CACHE_TIMEOUT = int(os.getenv('REFERENCE_CACHE_TIMEOUT', 60 * 60 * 24))
+# Ответы справочников с поисковыми параметрами: живут меньше,
+# а запросы длиннее PAYLOAD_CACHE_MAX_PARAM_LENGTH не кешируются.
+PAYLOAD_CACHE_FILTERED_TIMEOUT = int(
+    os.getenv('PAYLOAD_CACHE_FILTERED_TIMEOUT', 60 * 5)
+)
+PAYLOAD_CACHE_MAX_PARAM_LENGTH = 64
+# Общая для всех пользователей часть представления рецепта.
+RECIPE_CACHE_TIMEOUT = int(os.getenv('RECIPE_CACHE_TIMEOUT', 60 * 60))
+
+# memory — индекс в памяти процесса, trigram — pg_trgm в PostgreSQL.
+INGREDIENT_SEARCH_BACKEND = os.getenv('INGREDIENT_SEARCH_BACKEND', 'memory')
+INGREDIENT_SEARCH_LIMIT = 20
+INGREDIENT_SEARCH_MAX_LIMIT = 100
+INGREDIENT_SEARCH_SIMILARITY = 0.3
+
+# Поиск рецептов по ингредиентам в наличии (/api/recipes/can_cook/).
+CAN_COOK_LIMIT = 20
+CAN_COOK_MAX_LIMIT = 100
+CAN_COOK_MAX_INGREDIENTS = 100
+
+# Лента подписок (/api/recipes/feed/). Рецепты авторов, у которых
+# больше подписчиков или рецептов, чем пороги, не записываются
+# в ленты при публикации, а читаются при запросе ленты.
+FEED_FANOUT_MAX_FOLLOWERS = int(os.getenv('FEED_FANOUT_MAX_FOLLOWERS', 10000))
+FEED_FANOUT_MAX_RECIPES = int(os.getenv('FEED_FANOUT_MAX_RECIPES', 1000))
+FEED_MAX_LIMIT = 100
+
+# local — картинки обрабатываются сразу в запросе (тесты, разработка),
+# redis — в очереди, которую разбирает python manage.py process_images.
+# По умолчанию local: без IMAGE_QUEUE_BACKEND=redis в окружении
+# (.env-example) уменьшенные копии создаются синхронно и замедляют
+# создание рецепта, а process_images завершается с ошибкой.
+IMAGE_QUEUE_BACKEND = os.getenv('IMAGE_QUEUE_BACKEND', 'local')
+IMAGE_QUEUE_URL = os.getenv('IMAGE_QUEUE_URL', os.getenv('REDIS_URL'))
+IMAGE_QUEUE_NAME = 'foodgram:images'
+# process_images --cleanup не трогает копии моложе этого возраста:
+# их может создавать обработчик, еще не записавший хеш в рецепт.
+IMAGE_VARIANTS_CLEANUP_AGE = 60 * 60
+
+# Замеры запросов к API: Server-Timing, лог foodgram.requests
+# и гистограммы для python manage.py request_metrics.
+REQUEST_METRICS_ENABLED = os.getenv('REQUEST_METRICS', 'False') == 'True'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'foodgram.requests': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+# Ограничения для картинок, загружаемых через multipart/form-data.
+IMAGE_UPLOAD_MAX_SIZE = int(
+    os.getenv('IMAGE_UPLOAD_MAX_SIZE', 20 * 1024 * 1024)
+)
+IMAGE_UPLOAD_MAX_DIMENSION = 8000
+IMAGE_UPLOAD_MAX_PIXELS = 40_000_000
+IMAGE_UPLOAD_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+
+# Окно и период полураспада для ?ordering=trending.
+TRENDING_WINDOW_DAYS = int(os.getenv('TRENDING_WINDOW_DAYS', 7))
+TRENDING_HALF_LIFE_HOURS = float(os.getenv('TRENDING_HALF_LIFE_HOURS', 48))
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -126,3 +263,8 @@ STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'collected_static'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+SHOPPING_CART_PDF_FONT = os.getenv(
+    'SHOPPING_CART_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf',
+)
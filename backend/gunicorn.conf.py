@@ -0,0 +1,60 @@
+"""
+Настройки gunicorn из переменных окружения.
+"""
+import os
+
+# wsgi - синхронные воркеры, asgi - воркеры uvicorn
+# с асинхронными эндпоинтами чтения.
+server_mode = os.getenv('SERVER_MODE', 'wsgi')
+wsgi_app = f'foodgram.{server_mode}:application'
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+
+# Каждый поток держит свое соединение с PostgreSQL (DB_CONN_MAX_AGE).
+# Потоки запросов воркера: GUNICORN_THREADS, в ASGI - пул
+# ASYNC_VIEWS_THREADS и общий поток синхронного кода. Еще одно
+# соединение на время открывает фоновая сборка индекса ингредиентов.
+# Всего соединений с каждой БД (основной и каждой репликой):
+#   workers * (request_threads + 1) <= max_connections или пул PgBouncer.
+# GUNICORN_DB_CONNECTIONS - бюджет соединений, из которого считается
+# кол-во воркеров, если GUNICORN_WORKERS не задан.
+request_threads = (
+    int(os.getenv('ASYNC_VIEWS_THREADS', 10)) + 1
+    if server_mode == 'asgi' else threads
+)
+connections_per_worker = request_threads + 1
+if os.getenv('GUNICORN_WORKERS'):
+    workers = int(os.getenv('GUNICORN_WORKERS'))
+elif os.getenv('GUNICORN_DB_CONNECTIONS'):
+    workers = max(
+        1, int(os.getenv('GUNICORN_DB_CONNECTIONS')) // connections_per_worker
+    )
+else:
+    workers = 2
+# С threads > 1 gunicorn сам переключается с sync на gthread.
+worker_class = os.getenv(
+    'GUNICORN_WORKER_CLASS',
+    'uvicorn.workers.UvicornWorker' if server_mode == 'asgi' else 'sync',
+)
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 2))
+# Перезапуск воркера после стольких запросов ограничивает рост памяти,
+# jitter не дает всем воркерам перезапуститься одновременно.
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+accesslog = os.getenv('GUNICORN_ACCESS_LOG')
+
+
+def post_worker_init(worker):
+    """
+    Индекс поиска ингредиентов собирается в фоне сразу при старте
+    воркера, а не на первом запросе.
+    """
+    from django.conf import settings
+
+    if settings.INGREDIENT_SEARCH_BACKEND == 'memory':
+        from api.v1.ingredient_search import warm_index
+
+        warm_index()
@@ -1,9 +1,27 @@
+from collections import Counter
+
 from django.contrib.admin import (ModelAdmin, TabularInline, display, register,
                                   site)
 from django.contrib.auth.models import Group
+from django.core.files.storage import default_storage
 from django.utils.safestring import mark_safe
 
-from .models import FavoriteRecipe, Ingredient, Recipe, ShoppingCart, Tag
+from .cook_index import recipe_ingredient_ids, reindex_recipe
+from .models import (FavoriteRecipe, Ingredient, IngredientQuantity, Recipe,
+                     ShoppingCart, ShoppingListItem, Tag)
+
+
+def recipe_amounts(recipe_id):
+    """
+    {ingredient_id: количество} рецепта, строки с одним
+    ингредиентом в инлайне складываются.
+    """
+    amounts = Counter()
+    for ingredient_id, amount in IngredientQuantity.objects.filter(
+        recipe_id=recipe_id,
+    ).values_list('ingredient_id', 'amount'):
+        amounts[ingredient_id] += amount
+    return amounts
 
 
 @register(Tag)
@@ -44,7 +62,8 @@ class RecipeAdmin(ModelAdmin):
         'author',
         'name',
         'recipe_image',
-        'favorite_count',
+        'favorites_count',
+        'in_carts_count',
         'recipe_ingredients',
         'recipe_tags',
     )
@@ -56,12 +75,29 @@ class RecipeAdmin(ModelAdmin):
     empty_value_display = '-пусто-'
     inlines = [IngredientInline, TagInLine]
 
-    @display(
-        description='Сколько раз в избранном',
-        empty_value='-пусто-',
-    )
-    def favorite_count(self, recipe):
-        return recipe.favorites.count()
+    def save_related(self, request, form, formsets, change):
+        """
+        Ингредиенты из инлайна, как и через API, обновляют индекс
+        рецептов по ингредиентам и списки покупок корзин с рецептом.
+        """
+        if change:
+            Recipe.objects.lock(form.instance.pk)
+        old_ids = recipe_ingredient_ids(form.instance.pk) if change else ()
+        old_amounts = recipe_amounts(form.instance.pk) if change else None
+        super().save_related(request, form, formsets, change)
+        reindex_recipe(
+            form.instance.pk,
+            old_ids,
+            recipe_ingredient_ids(form.instance.pk),
+        )
+        if change:
+            new_amounts = recipe_amounts(form.instance.pk)
+            ShoppingListItem.objects.change_recipe(form.instance.pk, {
+                ingredient_id: (
+                    new_amounts[ingredient_id] - old_amounts[ingredient_id]
+                )
+                for ingredient_id in new_amounts.keys() | old_amounts.keys()
+            })
 
     @display(
         description='Ингридиенты',
@@ -80,6 +116,9 @@ class RecipeAdmin(ModelAdmin):
     @display(description='Картинка')
     @mark_safe
     def recipe_image(self, recipe):
+        if recipe.image_variants:
+            url = default_storage.url(recipe.image_variants['admin']['jpeg'])
+            return f'<img src={url} width="80" height="60">'
         if recipe.image:
             return f'<img src={recipe.image.url} width="80" height="60">'
         return '-пусто-'
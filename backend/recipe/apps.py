@@ -1,7 +1,29 @@
 from django.apps import AppConfig
+from django.db import connection
 
 
 class RecipeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipe'
     verbose_name = 'Рецепты'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        if connection.vendor == 'postgresql':
+            register_postgres_lookups()
+
+
+def register_postgres_lookups():
+    """
+    Лукапы django.contrib.postgres регистрируются один раз при старте:
+    модули требуют psycopg2 и есть только у PostgreSQL.
+    """
+    from django.contrib.postgres.lookups import TrigramSimilar
+    from django.contrib.postgres.search import SearchVectorExact
+    from django.db.models import CharField
+
+    from .search import SearchVectorField
+
+    CharField.register_lookup(TrigramSimilar)
+    SearchVectorField.register_lookup(SearchVectorExact)
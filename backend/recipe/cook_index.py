@@ -0,0 +1,162 @@
+import heapq
+import sys
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.db import transaction
+
+from .models import IngredientPosting, IngredientQuantity
+
+BLOCK_BITS = 16
+BLOCK_SIZE = 1 << BLOCK_BITS
+# Смещения внутри блока и кол-во ингредиентов - uint16.
+TYPECODE = 'H'
+
+
+def pack(values):
+    """
+    Массив uint16 в байтах little-endian.
+    """
+    values = array(TYPECODE, values)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tobytes()
+
+
+def unpack(data):
+    values = array(TYPECODE)
+    values.frombytes(bytes(data))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def split_id(recipe_id):
+    return divmod(recipe_id, BLOCK_SIZE)
+
+
+def reindex_recipe(recipe_id, old_ids, new_ids):
+    """
+    Обновляет индекс после изменения ингредиентов рецепта:
+    old_ids - ингредиенты до изменения, new_ids - после.
+    old_ids читаются после блокировки рецепта (Recipe.objects.lock),
+    иначе затронутые блоки считаются по устаревшему набору.
+
+    Меняются только блоки убранных и добавленных ингредиентов,
+    а если изменилось кол-во ингредиентов - блоки всех ингредиентов
+    рецепта, где оно хранится. Строки блокируются в порядке id
+    ингредиентов, поэтому параллельные изменения не теряются.
+    """
+    old_ids, new_ids = set(old_ids), set(new_ids)
+    touched = old_ids ^ new_ids
+    if len(old_ids) != len(new_ids):
+        touched |= new_ids
+    if not touched:
+        return
+    block, offset = split_id(recipe_id)
+    size = len(new_ids)
+    with transaction.atomic():
+        IngredientPosting.objects.bulk_create(
+            [
+                IngredientPosting(ingredient_id=ingredient_id, block=block)
+                for ingredient_id in sorted(touched & new_ids)
+            ],
+            ignore_conflicts=True,
+        )
+        to_update, to_delete = [], []
+        for posting in IngredientPosting.objects.select_for_update().filter(
+            ingredient_id__in=touched,
+            block=block,
+        ).order_by('ingredient_id'):
+            offsets, sizes = unpack(posting.recipes), unpack(posting.sizes)
+            position = bisect_left(offsets, offset)
+            present = (
+                position < len(offsets) and offsets[position] == offset
+            )
+            if posting.ingredient_id in new_ids:
+                if present:
+                    sizes[position] = size
+                else:
+                    offsets.insert(position, offset)
+                    sizes.insert(position, size)
+            elif present:
+                del offsets[position]
+                del sizes[position]
+            if offsets:
+                posting.recipes, posting.sizes = pack(offsets), pack(sizes)
+                to_update.append(posting)
+            else:
+                to_delete.append(posting.pk)
+        IngredientPosting.objects.bulk_update(to_update, ('recipes', 'sizes'))
+        IngredientPosting.objects.filter(pk__in=to_delete).delete()
+
+
+def recipe_ingredient_ids(recipe_id):
+    return set(IngredientQuantity.objects.filter(
+        recipe_id=recipe_id,
+    ).values_list('ingredient_id', flat=True))
+
+
+def match_recipes(ingredient_ids, limit):
+    """
+    Рецепты, для которых есть хотя бы один из ингредиентов,
+    по убыванию доли имеющихся ингредиентов, затем их кол-ва,
+    затем от новых к старым.
+
+    Возвращает кол-во подходящих рецептов и до limit кортежей
+    (recipe_id, кол-во имеющихся ингредиентов, всего ингредиентов).
+    Читаются только блоки запрошенных ингредиентов,
+    без соединения с таблицей ингредиентов рецептов.
+    """
+    matched = Counter()
+    sizes = {}
+    for block, recipes, block_sizes in IngredientPosting.objects.filter(
+        ingredient_id__in=ingredient_ids,
+    ).values_list('block', 'recipes', 'sizes').iterator():
+        base = block * BLOCK_SIZE
+        recipe_ids = [base + offset for offset in unpack(recipes)]
+        matched.update(recipe_ids)
+        sizes.update(zip(recipe_ids, unpack(block_sizes)))
+    best = heapq.nlargest(
+        limit,
+        matched.items(),
+        key=lambda item: (item[1] / sizes[item[0]], item[1], item[0]),
+    )
+    return len(matched), [
+        (recipe_id, count, sizes[recipe_id]) for recipe_id, count in best
+    ]
+
+
+def build_postings(rows):
+    """
+    Блоки индекса по строкам (recipe_id, ingredient_id),
+    упорядоченным по recipe_id: {(ingredient_id, block): (offsets, sizes)}.
+    """
+    postings = defaultdict(lambda: (array(TYPECODE), array(TYPECODE)))
+
+    def flush(recipe_id, ingredient_ids):
+        block, offset = split_id(recipe_id)
+        for ingredient_id in ingredient_ids:
+            offsets, sizes = postings[ingredient_id, block]
+            offsets.append(offset)
+            sizes.append(len(ingredient_ids))
+
+    current, ingredient_ids = None, set()
+    for recipe_id, ingredient_id in rows:
+        if recipe_id != current:
+            if current is not None:
+                flush(current, ingredient_ids)
+            current, ingredient_ids = recipe_id, set()
+        ingredient_ids.add(ingredient_id)
+    if current is not None:
+        flush(current, ingredient_ids)
+    return postings
+
+
+def live_postings():
+    return build_postings(
+        IngredientQuantity.objects.values_list(
+            'recipe_id', 'ingredient_id',
+        ).order_by('recipe_id').iterator()
+    )
@@ -0,0 +1,302 @@
+import hashlib
+import json
+import os
+import time
+from datetime import timedelta
+from functools import lru_cache
+from io import BytesIO
+
+import redis
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Recipe
+
+# Отправляется после записи хеша и копий картинки: sender - Recipe,
+# recipe_id. Запись идет через update(), post_save не отправляется.
+image_processed = Signal()
+
+VARIANTS = {
+    'admin': (160, 160),
+    'card': (480, 480),
+    'detail': (1200, 1200),
+}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# Форматы оригинала, из которого удаляются метаданные.
+ORIGINAL_FORMATS = {
+    'JPEG': {'quality': 95},
+    'PNG': {},
+    'WEBP': {'quality': 95},
+}
+VARIANTS_DIR = 'recipes/variants'
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def file_hash(file):
+    """
+    SHA-256 содержимого файла, читаемого по частям.
+    """
+    digest = hashlib.sha256()
+    file.open('rb')
+    try:
+        for chunk in file.chunks(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    finally:
+        file.close()
+    return digest.hexdigest()
+
+
+def variant_name(content_hash, variant, file_format):
+    return (
+        f'{VARIANTS_DIR}/{content_hash[:2]}/{content_hash}/'
+        f'{variant}.{file_format}'
+    )
+
+
+def render(image, size, file_format):
+    """
+    Уменьшенная копия без метаданных (EXIF, ICC-профиль).
+    """
+    pil_format, options = FORMATS[file_format]
+    thumbnail = image.copy()
+    thumbnail.thumbnail(size, Image.LANCZOS)
+    if file_format == 'jpeg' and thumbnail.mode != 'RGB':
+        background = Image.new('RGB', thumbnail.size, 'white')
+        if thumbnail.mode in ('RGBA', 'LA'):
+            background.paste(thumbnail, mask=thumbnail.getchannel('A'))
+        else:
+            background.paste(thumbnail.convert('RGB'))
+        thumbnail = background
+    thumbnail.info = {}
+    buffer = BytesIO()
+    thumbnail.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def strip_metadata(image_file):
+    """
+    Оригинал без EXIF (геопозиция, модель камеры и т. п.),
+    повернутый по тегу Orientation. None, если EXIF нет
+    или формат не пересохраняется (например, анимированный GIF).
+    """
+    image_file.open('rb')
+    try:
+        with Image.open(image_file) as image:
+            pil_format = image.format
+            if pil_format not in ORIGINAL_FORMATS or not image.getexif():
+                return None
+            icc_profile = image.info.get('icc_profile')
+            stripped = ImageOps.exif_transpose(image)
+            stripped.info = {}
+            options = dict(ORIGINAL_FORMATS[pil_format])
+            if icc_profile:
+                options['icc_profile'] = icc_profile
+            buffer = BytesIO()
+            stripped.save(buffer, pil_format, **options)
+    finally:
+        image_file.close()
+    return buffer.getvalue()
+
+
+def replace_original(recipe, content):
+    """
+    Записывает очищенный оригинал рядом со старым и подменяет
+    картинку рецепта, если она не менялась с начала обработки.
+    """
+    old_name = recipe.image.name
+    new_name = default_storage.save(old_name, ContentFile(content))
+    replaced = Recipe.objects.filter(
+        pk=recipe.pk,
+        image=old_name,
+    ).update(image=new_name)
+    default_storage.delete(old_name if replaced else new_name)
+    if replaced:
+        recipe.image = new_name
+    return replaced
+
+
+def build_variants(image_file, content_hash):
+    """
+    Создает копии всех размеров и форматов. Копии хранятся по хешу
+    содержимого, поэтому для одинаковых картинок создаются один раз.
+    """
+    variants = {
+        variant: {
+            file_format: variant_name(content_hash, variant, file_format)
+            for file_format in FORMATS
+        }
+        for variant in VARIANTS
+    }
+    missing = [
+        (variant, file_format, name)
+        for variant, names in variants.items()
+        for file_format, name in names.items()
+        if not default_storage.exists(name)
+    ]
+    if not missing:
+        return variants
+    image_file.open('rb')
+    try:
+        with Image.open(image_file) as image:
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert(
+                    'RGBA' if 'transparency' in image.info else 'RGB'
+                )
+            for variant, file_format, name in missing:
+                default_storage.save(name, ContentFile(
+                    render(image, VARIANTS[variant], file_format)
+                ))
+    finally:
+        image_file.close()
+    return variants
+
+
+def process_recipe_image(recipe_id):
+    """
+    Удаляет из оригинала EXIF, считает хеш картинки рецепта
+    и создает ее уменьшенные копии. Если картинка не менялась
+    с прошлой обработки, ничего не делает.
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id).only(
+        'image',
+        'image_hash',
+        'image_variants',
+    ).first()
+    if recipe is None:
+        return
+    recipes = Recipe.objects.filter(pk=recipe_id)
+    if not recipe.image:
+        recipes.update(image_hash='', image_variants={})
+        image_processed.send(sender=Recipe, recipe_id=recipe_id)
+        return
+    content_hash = file_hash(recipe.image)
+    if content_hash == recipe.image_hash and recipe.image_variants:
+        return
+    stripped = strip_metadata(recipe.image)
+    if stripped is not None:
+        if not replace_original(recipe, stripped):
+            # Картинку заменили во время обработки,
+            # новая уже поставлена в очередь.
+            return
+        content_hash = hashlib.sha256(stripped).hexdigest()
+    variants = build_variants(recipe.image, content_hash)
+    recipes.filter(image=recipe.image.name).update(
+        image_hash=content_hash,
+        image_variants=variants,
+    )
+    image_processed.send(sender=Recipe, recipe_id=recipe_id)
+
+
+def cleanup_variants(min_age):
+    """
+    Удаляет копии, на хеш которых не ссылается ни один рецепт.
+    Копии моложе min_age секунд не трогаются: обработчик мог создать
+    их для рецепта, хеш которого еще не записан. Возвращает
+    кол-во удаленных наборов копий.
+    """
+    if not default_storage.exists(VARIANTS_DIR):
+        return 0
+    used = set(
+        Recipe.objects.exclude(image_hash='').values_list(
+            'image_hash',
+            flat=True,
+        )
+    )
+    created_before = timezone.now() - timedelta(seconds=min_age)
+    removed = 0
+    prefixes, _ = default_storage.listdir(VARIANTS_DIR)
+    for prefix in prefixes:
+        hashes, _ = default_storage.listdir(f'{VARIANTS_DIR}/{prefix}')
+        for content_hash in hashes:
+            if content_hash in used:
+                continue
+            directory = f'{VARIANTS_DIR}/{prefix}/{content_hash}'
+            _, files = default_storage.listdir(directory)
+            names = [f'{directory}/{name}' for name in files]
+            if any(
+                default_storage.get_modified_time(name) > created_before
+                for name in names
+            ):
+                continue
+            for name in names:
+                default_storage.delete(name)
+            remove_empty_dir(directory)
+            removed += 1
+    return removed
+
+
+def remove_empty_dir(directory):
+    """
+    Пустые каталоги остаются только в файловом хранилище,
+    у хранилищ без path() каталогов нет.
+    """
+    try:
+        os.rmdir(default_storage.path(directory))
+    except (NotImplementedError, OSError):
+        pass
+
+
+class LocalQueue:
+    """
+    Обрабатывает картинку сразу в текущем процессе.
+    Подходит для тестов и разработки.
+    """
+    # Задачи не копятся, разбирать нечего.
+    is_worker_queue = False
+
+    def push(self, recipe_id):
+        process_recipe_image(recipe_id)
+
+    def pop(self, timeout):
+        time.sleep(timeout)
+        return None
+
+
+class RedisQueue:
+    """
+    Очередь в списке Redis, ее разбирает команда process_images.
+    """
+    is_worker_queue = True
+
+    def __init__(self):
+        self.client = redis.Redis.from_url(settings.IMAGE_QUEUE_URL)
+        self.name = settings.IMAGE_QUEUE_NAME
+
+    def push(self, recipe_id):
+        self.client.lpush(self.name, json.dumps(recipe_id))
+
+    def pop(self, timeout):
+        item = self.client.brpop(self.name, timeout)
+        return json.loads(item[1]) if item else None
+
+
+QUEUE_BACKENDS = {
+    'local': LocalQueue,
+    'redis': RedisQueue,
+}
+
+
+@lru_cache(maxsize=None)
+def _get_queue(backend):
+    return QUEUE_BACKENDS[backend]()
+
+
+def get_queue():
+    return _get_queue(settings.IMAGE_QUEUE_BACKEND)
+
+
+def enqueue_recipe_image(recipe_id):
+    """
+    Ставит картинку в очередь после фиксации транзакции,
+    чтобы обработчик увидел сохраненный файл и рецепт.
+    """
+    transaction.on_commit(lambda: get_queue().push(recipe_id))
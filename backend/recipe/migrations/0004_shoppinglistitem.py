@@ -0,0 +1,58 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_shopping_list(apps, schema_editor):
+    IngredientQuantity = apps.get_model('recipe', 'IngredientQuantity')
+    ShoppingListItem = apps.get_model('recipe', 'ShoppingListItem')
+    totals = IngredientQuantity.objects.filter(
+        recipe__shopping_cart__isnull=False,
+    ).values(
+        'recipe__shopping_cart__user_id',
+        'ingredient_id',
+    ).annotate(
+        total_amount=models.Sum('amount'),
+    ).order_by()
+    ShoppingListItem.objects.bulk_create(
+        (
+            ShoppingListItem(
+                user_id=total['recipe__shopping_cart__user_id'],
+                ingredient_id=total['ingredient_id'],
+                total_amount=total['total_amount'],
+            )
+            for total in totals.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipe', '0003_auto_20230903_1924'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_amount', models.PositiveIntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list_items', to='recipe.ingredient', verbose_name='Ингридиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Ингредиент списка покупок',
+                'verbose_name_plural': 'Список покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='shopping_list_item_unique_constraint'),
+        ),
+        migrations.RunPython(fill_shopping_list, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations
+
+CREATE_INDEXES = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS recipe_ingredient_name_trgm '
+    'ON recipe_ingredient USING gin (name gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS recipe_ingredient_upper_name_trgm '
+    'ON recipe_ingredient USING gin (UPPER(name::text) gin_trgm_ops)',
+)
+DROP_INDEXES = (
+    'DROP INDEX IF EXISTS recipe_ingredient_upper_name_trgm',
+    'DROP INDEX IF EXISTS recipe_ingredient_name_trgm',
+)
+
+
+def run_on_postgresql(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0004_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_on_postgresql(CREATE_INDEXES),
+            run_on_postgresql(DROP_INDEXES),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:21
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def live_count(related_model, field):
+    """
+    Копия foodgram.counters.live_count на момент миграции:
+    миграция не должна зависеть от кода приложения.
+    """
+    return Coalesce(
+        Subquery(
+            related_model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                count=Count('pk')
+            ).values('count'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipe', 'Recipe')
+    FavoriteRecipe = apps.get_model('recipe', 'FavoriteRecipe')
+    ShoppingCart = apps.get_model('recipe', 'ShoppingCart')
+    User = apps.get_model('users', 'User')
+    Follow = apps.get_model('users', 'Follow')
+    Recipe.objects.update(
+        favorites_count=live_count(FavoriteRecipe, 'recipe'),
+        in_carts_count=live_count(ShoppingCart, 'recipe'),
+    )
+    User.objects.update(
+        recipes_count=live_count(Recipe, 'author'),
+        followers_count=live_count(Follow, 'author'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0006_recipe_pub_date_id_index'),
+        ('users', '0003_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сколько раз в избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сколько раз в корзине'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
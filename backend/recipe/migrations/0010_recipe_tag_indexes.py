@@ -0,0 +1,47 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:42
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+import django.db.models.deletion
+
+
+def remove_duplicate_tags(apps, schema_editor):
+    RecipeTag = apps.get_model('recipe', 'RecipeTag')
+    duplicates = RecipeTag.objects.values('recipe', 'tag').annotate(
+        keep=Min('pk'),
+        rows=Count('pk'),
+    ).filter(rows__gt=1).order_by()
+    for row in duplicates.iterator():
+        RecipeTag.objects.filter(
+            recipe=row['recipe'],
+            tag=row['tag'],
+        ).exclude(pk=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0009_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_tags, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipetag',
+            index=models.Index(fields=['tag', 'recipe'], name='recipe_tag_tag_recipe_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipetag',
+            constraint=models.UniqueConstraint(fields=('recipe', 'tag'), name='recipe_tag_unique_constraint'),
+        ),
+        migrations.AlterField(
+            model_name='recipetag',
+            name='recipe',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='recipe.recipe', verbose_name='Рецепт'),
+        ),
+        migrations.AlterField(
+            model_name='recipetag',
+            name='tag',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='tag', to='recipe.tag', verbose_name='Тэг'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:47
+
+from django.db import migrations
+import recipe.search
+
+FILL_VECTORS = (
+    "UPDATE recipe_recipe SET search_vector = "
+    "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(text, '')), 'B')",
+)
+CREATE_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS recipe_search_vector_gin '
+    'ON recipe_recipe USING gin (search_vector)',
+)
+DROP_INDEXES = (
+    'DROP INDEX IF EXISTS recipe_search_vector_gin',
+)
+
+
+def run_on_postgresql(statements):
+    def operation(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+def fill_search_documents(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        return
+    Recipe = apps.get_model('recipe', 'Recipe')
+    recipes = Recipe.objects.only('name', 'text')
+    for row in recipes.iterator():
+        Recipe.objects.filter(pk=row.pk).update(
+            search_vector=recipe.search.search_document(row.name, row.text),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0011_relation_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=recipe.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(
+            run_on_postgresql(FILL_VECTORS),
+            migrations.RunPython.noop,
+        ),
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(
+            run_on_postgresql(CREATE_INDEXES),
+            run_on_postgresql(DROP_INDEXES),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from recipe.cook_index import build_postings, pack
+
+
+def fill_postings(apps, schema_editor):
+    IngredientPosting = apps.get_model('recipe', 'IngredientPosting')
+    IngredientQuantity = apps.get_model('recipe', 'IngredientQuantity')
+    postings = build_postings(
+        IngredientQuantity.objects.values_list(
+            'recipe_id', 'ingredient_id',
+        ).order_by('recipe_id').iterator()
+    )
+    IngredientPosting.objects.bulk_create(
+        (
+            IngredientPosting(
+                ingredient_id=ingredient_id,
+                block=block,
+                recipes=pack(offsets),
+                sizes=pack(sizes),
+            )
+            for (ingredient_id, block), (offsets, sizes) in postings.items()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipe', '0012_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('block', models.PositiveIntegerField(verbose_name='Блок рецептов')),
+                ('recipes', models.BinaryField(default=bytes, verbose_name='Смещения id рецептов')),
+                ('sizes', models.BinaryField(default=bytes, verbose_name='Кол-во ингредиентов рецептов')),
+                ('ingredient', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='recipe.ingredient', verbose_name='Ингредиент')),
+            ],
+            options={
+                'verbose_name': 'Блок индекса ингредиентов',
+                'verbose_name_plural': 'Индекс ингредиентов',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ingredientposting',
+            constraint=models.UniqueConstraint(fields=('ingredient', 'block'), name='ingredient_posting_unique_constraint'),
+        ),
+        migrations.RunPython(fill_postings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from recipe.feed import live_entries
+
+
+def fill_timeline(apps, schema_editor):
+    TimelineEntry = apps.get_model('recipe', 'TimelineEntry')
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                pub_date=pub_date,
+            )
+            for user_id, recipe_id, author_id, pub_date in live_entries(
+                apps.get_model('recipe', 'Recipe').objects,
+                apps.get_model(settings.AUTH_USER_MODEL).objects,
+            )
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipe', '0013_ingredient_posting'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации рецепта')),
+                ('author', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='recipe.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Ленты подписок',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['user', '-pub_date', '-recipe'], name='timeline_user_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timelineentry',
+            index=models.Index(fields=['author', 'user'], name='timeline_author_user_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timelineentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='timeline_entry_unique_constraint'),
+        ),
+        migrations.RunPython(fill_timeline, migrations.RunPython.noop),
+    ]
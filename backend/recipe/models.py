@@ -1,10 +1,12 @@
 from colorfield.fields import ColorField
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
-from django.db.models import Exists, OuterRef
+from django.db import connections, models, router, transaction
+from django.db.models import Exists, OuterRef, Subquery
 
 from foodgram import constants
-from users.models import User
+from foodgram.counters import CounterFieldsMixin
+from recipe.search import SearchVectorField, search_vector
+from users.models import Follow, User
 
 
 class Tag(models.Model):
@@ -51,8 +53,8 @@ class Ingredient(models.Model):
 class RecipeQuerySet(models.QuerySet):
     """
     Возвращает queryset с аннотациями,
-    связанными с избранными рецептами и корзиной для покупок,
-    если пользователь аутентифицирован.
+    связанными с избранными рецептами, корзиной для покупок
+    и подпиской на автора рецепта, если пользователь аутентифицирован.
     Если пользователь анонимен, метод возвращает базовый queryset.
     """
     def annotate_user_fields(self, user_id):
@@ -64,18 +66,51 @@ class RecipeQuerySet(models.QuerySet):
             user=user_id,
             recipe_id=OuterRef('pk')
         )
+        subscribed = Follow.objects.filter(
+            user=user_id,
+            author_id=OuterRef('author_id')
+        )
         return self.annotate(
             is_favorited=Exists(favorited),
-            is_in_shopping_cart=Exists(shopping_cart)
+            is_in_shopping_cart=Exists(shopping_cart),
+            author_is_subscribed=Exists(subscribed),
         ) if user_id else super().annotate()
 
+    def lock(self, recipe_id):
+        """
+        Блокирует строку рецепта до конца транзакции. Изменения
+        ингредиентов рецепта и добавление его в корзины выполняются
+        по очереди и считают изменения списков покупок по набору
+        ингредиентов, прочитанному уже после блокировки.
+        """
+        list(self.select_for_update().filter(pk=recipe_id).values_list(
+            'pk', flat=True,
+        ))
+
+    def limit_per_author(self, limit):
+        """
+        Оставляет не больше limit последних рецептов каждого автора.
+        Лимит применяется одним коррелированным подзапросом,
+        поэтому рецепты всех авторов выбираются одним запросом.
+        """
+        if not limit:
+            return self
+        return self.filter(
+            pk__in=Subquery(
+                Recipe.objects.filter(
+                    author_id=OuterRef('author_id')
+                ).values('pk')[:limit]
+            )
+        )
+
 
-class Recipe(models.Model):
+class Recipe(CounterFieldsMixin, models.Model):
     author = models.ForeignKey(
         User,
         verbose_name='Автор',
         on_delete=models.CASCADE,
-        related_name='recipe'
+        related_name='recipe',
+        db_index=False,
     )
     name = models.CharField(
         'Название рецепта',
@@ -119,19 +154,91 @@ class Recipe(models.Model):
         'Дата публикации',
         auto_now_add=True,
     )
+    favorites_count = models.PositiveIntegerField(
+        'Сколько раз в избранном',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'Сколько раз в корзине',
+        default=0,
+        editable=False,
+    )
+    image_hash = models.CharField(
+        'SHA-256 картинки',
+        max_length=64,
+        blank=True,
+        editable=False,
+        db_index=True,
+    )
+    image_variants = models.JSONField(
+        'Уменьшенные копии картинки',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
+    trending_score = models.FloatField(
+        'Рейтинг популярности за последние дни',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False,
+    )
     objects = RecipeQuerySet.as_manager()
+    counter_fields = ('favorites_count', 'in_carts_count', 'trending_score')
+    search_fields = ('name', 'text')
 
     class Meta:
         ordering = (
             '-pub_date',
-            'author',
+            '-id',
         )
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx',
+            ),
+            models.Index(
+                fields=('-favorites_count', '-id'),
+                name='recipe_popular_idx',
+            ),
+            models.Index(
+                fields=('-trending_score', '-id'),
+                name='recipe_trending_idx',
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_idx',
+            ),
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """
+        Поисковый вектор пересчитывается в том же запросе,
+        если сохраняются название или описание.
+        """
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(self.search_fields) & set(
+            update_fields
+        ):
+            using = kwargs.get('using') or router.db_for_write(
+                type(self), instance=self,
+            )
+            self.search_vector = search_vector(
+                self.name, self.text, connections[using].vendor,
+            )
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'search_vector'}
+        super().save(*args, **kwargs)
+
 
 class IngredientQuantity(models.Model):
     recipe = models.ForeignKey(
@@ -139,6 +246,7 @@ class IngredientQuantity(models.Model):
         verbose_name='Рецепт',
         on_delete=models.CASCADE,
         related_name='recipe_ingredient',
+        db_index=False,
     )
     ingredient = models.ForeignKey(
         Ingredient,
@@ -160,6 +268,15 @@ class IngredientQuantity(models.Model):
         )
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=('recipe', 'ingredient'),
+                include=('amount',),
+                name='ingredient_quantity_recipe_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.ingredient.name
 
@@ -169,14 +286,30 @@ class RecipeTag(models.Model):
         Recipe,
         verbose_name='Рецепт',
         on_delete=models.CASCADE,
+        db_index=False,
     )
     tag = models.ForeignKey(
         Tag,
         verbose_name='Тэг',
         on_delete=models.CASCADE,
-        related_name='tag'
+        related_name='tag',
+        db_index=False,
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('recipe', 'tag'),
+                name='recipe_tag_unique_constraint',
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('tag', 'recipe'),
+                name='recipe_tag_tag_recipe_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.tag.name
 
@@ -186,11 +319,18 @@ class AbstractUsersRecipe(models.Model):
         User,
         verbose_name='Пользователь',
         on_delete=models.CASCADE,
+        db_index=False,
     )
     recipe = models.ForeignKey(
         Recipe,
         verbose_name='Рецепт',
         on_delete=models.CASCADE,
+        db_index=False,
+    )
+    created_at = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True,
+        db_index=True,
     )
 
     class Meta:
@@ -201,6 +341,12 @@ class AbstractUsersRecipe(models.Model):
                 name='%(class)s_unique_constraint',
             )
         ]
+        indexes = [
+            models.Index(
+                fields=('recipe', 'user'),
+                name='%(class)s_recipe_user_idx',
+            ),
+        ]
 
     def str(self):
         return f'{self.user} - {self.recipe}'
@@ -218,3 +364,215 @@ class ShoppingCart(AbstractUsersRecipe):
         default_related_name = 'shopping_cart'
         verbose_name = 'Корзина'
         verbose_name_plural = 'Корзина'
+
+
+class ShoppingListItemQuerySet(models.QuerySet):
+    """
+    Поддерживает список покупок пользователей в актуальном состоянии,
+    применяя изменения количества ингредиентов вместо пересчета.
+    """
+    def apply_deltas(self, deltas):
+        """
+        Применяет изменения вида {(user_id, ingredient_id): delta}.
+        Строки пользователей блокируются, чтобы параллельные изменения
+        одного списка покупок выполнялись по очереди.
+        """
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        user_ids = sorted({user_id for user_id, _ in deltas})
+        ingredient_ids = {ingredient_id for _, ingredient_id in deltas}
+        with transaction.atomic():
+            list(
+                User.objects.select_for_update().filter(
+                    pk__in=user_ids
+                ).order_by('pk').values_list('pk', flat=True)
+            )
+            items = {
+                (item.user_id, item.ingredient_id): item
+                for item in self.filter(
+                    user_id__in=user_ids,
+                    ingredient_id__in=ingredient_ids,
+                )
+            }
+            to_create, to_update, to_delete = [], [], []
+            for (user_id, ingredient_id), delta in deltas.items():
+                item = items.get((user_id, ingredient_id))
+                if item is None:
+                    if delta > 0:
+                        to_create.append(self.model(
+                            user_id=user_id,
+                            ingredient_id=ingredient_id,
+                            total_amount=delta,
+                        ))
+                    continue
+                item.total_amount += delta
+                if item.total_amount > 0:
+                    to_update.append(item)
+                else:
+                    to_delete.append(item.pk)
+            self.bulk_create(to_create)
+            self.bulk_update(to_update, ('total_amount',))
+            self.filter(pk__in=to_delete).delete()
+
+    def add_recipe(self, user_id, recipe_id, sign=1):
+        """
+        Добавляет ингредиенты рецепта в список покупок пользователя.
+        Ингредиенты читаются после блокировки рецепта, чтобы
+        параллельное изменение рецепта не дало устаревших разниц.
+        """
+        with transaction.atomic():
+            Recipe.objects.lock(recipe_id)
+            self.apply_deltas({
+                (user_id, ingredient_id): sign * amount
+                for ingredient_id, amount in IngredientQuantity.objects.filter(
+                    recipe_id=recipe_id
+                ).values_list('ingredient_id', 'amount')
+            })
+
+    def remove_recipe(self, user_id, recipe_id):
+        """
+        Убирает ингредиенты рецепта из списка покупок пользователя.
+        """
+        self.add_recipe(user_id, recipe_id, sign=-1)
+
+    def change_recipe(self, recipe_id, amount_deltas):
+        """
+        Исправляет списки покупок всех пользователей,
+        у которых рецепт в корзине, после изменения его ингредиентов.
+
+        amount_deltas: {ingredient_id: изменение количества}.
+        """
+        amount_deltas = {
+            ingredient_id: delta
+            for ingredient_id, delta in amount_deltas.items() if delta
+        }
+        if not amount_deltas:
+            return
+        self.apply_deltas({
+            (user_id, ingredient_id): delta
+            for user_id in ShoppingCart.objects.filter(
+                recipe_id=recipe_id
+            ).values_list('user_id', flat=True)
+            for ingredient_id, delta in amount_deltas.items()
+        })
+
+
+class ShoppingListItem(models.Model):
+    """
+    Материализованный список покупок пользователя:
+    сумма ингредиентов всех рецептов в его корзине.
+    """
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Ингридиент',
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+    )
+    total_amount = models.PositiveIntegerField('Количество')
+    objects = ShoppingListItemQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Список покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='shopping_list_item_unique_constraint',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user} - {self.ingredient}: {self.total_amount}'
+
+
+class IngredientPosting(models.Model):
+    """
+    Блок инвертированного индекса ингредиент -> рецепты для поиска
+    рецептов по ингредиентам в наличии (recipe/cook_index.py).
+
+    Рецепты разбиты на блоки по id, в строке хранятся упакованные
+    отсортированные смещения id рецептов внутри блока и кол-во
+    ингредиентов каждого из них.
+    """
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Ингредиент',
+        on_delete=models.CASCADE,
+        related_name='postings',
+        db_index=False,
+    )
+    block = models.PositiveIntegerField('Блок рецептов')
+    recipes = models.BinaryField('Смещения id рецептов', default=bytes)
+    sizes = models.BinaryField('Кол-во ингредиентов рецептов', default=bytes)
+
+    class Meta:
+        verbose_name = 'Блок индекса ингредиентов'
+        verbose_name_plural = 'Индекс ингредиентов'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('ingredient', 'block'),
+                name='ingredient_posting_unique_constraint',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient_id}:{self.block}'
+
+
+class TimelineEntry(models.Model):
+    """
+    Рецепт в ленте подписчика, записанный при публикации
+    (recipe/feed.py). Рецепты авторов с большим кол-вом подписчиков
+    или рецептов в ленты не пишутся и читаются при запросе ленты.
+    """
+    user = models.ForeignKey(
+        User,
+        verbose_name='Подписчик',
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        db_index=False,
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+        related_name='+',
+        db_index=False,
+    )
+    pub_date = models.DateTimeField('Дата публикации рецепта')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='timeline_entry_unique_constraint',
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='timeline_user_pub_date_idx',
+            ),
+            models.Index(
+                fields=('author', 'user'),
+                name='timeline_author_user_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} - {self.recipe}'
@@ -0,0 +1,98 @@
+from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import StrIndex
+
+SEARCH_CONFIG = 'russian'
+NAME_WEIGHT = 'A'
+TEXT_WEIGHT = 'B'
+
+
+class SearchVectorField(models.Field):
+    """
+    Поисковый вектор рецепта: tsvector в PostgreSQL, в остальных БД -
+    название и описание в нижнем регистре для поиска через LIKE.
+
+    Поле django.contrib.postgres требует psycopg2,
+    поэтому тип столбца выбирается по БД здесь.
+    """
+
+    def db_type(self, connection):
+        if connection.vendor == 'postgresql':
+            return 'tsvector'
+        return 'text'
+
+
+def search_document(name, text):
+    """
+    Нижний регистр считается в Python: LOWER и LIKE в SQLite
+    работают только с ASCII.
+    """
+    return f'{name}\n{text}'.lower()
+
+
+def search_vector(name, text, vendor):
+    """
+    Значение поискового вектора для INSERT или UPDATE:
+    название весит больше описания.
+    """
+    if vendor != 'postgresql':
+        return search_document(name, text)
+    from django.contrib.postgres.search import SearchVector
+
+    return (
+        SearchVector(Value(name), weight=NAME_WEIGHT, config=SEARCH_CONFIG)
+        + SearchVector(Value(text), weight=TEXT_WEIGHT, config=SEARCH_CONFIG)
+    )
+
+
+def fill_search_vectors(queryset, vendor):
+    """
+    Пересчитывает поисковые векторы рецептов, созданных в обход save(),
+    например через bulk_create.
+    """
+    if vendor != 'postgresql':
+        for pk, name, text in queryset.values_list('pk', 'name', 'text'):
+            queryset.filter(pk=pk).update(
+                search_vector=search_document(name, text),
+            )
+        return
+    from django.contrib.postgres.search import SearchVector
+
+    queryset.update(search_vector=(
+        SearchVector('name', weight=NAME_WEIGHT, config=SEARCH_CONFIG)
+        + SearchVector('text', weight=TEXT_WEIGHT, config=SEARCH_CONFIG)
+    ))
+
+
+def search_recipes(queryset, query, vendor):
+    """
+    Рецепты, подходящие под запрос, от более релевантных к менее.
+
+    В PostgreSQL - полнотекстовый поиск с морфологией по GIN-индексу
+    и ранжированием ts_rank (лукап search_vector=SearchQuery
+    регистрируется в RecipeConfig.ready()). В остальных БД каждое слово запроса
+    ищется подстрокой, а выше те рецепты, где слово встречается
+    раньше, то есть сначала совпадения в названии.
+    """
+    query = query.strip()
+    if not query:
+        return queryset
+    if vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        search_query = SearchQuery(
+            query,
+            config=SEARCH_CONFIG,
+            search_type='websearch',
+        )
+        return queryset.filter(
+            search_vector=search_query,
+        ).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query),
+        ).order_by('-search_rank', '-pub_date', '-id')
+    words = query.lower().split()
+    for word in words:
+        queryset = queryset.filter(search_vector__contains=word)
+    return queryset.annotate(
+        search_position=StrIndex('search_vector', Value(words[0])),
+    ).order_by('search_position', '-pub_date', '-id')
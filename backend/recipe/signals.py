@@ -0,0 +1,125 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from foodgram.counters import change_counter
+from users.models import Follow, User
+
+from .cook_index import recipe_ingredient_ids, reindex_recipe
+from .feed import (backfill_follow, on_author_shrunk, on_recipe_created,
+                   remove_follow)
+from .images import enqueue_recipe_image
+from .models import (FavoriteRecipe, Ingredient, IngredientQuantity, Recipe,
+                     ShoppingCart, ShoppingListItem)
+
+RECIPE_COUNTERS = {
+    FavoriteRecipe: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_recipe_to_shopping_list(sender, instance, created, **kwargs):
+    """
+    Добавляет ингредиенты рецепта в список покупок.
+    """
+    if created:
+        ShoppingListItem.objects.add_recipe(
+            instance.user_id,
+            instance.recipe_id,
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_recipe_from_shopping_list(sender, instance, **kwargs):
+    """
+    Убирает ингредиенты рецепта из списка покупок.
+    Срабатывает и при каскадном удалении рецепта,
+    пока его ингредиенты еще не удалены.
+    """
+    ShoppingListItem.objects.remove_recipe(
+        instance.user_id,
+        instance.recipe_id,
+    )
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_save, sender=ShoppingCart)
+def increment_recipe_counter(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            Recipe, instance.recipe_id, RECIPE_COUNTERS[sender], 1
+        )
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_recipe_counter(sender, instance, **kwargs):
+    """
+    Срабатывает и при удалении queryset'а или каскадном удалении:
+    Django отправляет post_delete для каждой удаленной строки.
+    """
+    change_counter(Recipe, instance.recipe_id, RECIPE_COUNTERS[sender], -1)
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def enqueue_image_processing(sender, instance, update_fields, **kwargs):
+    """
+    Отправляет картинку на обработку, если она могла измениться.
+    Обработчик сам пропускает картинки, которые уже обработаны.
+    """
+    image_changed = update_fields is None or 'image' in update_fields
+    if image_changed and (instance.image or instance.image_hash):
+        enqueue_recipe_image(instance.pk)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_cook_index(sender, instance, **kwargs):
+    reindex_recipe(instance.pk, recipe_ingredient_ids(instance.pk), ())
+
+
+@receiver(pre_delete, sender=Ingredient)
+def remove_ingredient_from_cook_index(sender, instance, **kwargs):
+    """
+    Ингредиент удаляется из рецептов каскадно,
+    у этих рецептов меняется кол-во ингредиентов в индексе.
+    """
+    recipe_ids = IngredientQuantity.objects.filter(
+        ingredient=instance,
+    ).values_list('recipe_id', flat=True)
+    for recipe_id in recipe_ids:
+        old_ids = recipe_ingredient_ids(recipe_id)
+        reindex_recipe(recipe_id, old_ids, old_ids - {instance.pk})
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe_to_feeds(sender, instance, created, **kwargs):
+    if created:
+        on_recipe_created(instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def add_author_to_feed(sender, instance, created, **kwargs):
+    if created:
+        backfill_follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def remove_author_from_feed(sender, instance, **kwargs):
+    remove_follow(instance.user_id, instance.author_id)
+    on_author_shrunk(instance.author_id, 'followers_count')
+
+
+@receiver(post_delete, sender=Recipe)
+def backfill_feeds_after_recipe_delete(sender, instance, **kwargs):
+    on_author_shrunk(instance.author_id, 'recipes_count')
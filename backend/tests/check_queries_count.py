@@ -0,0 +1,25 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def count_queries(client, url, **params):
+    """
+    Возвращает кол-во SQL-запросов, выполненных при GET-запросе к url.
+    """
+    with CaptureQueriesContext(connection) as context:
+        client.get(url, params)
+    return len(context.captured_queries)
+
+
+def check_constant_queries(client, url, small_params, large_params):
+    """
+    Проверяет, что кол-во запросов не зависит от размера страницы.
+    """
+    small_page_queries = count_queries(client, url, **small_params)
+    large_page_queries = count_queries(client, url, **large_params)
+    assert small_page_queries == large_page_queries, (
+        f'Убедитесь, что кол-во запросов к БД при обращении к "{url}" '
+        f'не зависит от кол-ва объектов на странице: '
+        f'{small_page_queries} запросов для {small_params} и '
+        f'{large_page_queries} запросов для {large_params}.'
+    )
@@ -0,0 +1,84 @@
+import json
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+LARGE_TABLES = (
+    'recipe_recipe',
+    'recipe_ingredientquantity',
+    'recipe_recipetag',
+    'recipe_favoriterecipe',
+    'recipe_shoppingcart',
+    'recipe_shoppinglistitem',
+    'users_user',
+    'users_follow',
+)
+
+
+def sqlite_seq_scans(sql):
+    """
+    Таблицы, которые SQLite читает целиком, без индекса.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        details = [row[-1] for row in cursor.fetchall()]
+    return [
+        detail.split()[1] for detail in details
+        if detail.startswith('SCAN ') and ' USING ' not in detail
+    ]
+
+
+def postgresql_plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from postgresql_plan_nodes(child)
+
+
+def postgresql_seq_scans(sql):
+    """
+    Таблицы с Seq Scan в плане PostgreSQL. Seq Scan отключается
+    на время EXPLAIN, поэтому в плане остаются только те,
+    которые нечем заменить: на маленьких тестовых таблицах
+    планировщик иначе выбирает их всегда.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SET enable_seqscan = off')
+        try:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+        finally:
+            cursor.execute('RESET enable_seqscan')
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return [
+        node['Relation Name']
+        for node in postgresql_plan_nodes(plan[0]['Plan'])
+        if node['Node Type'] == 'Seq Scan'
+    ]
+
+
+def seq_scans(sql):
+    if connection.vendor == 'postgresql':
+        return postgresql_seq_scans(sql)
+    return sqlite_seq_scans(sql)
+
+
+def check_no_seq_scans(client, url, params=None, tables=LARGE_TABLES):
+    """
+    Проверяет, что планы всех SELECT-запросов, выполненных
+    при GET-запросе к url (включая отдачу потокового ответа),
+    не читают большие таблицы целиком.
+    """
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url, params or {})
+        if response.streaming:
+            b''.join(response.streaming_content)
+    for query in context.captured_queries:
+        sql = query['sql']
+        if not sql.startswith('SELECT'):
+            continue
+        scanned = [table for table in seq_scans(sql) if table in tables]
+        assert not scanned, (
+            f'Убедитесь, что при обращении к "{url}" запрос не читает '
+            f'таблицы {", ".join(scanned)} целиком:\n{sql}'
+        )
@@ -1,6 +1,8 @@
 import os
 import sys
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(BASE_DIR)
 
@@ -17,4 +19,25 @@ if FILENAME not in project_dir_content:
 pytest_plugins = [
     'tests.fixtures.fixture_data',
     'tests.fixtures.fixture_user',
+    'tests.plugins.query_budget',
 ]
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def reset_ingredient_index():
+    from api.v1 import ingredient_search
+
+    with ingredient_search._index_lock:
+        ingredient_search._current = None
+    yield
+    with ingredient_search._index_lock:
+        ingredient_search._current = None
@@ -1,4 +1,4 @@
-from recipe.models import Ingredient, Tag
+from recipe.models import Ingredient, IngredientQuantity, Recipe, Tag
 
 import pytest
 
@@ -35,3 +35,30 @@ def ingredient_2():
         name='Ingredient2',
         measurement_unit='unit2',
     )
+
+
+@pytest.fixture
+def recipes(authors, tag_1, ingredient_1, ingredient_2):
+    recipes = []
+    for number, author in enumerate(authors):
+        recipe = Recipe.objects.create(
+            author=author,
+            name=f'Recipe{number}',
+            text='Text',
+            cooking_time=10,
+        )
+        recipe.tags.add(tag_1)
+        IngredientQuantity.objects.bulk_create([
+            IngredientQuantity(
+                recipe=recipe,
+                ingredient=ingredient_1,
+                amount=10,
+            ),
+            IngredientQuantity(
+                recipe=recipe,
+                ingredient=ingredient_2,
+                amount=20,
+            ),
+        ])
+        recipes.append(recipe)
+    return recipes
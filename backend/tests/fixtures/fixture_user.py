@@ -8,7 +8,7 @@ def password():
 
 @pytest.fixture
 def user(django_user_model, password):
-    return django_user_model.object.create_user(
+    return django_user_model.objects.create_user(
         email='user@example.com',
         username='exampleuser',
         first_name='John',
@@ -25,9 +25,23 @@ def user_token(user):
 
 
 @pytest.fixture
-def user_client(user, token):
+def user_client(user, user_token):
     from rest_framework.test import APIClient
 
     client = APIClient()
-    client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+    client.credentials(HTTP_AUTHORIZATION=f'Token {user_token}')
     return client
+
+
+@pytest.fixture
+def authors(django_user_model, password):
+    return [
+        django_user_model.objects.create_user(
+            email=f'author{number}@example.com',
+            username=f'author{number}',
+            first_name='Jane',
+            last_name='Doe',
+            password=password,
+        )
+        for number in range(10)
+    ]
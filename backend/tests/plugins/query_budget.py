@@ -0,0 +1,45 @@
+import pytest
+
+from api.metrics import request_measured
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers',
+        'query_budget(limit): максимальное кол-во SQL-запросов на запрос '
+        'к эндпоинту; limit - число или словарь {endpoint: число}.',
+    )
+
+
+@pytest.fixture(autouse=True)
+def query_budget(request, settings):
+    """
+    Для тестов с маркером query_budget включает RequestMetricsMiddleware
+    и проверяет кол-во SQL-запросов каждого запроса к API.
+    """
+    marker = request.node.get_closest_marker('query_budget')
+    if marker is None:
+        yield
+        return
+    limit = marker.args[0] if marker.args else marker.kwargs['limit']
+    settings.REQUEST_METRICS_ENABLED = True
+    exceeded = []
+
+    def check(sender, endpoint, metrics, **kwargs):
+        budget = limit.get(endpoint) if isinstance(limit, dict) else limit
+        if budget is not None and metrics['queries'] > budget:
+            exceeded.append(
+                f'{endpoint}: {metrics["queries"]} запросов, '
+                f'бюджет {budget}'
+            )
+
+    request_measured.connect(check)
+    try:
+        yield
+    finally:
+        request_measured.disconnect(check)
+    if exceeded:
+        pytest.fail(
+            'Превышен бюджет SQL-запросов:\n' + '\n'.join(exceeded),
+            pytrace=False,
+        )
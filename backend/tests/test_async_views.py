@@ -0,0 +1,136 @@
+import asyncio
+from http import HTTPStatus
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient
+from django.urls import include, path, resolve, reverse
+
+from api.metrics import request_measured
+from api.urls import ASYNC_VIEW_NAMES, router_v1
+from api.v1.async_views import StreamingASGIHandler, offload_views
+from recipe.models import ShoppingCart
+
+# Этот модуль подставляется в ROOT_URLCONF: API с асинхронными
+# эндпоинтами чтения, как при ASYNC_VIEWS=True.
+urlpatterns = [
+    path('api/', include(offload_views(router_v1.urls, ASYNC_VIEW_NAMES))),
+]
+
+
+@pytest.mark.django_db(transaction=True)
+class TestAsyncViews:
+
+    @pytest.fixture
+    def async_api(self, settings):
+        settings.ROOT_URLCONF = __name__
+
+    @staticmethod
+    @async_to_sync
+    async def get(url, token=None):
+        headers = {'authorization': f'Token {token}'} if token else {}
+        return await AsyncClient().get(url, **headers)
+
+    def test_async_views_match_sync(
+            self,
+            user_client,
+            user_token,
+            recipes,
+            async_api,
+    ):
+        expected = {}
+        for name, args in (
+            ('recipes-list', ()),
+            ('recipes-detail', (recipes[0].id,)),
+            ('tags-list', ()),
+        ):
+            url = reverse(name, args=args, urlconf='foodgram.urls')
+            expected[url] = user_client.get(url).json()
+        for url, data in expected.items():
+            assert asyncio.iscoroutinefunction(resolve(url).func), (
+                f'Убедитесь, что {url} обрабатывается асинхронно.'
+            )
+            response = self.get(url, token=user_token)
+            assert response.status_code == HTTPStatus.OK
+            assert response.json() == data, (
+                f'Убедитесь, что асинхронный {url} отвечает '
+                f'так же, как синхронный.'
+            )
+
+    def test_async_download_shopping_cart(
+            self,
+            user,
+            user_token,
+            recipes,
+            async_api,
+    ):
+        for recipe in recipes[:3]:
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+        response = self.get(
+            reverse('recipes-download-shopping-cart'),
+            token=user_token,
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert b''.join(response.streaming_content) == (
+            'Ingredient1: 30unit1\nIngredient2: 60unit2\n'.encode('utf-8')
+        ), 'Убедитесь, что список покупок отдается и в ASGI.'
+
+    def test_asgi_handler_streams_shopping_cart(
+            self,
+            user,
+            user_token,
+            recipes,
+            async_api,
+    ):
+        """
+        ASGI-обработчик отдает список покупок по частям,
+        читая строки из БД вне event loop'а.
+        """
+        for recipe in recipes[:3]:
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        async_to_sync(StreamingASGIHandler())({
+            'type': 'http',
+            'method': 'GET',
+            'path': reverse('recipes-download-shopping-cart'),
+            'query_string': b'',
+            'headers': [
+                (b'authorization', f'Token {user_token}'.encode()),
+            ],
+        }, receive, send)
+        start, *body = messages
+        assert start['status'] == HTTPStatus.OK
+        assert len(body) == 3 and not body[-1].get('more_body'), (
+            'Убедитесь, что список покупок отдается по частям.'
+        )
+        assert b''.join(message.get('body', b'') for message in body) == (
+            'Ingredient1: 30unit1\nIngredient2: 60unit2\n'.encode('utf-8')
+        )
+
+    def test_async_views_metrics(self, settings, recipes, async_api):
+        settings.REQUEST_METRICS_ENABLED = True
+        measured = []
+
+        def receiver(sender, endpoint, metrics, **kwargs):
+            measured.append((endpoint, metrics['queries']))
+
+        request_measured.connect(receiver)
+        try:
+            response = self.get(reverse('recipes-list'))
+        finally:
+            request_measured.disconnect(receiver)
+        assert response.status_code == HTTPStatus.OK
+        assert len(measured) == 1
+        endpoint, queries = measured[0]
+        assert endpoint == 'GET recipes-list'
+        assert queries > 0, (
+            'Убедитесь, что запросы к БД из пула потоков '
+            'попадают в метрики запроса.'
+        )
@@ -0,0 +1,126 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from benchmarks.runner import compare
+from benchmarks.scenarios import SCENARIOS
+from recipe.models import FavoriteRecipe, Recipe
+from users.models import Follow, User
+
+
+@pytest.mark.django_db(transaction=True)
+class TestBenchmarks:
+
+    @pytest.fixture
+    def dataset(self):
+        call_command(
+            'generate_dataset',
+            '--users=20',
+            '--recipes=60',
+            '--follows=80',
+            '--favorites=150',
+            '--carts=40',
+            stdout=StringIO(),
+        )
+
+    def test_generate_dataset(self, dataset):
+        assert User.objects.count() == 20
+        assert Recipe.objects.count() == 60
+        assert Follow.objects.count() == 80
+        assert FavoriteRecipe.objects.count() == 150
+        top_recipe = Recipe.objects.order_by('-favorites_count').first()
+        assert top_recipe.favorites_count > 150 / 60 * 3, (
+            'Убедитесь, что избранное распределено неравномерно: '
+            'у самых популярных рецептов кратно больше добавлений.'
+        )
+        call_command('rebuild_counters', '--verify', stdout=StringIO())
+        call_command('rebuild_shopping_lists', '--verify', stdout=StringIO())
+
+    def test_generate_dataset_is_reproducible(self, dataset):
+        favorites = set(FavoriteRecipe.objects.values_list(
+            'user__username', 'recipe__name',
+        ))
+        call_command(
+            'generate_dataset',
+            '--users=20',
+            '--recipes=60',
+            '--follows=80',
+            '--favorites=150',
+            '--carts=40',
+            stdout=StringIO(),
+        )
+        assert set(FavoriteRecipe.objects.values_list(
+            'user__username', 'recipe__name',
+        )) == favorites, (
+            'Убедитесь, что при одном seed набор данных одинаковый.'
+        )
+
+    def test_run_benchmarks(self, dataset, tmp_path):
+        output = tmp_path / 'results.json'
+        call_command(
+            'run_benchmarks',
+            '--iterations=2',
+            '--warmup=0',
+            f'--output={output}',
+            stdout=StringIO(),
+        )
+        report = json.loads(output.read_text())
+        assert report['connections'] == 'per-request', (
+            'Убедитесь, что без CONN_MAX_AGE соединение '
+            'открывается на каждый запрос.'
+        )
+        assert set(report['results']) == {
+            scenario.name for scenario in SCENARIOS
+        }
+        for name, result in report['results'].items():
+            assert all(200 <= status < 300 for status in result['statuses']), (
+                f'Убедитесь, что запросы сценария {name} выполняются успешно.'
+            )
+            assert result['queries_max'] > 0
+        assert Recipe.objects.count() == 60, (
+            'Убедитесь, что изменяющие сценарии не меняют набор данных.'
+        )
+        call_command(
+            'run_benchmarks',
+            '--iterations=2',
+            '--warmup=0',
+            '--scenario=recipes-detail',
+            '--connections=persistent',
+            f'--compare={output}',
+            '--threshold=100000',
+            stdout=StringIO(),
+        )
+        async_output = tmp_path / 'async.json'
+        call_command(
+            'run_benchmarks',
+            '--iterations=2',
+            '--warmup=0',
+            '--client=async',
+            f'--output={async_output}',
+            stdout=StringIO(),
+        )
+        async_report = json.loads(async_output.read_text())
+        assert async_report['client'] == 'async'
+        assert set(async_report['results']) == set(report['results'])
+        for name, result in async_report['results'].items():
+            assert all(200 <= status < 300 for status in result['statuses']), (
+                f'Убедитесь, что сценарий {name} выполняется через ASGI.'
+            )
+        assert Recipe.objects.count() == 60
+
+    def test_compare_reports_query_regression(self):
+        result = {'p50_ms': 10, 'p95_ms': 20, 'queries_max': 5}
+        rows, regressions = compare(
+            {'results': {'recipes-list': result}},
+            {'results': {'recipes-list': {**result, 'queries_max': 6}}},
+            threshold=20,
+        )
+        assert len(rows) == 3
+        assert regressions == ['recipes-list queries_max: 5 -> 6']
+
+    def test_run_benchmarks_without_dataset(self):
+        with pytest.raises(CommandError):
+            call_command('run_benchmarks', '--iterations=1', stdout=StringIO())
@@ -0,0 +1,168 @@
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db.models import prefetch_related_objects
+from django.urls import reverse
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.v1.serializers import CreateUpdateRecipeSerializer
+
+from recipe.cook_index import BLOCK_SIZE, match_recipes, reindex_recipe
+from recipe.models import Ingredient, IngredientPosting, Recipe
+
+
+def verify_index():
+    call_command('rebuild_cook_index', '--verify', stdout=StringIO())
+
+
+@pytest.mark.django_db(transaction=True)
+class TestCookIndex:
+    can_cook_url = reverse('recipes-can-cook')
+
+    @pytest.fixture
+    def ingredient_3(self):
+        return Ingredient.objects.create(
+            name='Ingredient3',
+            measurement_unit='unit3',
+        )
+
+    @pytest.fixture
+    def indexed_recipes(self, recipes):
+        call_command('rebuild_cook_index', stdout=StringIO())
+        return recipes
+
+    def test_rebuild_and_verify(self, indexed_recipes):
+        verify_index()
+        IngredientPosting.objects.all().delete()
+        with pytest.raises(CommandError):
+            verify_index()
+
+    def test_ranking_and_missing_ingredients(
+            self,
+            client,
+            indexed_recipes,
+            ingredient_1,
+            ingredient_2,
+            ingredient_3,
+    ):
+        recipe = indexed_recipes[0]
+        recipe.recipe_ingredient.filter(ingredient=ingredient_2).delete()
+        reindex_recipe(
+            recipe.id,
+            {ingredient_1.id, ingredient_2.id},
+            {ingredient_1.id},
+        )
+        response = client.get(
+            self.can_cook_url,
+            {'ingredients': f'{ingredient_1.id},{ingredient_3.id}'},
+        )
+        assert response.status_code == HTTPStatus.OK
+        data = response.json()
+        assert data['count'] == len(indexed_recipes)
+        first, *others = data['results']
+        assert (first['id'], first['coverage']) == (recipe.id, 1.0), (
+            'Убедитесь, что первыми идут рецепты, '
+            'для которых есть все ингредиенты.'
+        )
+        assert first['missing_ingredients'] == []
+        assert {item['coverage'] for item in others} == {0.5}
+        assert [
+            ingredient['id'] for ingredient in others[0]['missing_ingredients']
+        ] == [ingredient_2.id], (
+            'Убедитесь, что в ответе перечислены недостающие ингредиенты.'
+        )
+
+    def test_index_follows_api_changes(
+            self,
+            indexed_recipes,
+            ingredient_1,
+            ingredient_3,
+            tag_1,
+    ):
+        recipe = indexed_recipes[0]
+        client = APIClient()
+        client.force_authenticate(recipe.author)
+        response = client.patch(
+            reverse('recipes-detail', args=[recipe.id]),
+            {
+                'ingredients': [
+                    {'id': ingredient_1.id, 'amount': 1},
+                    {'id': ingredient_3.id, 'amount': 2},
+                ],
+                'tags': [tag_1.id],
+            },
+            format='json',
+        )
+        assert response.status_code == HTTPStatus.OK, response.json()
+        verify_index()
+        _, matches = match_recipes({ingredient_3.id}, 10)
+        assert matches == [(recipe.id, 1, 2)]
+        Recipe.objects.filter(pk=indexed_recipes[1].pk).delete()
+        verify_index()
+        ingredient_3.delete()
+        verify_index()
+        assert not IngredientPosting.objects.filter(
+            ingredient_id=ingredient_3.id,
+        ).exists()
+
+    def test_update_with_stale_ingredients(
+            self,
+            indexed_recipes,
+            ingredient_1,
+            ingredient_3,
+    ):
+        """
+        Изменение рецепта, загруженного до параллельного изменения,
+        считает затронутые блоки по ингредиентам после блокировки.
+        """
+        recipe = indexed_recipes[0]
+        stale = Recipe.objects.get(pk=recipe.pk)
+        prefetch_related_objects([stale], 'recipe_ingredient', 'tags')
+        request = APIRequestFactory().patch('/')
+        request.user = recipe.author
+        for instance, ingredient in (
+            (Recipe.objects.get(pk=recipe.pk), ingredient_3),
+            (stale, ingredient_1),
+        ):
+            serializer = CreateUpdateRecipeSerializer(
+                instance,
+                data={'ingredients': [{'id': ingredient.id, 'amount': 1}]},
+                partial=True,
+                context={'request': request},
+            )
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+        verify_index()
+        assert match_recipes({ingredient_3.id}, 10)[1] == [], (
+            'Убедитесь, что в индексе не остается ингредиента, '
+            'убранного из рецепта.'
+        )
+
+    def test_recipes_in_different_blocks(self, ingredient_1, ingredient_2):
+        recipe_ids = (7, BLOCK_SIZE + 3, 3 * BLOCK_SIZE)
+        for recipe_id in recipe_ids:
+            reindex_recipe(recipe_id, (), {ingredient_1.id, ingredient_2.id})
+        reindex_recipe(
+            BLOCK_SIZE + 3,
+            {ingredient_1.id, ingredient_2.id},
+            {ingredient_1.id},
+        )
+        count, matches = match_recipes({ingredient_1.id}, 10)
+        assert count == 3
+        assert matches == [
+            (BLOCK_SIZE + 3, 1, 1),
+            (3 * BLOCK_SIZE, 1, 2),
+            (7, 1, 2),
+        ]
+        assert IngredientPosting.objects.filter(
+            ingredient=ingredient_1,
+        ).count() == 3
+
+    @pytest.mark.parametrize('params', ({}, {'ingredients': 'salt'}))
+    def test_invalid_ingredients(self, client, params):
+        response = client.get(self.can_cook_url, params)
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert 'ingredients' in response.json()
@@ -0,0 +1,152 @@
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import override_settings
+from django.urls import reverse
+
+from recipe.models import Recipe, TimelineEntry
+from users.models import Follow
+
+
+def verify_feed():
+    call_command('rebuild_feed', '--verify', stdout=StringIO())
+
+
+@pytest.mark.django_db(transaction=True)
+class TestFeed:
+    feed_url = reverse('recipes-feed')
+
+    @pytest.fixture
+    def followed(self, user, authors, recipes):
+        for author in authors[:5]:
+            Follow.objects.create(user=user, author=author)
+        return Recipe.objects.filter(
+            author__in=authors[:5],
+        ).order_by('-pub_date', '-id')
+
+    def read_feed(self, user_client, limit):
+        ids, url, params = [], self.feed_url, {'limit': limit}
+        while url:
+            response = user_client.get(url, params)
+            assert response.status_code == HTTPStatus.OK
+            data = response.json()
+            assert len(data['results']) <= limit
+            ids += [recipe['id'] for recipe in data['results']]
+            url, params = data['next'], None
+        return ids
+
+    def test_feed_pages(self, client, user_client, followed):
+        assert client.get(self.feed_url).status_code == (
+            HTTPStatus.UNAUTHORIZED
+        ), 'Убедитесь, что лента доступна только авторизованным.'
+        assert self.read_feed(user_client, 2) == [
+            recipe.id for recipe in followed
+        ], (
+            'Убедитесь, что лента содержит рецепты подписок '
+            'от новых к старым и курсор проходит ее без пропусков.'
+        )
+        response = user_client.get(self.feed_url, {'cursor': 'bad'})
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
+    def test_feed_follows_changes(self, user, user_client, authors, followed):
+        recipe = Recipe.objects.create(
+            author=authors[0],
+            name='New',
+            text='Text',
+            cooking_time=10,
+        )
+        assert self.read_feed(user_client, 6)[0] == recipe.id, (
+            'Убедитесь, что новый рецепт попадает в ленты подписчиков.'
+        )
+        Follow.objects.filter(user=user, author=authors[0]).delete()
+        assert not set(self.read_feed(user_client, 6)) & set(
+            Recipe.objects.filter(
+                author=authors[0],
+            ).values_list('id', flat=True)
+        ), 'Убедитесь, что после отписки рецепты автора пропадают из ленты.'
+        verify_feed()
+
+    def test_pulled_authors(self, user, user_client, authors, followed):
+        with override_settings(FEED_FANOUT_MAX_RECIPES=0):
+            Follow.objects.create(user=user, author=authors[5])
+            assert not TimelineEntry.objects.filter(
+                author=authors[5],
+            ).exists(), (
+                'Убедитесь, что рецепты авторов выше порога '
+                'не записываются в ленты.'
+            )
+            ids = self.read_feed(user_client, 4)
+        assert ids == list(Recipe.objects.filter(
+            author__in=authors[:6],
+        ).order_by('-pub_date', '-id').values_list('id', flat=True)), (
+            'Убедитесь, что рецепты авторов выше порога '
+            'выбираются при запросе ленты без повторов.'
+        )
+
+    def test_author_crosses_threshold(self, user_client, followed):
+        """
+        Рецепты автора, перешедшего порог после публикации, есть
+        и в записях ленты, и среди читаемых при запросе: страницы
+        остаются полными, а курсор проходит ленту до конца.
+        """
+        with override_settings(FEED_FANOUT_MAX_RECIPES=0):
+            for limit in (1, 2, 3):
+                assert self.read_feed(user_client, limit) == [
+                    recipe.id for recipe in followed
+                ], (
+                    'Убедитесь, что повторы из двух источников ленты '
+                    'не укорачивают страницы и не обрывают курсор.'
+                )
+            response = user_client.get(self.feed_url, {'limit': 3})
+        assert len(response.json()['results']) == 3
+
+    def test_author_drops_below_threshold(
+            self,
+            user_client,
+            authors,
+            followed,
+    ):
+        """
+        Автор, опустившийся ниже порога после отписки или удаления
+        рецепта, снова пишется в ленты вместе с рецептами,
+        опубликованными, пока он читался при запросе.
+        """
+        author = authors[0]
+        with override_settings(
+            FEED_FANOUT_MAX_FOLLOWERS=1,
+            FEED_FANOUT_MAX_RECIPES=1,
+        ):
+            Follow.objects.create(user=authors[1], author=author)
+            pulled = Recipe.objects.create(
+                author=author,
+                name='Pulled',
+                text='Text',
+                cooking_time=10,
+            )
+            assert not TimelineEntry.objects.filter(recipe=pulled).exists()
+            Follow.objects.filter(user=authors[1], author=author).delete()
+            assert not TimelineEntry.objects.filter(recipe=pulled).exists(), (
+                'Автор остается выше порога по кол-ву рецептов.'
+            )
+            Recipe.objects.filter(author=author).exclude(pk=pulled.pk).delete()
+            assert self.read_feed(user_client, 2) == list(
+                Recipe.objects.filter(author__in=authors[:5]).order_by(
+                    '-pub_date', '-id',
+                ).values_list('id', flat=True)
+            ), (
+                'Убедитесь, что после возврата автора ниже порога '
+                'его рецепты не пропадают из лент подписчиков.'
+            )
+            verify_feed()
+
+    def test_rebuild_and_verify(self, followed):
+        verify_feed()
+        TimelineEntry.objects.all().delete()
+        with pytest.raises(CommandError):
+            verify_feed()
+        call_command('rebuild_feed', stdout=StringIO())
+        verify_feed()
+        assert TimelineEntry.objects.count() == followed.count()
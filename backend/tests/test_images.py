@@ -0,0 +1,244 @@
+import base64
+import json
+from http import HTTPStatus
+from io import BytesIO, StringIO
+
+import pytest
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from recipe.images import FORMATS, VARIANTS, file_hash
+from recipe.models import Recipe
+
+
+def make_image(size=(2000, 1500)):
+    """
+    PNG с EXIF, закодированный в base64 для Base64ImageField.
+    """
+    image = Image.new('RGB', size, 'orange')
+    exif = Image.Exif()
+    exif[0x010E] = 'secret description'
+    buffer = BytesIO()
+    image.save(buffer, 'PNG', exif=exif)
+    encoded = base64.b64encode(buffer.getvalue()).decode()
+    return f'data:image/png;base64,{encoded}'
+
+
+@pytest.mark.django_db(transaction=True)
+class TestImageVariants:
+    recipes_url = reverse('recipes-list')
+
+    @pytest.fixture(autouse=True)
+    def media_root(self, settings, tmp_path):
+        settings.MEDIA_ROOT = tmp_path
+
+    def create_recipe(self, client, tag_1, ingredient_1, image):
+        response = client.post(
+            self.recipes_url,
+            {
+                'ingredients': [{'id': ingredient_1.id, 'amount': 10}],
+                'tags': [tag_1.id],
+                'image': image,
+                'name': 'Recipe',
+                'text': 'Text',
+                'cooking_time': 10,
+            },
+            format='json',
+        )
+        assert response.status_code == HTTPStatus.CREATED, response.json()
+        return Recipe.objects.get(pk=response.json()['id'])
+
+    def test_variants_created(self, user_client, tag_1, ingredient_1):
+        recipe = self.create_recipe(
+            user_client, tag_1, ingredient_1, make_image()
+        )
+        assert len(recipe.image_hash) == 64, (
+            'Убедитесь, что для картинки считается хеш содержимого.'
+        )
+        assert set(recipe.image_variants) == set(VARIANTS)
+        for variant, formats in recipe.image_variants.items():
+            assert set(formats) == set(FORMATS)
+            for name in formats.values():
+                with default_storage.open(name) as file:
+                    image = Image.open(file)
+                    assert max(image.size) == max(VARIANTS[variant]), (
+                        f'Убедитесь, что копия {variant} уменьшена.'
+                    )
+                    assert not image.getexif(), (
+                        'Убедитесь, что из копий удалены метаданные.'
+                    )
+        response = user_client.get(
+            reverse('recipes-detail', args=[recipe.id])
+        )
+        card = response.json()['image_variants']['card']
+        assert card['webp'].startswith('http'), (
+            'Убедитесь, что в image_variants отдаются ссылки на копии.'
+        )
+
+    def test_same_image_reuses_variants(
+            self,
+            user_client,
+            tag_1,
+            ingredient_1,
+    ):
+        image = make_image((800, 600))
+        first = self.create_recipe(user_client, tag_1, ingredient_1, image)
+        second = self.create_recipe(user_client, tag_1, ingredient_1, image)
+        assert first.image.name != second.image.name
+        assert first.image_variants == second.image_variants, (
+            'Убедитесь, что копии одинаковых картинок создаются один раз.'
+        )
+
+    def test_original_without_exif(self, user_client, tag_1, ingredient_1):
+        recipe = self.create_recipe(
+            user_client, tag_1, ingredient_1, make_image((800, 600))
+        )
+        with default_storage.open(recipe.image.name) as file:
+            image = Image.open(file)
+            assert image.size == (800, 600)
+            assert not image.getexif(), (
+                'Убедитесь, что из оригинала картинки удаляется EXIF.'
+            )
+        assert file_hash(recipe.image) == recipe.image_hash
+
+    def test_cleanup_orphaned_variants(
+            self,
+            settings,
+            user_client,
+            tag_1,
+            ingredient_1,
+    ):
+        recipe = self.create_recipe(
+            user_client, tag_1, ingredient_1, make_image((800, 600))
+        )
+        old_variants = recipe.image_variants
+        response = user_client.patch(
+            reverse('recipes-detail', args=[recipe.id]),
+            {'image': make_image((900, 700))},
+            format='json',
+        )
+        assert response.status_code == HTTPStatus.OK, response.json()
+        recipe.refresh_from_db()
+        call_command('process_images', '--cleanup', stdout=StringIO())
+        assert default_storage.exists(old_variants['card']['webp']), (
+            'Убедитесь, что недавно созданные копии не удаляются.'
+        )
+        settings.IMAGE_VARIANTS_CLEANUP_AGE = 0
+        call_command('process_images', '--cleanup', stdout=StringIO())
+        assert not any(
+            default_storage.exists(name)
+            for formats in old_variants.values()
+            for name in formats.values()
+        ), 'Убедитесь, что копии без рецепта удаляются.'
+        assert all(
+            default_storage.exists(name)
+            for formats in recipe.image_variants.values()
+            for name in formats.values()
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+class TestMultipartUpload:
+    recipes_url = reverse('recipes-list')
+
+    @pytest.fixture(autouse=True)
+    def media_root(self, settings, tmp_path):
+        settings.MEDIA_ROOT = tmp_path
+
+    def image_file(self, size=(300, 200), image_format='PNG'):
+        buffer = BytesIO()
+        Image.new('RGB', size, 'green').save(buffer, image_format)
+        return SimpleUploadedFile(
+            f'recipe.{image_format.lower()}',
+            buffer.getvalue(),
+            content_type=f'image/{image_format.lower()}',
+        )
+
+    def post(self, client, tag_1, ingredient_1, image):
+        return client.post(
+            self.recipes_url,
+            {
+                'ingredients': json.dumps(
+                    [{'id': ingredient_1.id, 'amount': 10}]
+                ),
+                'tags': [tag_1.id],
+                'image': image,
+                'name': 'Recipe',
+                'text': 'Text',
+                'cooking_time': 10,
+            },
+            format='multipart',
+        )
+
+    def test_multipart_create(self, user_client, tag_1, ingredient_1):
+        response = self.post(
+            user_client, tag_1, ingredient_1, self.image_file()
+        )
+        assert response.status_code == HTTPStatus.CREATED, response.json()
+        recipe = Recipe.objects.get(pk=response.json()['id'])
+        assert recipe.image and recipe.image_variants, (
+            'Убедитесь, что рецепт можно создать с картинкой, '
+            'загруженной через multipart/form-data.'
+        )
+        assert response.json()['ingredients'][0]['amount'] == 10
+
+    def test_multipart_patch_image(self, recipes, tag_1, ingredient_1):
+        client = APIClient()
+        client.force_authenticate(recipes[0].author)
+        response = client.patch(
+            reverse('recipes-detail', args=[recipes[0].id]),
+            {'image': self.image_file(image_format='JPEG')},
+            format='multipart',
+        )
+        assert response.status_code == HTTPStatus.OK, response.json()
+        recipes[0].refresh_from_db()
+        assert recipes[0].image.name.endswith('.jpeg')
+
+    def test_too_large_dimensions(
+            self,
+            settings,
+            user_client,
+            tag_1,
+            ingredient_1,
+    ):
+        settings.IMAGE_UPLOAD_MAX_DIMENSION = 100
+        response = self.post(
+            user_client, tag_1, ingredient_1, self.image_file()
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert '300x200' in response.json()['image'][0], (
+            'Убедитесь, что размеры картинки проверяются по заголовку.'
+        )
+        assert not Recipe.objects.exists()
+
+    def test_too_large_file(self, settings, user_client, tag_1, ingredient_1):
+        settings.IMAGE_UPLOAD_MAX_SIZE = 1024
+        response = self.post(
+            user_client, tag_1, ingredient_1, self.image_file((1000, 1000))
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert 'image' in response.json()
+
+    def test_not_an_image(self, user_client, tag_1, ingredient_1):
+        response = self.post(
+            user_client,
+            tag_1,
+            ingredient_1,
+            SimpleUploadedFile('recipe.png', b'not an image' * 10),
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        assert 'image' in response.json()
+
+    def test_worker_requires_queue_backend(self, settings):
+        """
+        С очередью local обработчику нечего разбирать:
+        команда завершается с ошибкой, а не крутится вхолостую.
+        """
+        settings.IMAGE_QUEUE_BACKEND = 'local'
+        with pytest.raises(CommandError, match='IMAGE_QUEUE_BACKEND'):
+            call_command('process_images', '--timeout', '0')
@@ -1,9 +1,18 @@
+import time
+from io import StringIO
+
 import pytest
 
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
 from django.urls import reverse
 
 from http import HTTPStatus
 
+from api.v1 import ingredient_search
+from api.v1.cache import get_version
 from recipe.models import Ingredient
 
 from tests.check_response_fields import check_fields
@@ -94,3 +103,217 @@ class TestIngredientsAPI:
             response_json,
             reverse('ingredients-detail', kwargs={'pk': ingredient_1.id})
         )
+
+
+@pytest.mark.django_db(transaction=True)
+class TestIngredientsCache:
+    ingredients_urls = reverse('ingredients-list')
+
+    def test_ingredients_cache_invalidation(
+            self,
+            client,
+            ingredient_1,
+            ingredient_2,
+    ):
+        """
+        Удаление ингредиента сбрасывает закешированный список.
+        """
+        assert len(client.get(self.ingredients_urls).json()) == 2
+        ingredient_2.delete()
+        assert len(client.get(self.ingredients_urls).json()) == 1, (
+            f'Убедитесь, что после удаления ингредиента ответ на '
+            f'GET-запрос к "{self.ingredients_urls}" не берется из кеша.'
+        )
+
+    def test_ingredients_search_cached_separately(
+            self,
+            client,
+            ingredient_1,
+            ingredient_2,
+    ):
+        client.get(self.ingredients_urls)
+        response = client.get(self.ingredients_urls, {'name': 'Ingredient2'})
+        assert [item['id'] for item in response.json()] == [ingredient_2.id]
+
+    def test_version_changes_after_commit(self, client, ingredient_1):
+        """
+        Версия сдвигается после коммита: ответ, собранный внутри
+        транзакции записи, не закрепляется под новой версией.
+        """
+        with transaction.atomic():
+            version = get_version('ingredients')
+            ingredient_1.delete()
+            assert get_version('ingredients') == version, (
+                'Убедитесь, что версия кеша ингредиентов сдвигается '
+                'только после коммита.'
+            )
+        assert get_version('ingredients') != version
+        assert client.get(self.ingredients_urls).json() == []
+
+    def test_cache_key_params(
+            self,
+            client,
+            ingredient_1,
+            ingredient_2,
+            django_assert_num_queries,
+    ):
+        """
+        В ключ кеша входит только нормализованный поисковый запрос,
+        слишком длинные запросы не кешируются.
+        """
+        client.get(self.ingredients_urls, {'name': 'Ingredient2'})
+        with django_assert_num_queries(0):
+            response = client.get(
+                self.ingredients_urls,
+                {'name': ' Ingredient2 ', 'utm_source': 'mail'},
+            )
+        assert [item['id'] for item in response.json()] == [ingredient_2.id]
+        long_name = 'a' * (settings.PAYLOAD_CACHE_MAX_PARAM_LENGTH + 1)
+        client.get(self.ingredients_urls, {'name': long_name})
+        with django_assert_num_queries(1):
+            client.get(self.ingredients_urls, {'name': long_name})
+
+
+@pytest.mark.django_db(transaction=True)
+class TestIngredientsSearch:
+    search_url = reverse('ingredients-search')
+
+    @pytest.fixture
+    def catalog(self):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in (
+                'абрикосовое варенье',
+                'варенье вишневое',
+                'вишня',
+                'сахар',
+                'сахарная пудра',
+            )
+        )
+
+    def search(self, client, name, **params):
+        response = client.get(self.search_url, {'name': name, **params})
+        assert response.status_code == HTTPStatus.OK
+        return [ingredient['name'] for ingredient in response.json()]
+
+    def test_prefix_before_substring(self, client, catalog):
+        """
+        Совпадения по началу названия идут раньше совпадений по подстроке.
+        """
+        assert self.search(client, 'варенье') == [
+            'варенье вишневое',
+            'абрикосовое варенье',
+        ]
+
+    def test_typo(self, client, catalog):
+        assert self.search(client, 'сахр') == ['сахар'], (
+            f'Убедитесь, что поиск на "{self.search_url}" '
+            f'находит названия с опечатками.'
+        )
+
+    def test_limit(self, client, catalog):
+        assert self.search(client, 'сахар', limit=1) == ['сахар']
+
+    def test_index_rebuilt_on_change(self, client, catalog):
+        assert self.search(client, 'мука') == []
+        with ingredient_search._index_lock:
+            Ingredient.objects.create(name='мука', measurement_unit='г')
+            assert self.search(client, 'мука') == [], (
+                'Убедитесь, что пока собирается новый индекс, '
+                'поиск идет по старому и не ждет сборки.'
+            )
+        deadline = time.monotonic() + 5
+        while (
+            self.search(client, 'мука') != ['мука']
+            and time.monotonic() < deadline
+        ):
+            time.sleep(0.05)
+        assert self.search(client, 'мука') == ['мука'], (
+            'Убедитесь, что индекс поиска пересобирается '
+            'при изменении ингредиентов.'
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+class TestImportCommand:
+
+    @pytest.fixture
+    def csv_file(self, tmp_path):
+        path = tmp_path / 'ingredients.csv'
+        path.write_text(
+            'name,measurement_unit\n'
+            'сахар,г\n'
+            'соль,г\n'
+            'сахар,г\n'
+            'молоко,мл\n',
+            encoding='utf-8',
+        )
+        return str(path)
+
+    def imported(self):
+        return set(
+            Ingredient.objects.values_list('name', 'measurement_unit')
+        )
+
+    def test_import_csv(self, csv_file):
+        call_command('import', csv_file, '--batch-size', '2')
+        assert self.imported() == {
+            ('сахар', 'г'), ('соль', 'г'), ('молоко', 'мл'),
+        }, (
+            'Импорт должен пропускать заголовок и дубли в файле.'
+        )
+        call_command('import', csv_file)
+        assert Ingredient.objects.count() == 3, (
+            'Повторный импорт не должен создавать дубли.'
+        )
+
+    def test_import_json(self, tmp_path):
+        path = tmp_path / 'ingredients.json'
+        path.write_text(
+            '[{"name": "сахар", "measurement_unit": "г"},\n'
+            ' {"name": "соль", "measurement_unit": "г"}]',
+            encoding='utf-8',
+        )
+        call_command('import', str(path))
+        assert self.imported() == {('сахар', 'г'), ('соль', 'г')}
+        lines = tmp_path / 'ingredients.jsonl'
+        lines.write_text(
+            '{"name": "соль", "measurement_unit": "г"}\n'
+            '["молоко", "мл"]\n',
+            encoding='utf-8',
+        )
+        call_command('import', str(lines))
+        assert ('молоко', 'мл') in self.imported()
+        assert Ingredient.objects.count() == 3
+
+    def test_dry_run(self, csv_file):
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+        out = StringIO()
+        call_command('import', csv_file, '--dry-run', stdout=out)
+        assert Ingredient.objects.count() == 1, (
+            '--dry-run не должен менять БД.'
+        )
+        assert '+ Ингредиент: сахар, г' in out.getvalue()
+        assert '+ Ингредиент: соль, г' not in out.getvalue()
+
+    def test_invalid_file(self, tmp_path):
+        path = tmp_path / 'ingredients.csv'
+        path.write_text('сахар\n', encoding='utf-8')
+        with pytest.raises(CommandError):
+            call_command('import', str(path))
+        with pytest.raises(CommandError):
+            call_command('import', str(tmp_path / 'missing.csv'))
+
+    def test_invalid_json_values(self, tmp_path):
+        path = tmp_path / 'ingredients.jsonl'
+        path.write_text(
+            '{"name": "соль", "measurement_unit": "г"}\n'
+            '{"name": 5, "measurement_unit": "г"}\n',
+            encoding='utf-8',
+        )
+        with pytest.raises(CommandError, match='строка 2'):
+            call_command('import', str(path), '--batch-size', '1')
+        assert self.imported() == {('соль', 'г')}, (
+            'Импорт должен фиксировать каждую пачку отдельно, '
+            'а не держать одну транзакцию на весь файл.'
+        )
@@ -0,0 +1,87 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+
+from api.metrics import record, report
+
+
+@pytest.mark.django_db(transaction=True)
+class TestRequestMetrics:
+    recipes_url = reverse('recipes-list')
+    endpoint = 'GET recipes-list'
+
+    @pytest.fixture(autouse=True)
+    def enable_metrics(self, settings):
+        settings.REQUEST_METRICS_ENABLED = True
+
+    def test_server_timing_header(self, client, recipes):
+        response = client.get(self.recipes_url)
+        assert response.status_code == HTTPStatus.OK
+        timings = {
+            timing.split(';')[0]
+            for timing in response['Server-Timing'].split(', ')
+        }
+        assert timings == {'db', 'encode', 'total'}, (
+            'Убедитесь, что в заголовке Server-Timing есть время в БД, '
+            'время кодирования ответа и общее время.'
+        )
+
+    def test_disabled(self, client, settings, recipes):
+        settings.REQUEST_METRICS_ENABLED = False
+        response = client.get(self.recipes_url)
+        assert 'Server-Timing' not in response
+        assert report() == {}, (
+            'Убедитесь, что при выключенной REQUEST_METRICS_ENABLED '
+            'метрики не собираются.'
+        )
+
+    def test_report(self, client, recipes):
+        for _ in range(3):
+            client.get(self.recipes_url)
+        metrics = report()[self.endpoint]
+        assert metrics['queries']['count'] == 3, (
+            'Убедитесь, что в отчет попадает каждый запрос к эндпоинту.'
+        )
+        assert sum(metrics['queries']['buckets'].values()) == 3
+        assert metrics['size_bytes']['avg'] > 0
+
+    def test_command(self, client, recipes):
+        client.get(self.recipes_url)
+        output = StringIO()
+        call_command('request_metrics', stdout=output)
+        assert self.endpoint in output.getvalue(), (
+            'Убедитесь, что команда request_metrics выводит эндпоинты.'
+        )
+        output = StringIO()
+        call_command('request_metrics', '--json', '--reset', stdout=output)
+        assert self.endpoint in json.loads(output.getvalue())
+        assert report() == {}, (
+            'Убедитесь, что request_metrics --reset очищает метрики.'
+        )
+
+    def test_concurrent_registration(self):
+        endpoints = [f'GET endpoint-{number}' for number in range(20)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(
+                lambda endpoint: record(endpoint, {'queries': 1}),
+                endpoints,
+            ))
+        assert sorted(report()) == sorted(endpoints), (
+            'Убедитесь, что эндпоинты, зарегистрированные '
+            'одновременно, не теряются.'
+        )
+
+    @pytest.mark.query_budget({'GET recipes-list': 6, 'GET recipes-detail': 5})
+    def test_query_budget_marker(self, client, recipes):
+        """
+        Маркер query_budget включает метрики и принимает бюджеты
+        отдельных эндпоинтов.
+        """
+        client.get(self.recipes_url)
+        client.get(reverse('recipes-detail', args=[recipes[0].id]))
+        assert set(report()) == {'GET recipes-list', 'GET recipes-detail'}
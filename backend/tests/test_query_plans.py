@@ -0,0 +1,56 @@
+import pytest
+from django.urls import reverse
+
+from recipe.models import FavoriteRecipe, ShoppingCart
+from tests.check_query_plans import check_no_seq_scans
+from users.models import Follow
+
+
+@pytest.mark.django_db(transaction=True)
+class TestQueryPlans:
+    recipes_url = reverse('recipes-list')
+
+    @pytest.fixture
+    def activity(self, user, recipes):
+        for recipe in recipes[:2]:
+            Follow.objects.create(user=user, author=recipe.author)
+            FavoriteRecipe.objects.create(user=user, recipe=recipe)
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+        return recipes
+
+    @pytest.mark.parametrize('params', (
+        {},
+        {'is_favorited': 1},
+        {'is_in_shopping_cart': 1},
+        {'tags': 'testTag1'},
+        {'ordering': 'popular'},
+        {'pagination': 'cursor'},
+    ))
+    def test_recipes_list(self, user_client, activity, params):
+        check_no_seq_scans(user_client, self.recipes_url, params)
+
+    def test_recipes_list_by_author(self, user_client, activity):
+        check_no_seq_scans(
+            user_client,
+            self.recipes_url,
+            {'author': activity[0].author_id},
+        )
+
+    def test_recipe_detail(self, user_client, activity):
+        check_no_seq_scans(
+            user_client,
+            reverse('recipes-detail', args=[activity[0].id]),
+        )
+
+    def test_subscriptions(self, user_client, activity):
+        check_no_seq_scans(
+            user_client,
+            reverse('users-subscriptions'),
+            {'recipes_limit': 2},
+        )
+
+    def test_download_shopping_cart(self, user_client, activity):
+        check_no_seq_scans(
+            user_client,
+            reverse('recipes-download-shopping-cart'),
+        )
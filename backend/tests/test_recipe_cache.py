@@ -0,0 +1,186 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.urls import reverse
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.middleware import QueryRecorder, current_recorder, record_queries
+from api.v1.serializers import RecipeSerializer
+from recipe.images import image_processed
+from recipe.models import FavoriteRecipe, Recipe
+from users.models import Follow
+
+REPLICA = 'replica'
+
+
+def stale_replica(execute, sql, params, many, context):
+    """
+    Реплика, которая еще не получила изменения рецептов:
+    читает их из снимка таблицы.
+    """
+    return execute(
+        sql.replace('"recipe_recipe"', '"stale_recipe_recipe"'),
+        params, many, context,
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+class TestRecipeCache:
+
+    @pytest.fixture
+    def recipe(self, recipes):
+        return recipes[0]
+
+    @pytest.fixture
+    def author_client(self, recipe):
+        client = APIClient()
+        client.force_authenticate(recipe.author)
+        return client
+
+    @staticmethod
+    def detail_url(recipe):
+        return reverse('recipes-detail', args=[recipe.id])
+
+    def get(self, client, url, params=None):
+        """
+        Ответ и кол-во запросов к БД, в том числе из потоков
+        асинхронных представлений.
+        """
+        recorder = QueryRecorder()
+        token = current_recorder.set(recorder)
+        try:
+            with record_queries(recorder):
+                response = client.get(url, params)
+        finally:
+            current_recorder.reset(token)
+        assert response.status_code == HTTPStatus.OK
+        return response.json(), recorder.queries
+
+    def test_cached_detail_matches_serializer(
+            self,
+            user,
+            user_client,
+            recipe,
+    ):
+        FavoriteRecipe.objects.create(user=user, recipe=recipe)
+        Follow.objects.create(user=user, author=recipe.author)
+        url = self.detail_url(recipe)
+        request = APIRequestFactory().get(url)
+        expected = RecipeSerializer(
+            Recipe.objects.annotate_user_fields(user.id).get(pk=recipe.id),
+            context={'request': request},
+        ).data
+        cold, cold_queries = self.get(user_client, url)
+        warm, warm_queries = self.get(user_client, url)
+        assert cold == warm == expected, (
+            'Убедитесь, что рецепт из кеша совпадает '
+            'с представлением RecipeSerializer.'
+        )
+        assert warm_queries < cold_queries, (
+            'Убедитесь, что закешированный рецепт не собирается из БД.'
+        )
+
+    def test_user_fields_are_not_shared(
+            self,
+            user,
+            user_client,
+            client,
+            recipe,
+    ):
+        url = self.detail_url(recipe)
+        anonymous, _ = self.get(client, url)
+        FavoriteRecipe.objects.create(user=user, recipe=recipe)
+        data, _ = self.get(user_client, url)
+        assert data['is_favorited'] is True
+        assert data['favorites_count'] == 1, (
+            'Убедитесь, что счетчики берутся не из кеша.'
+        )
+        assert 'is_favorited' not in anonymous
+        assert 'is_favorited' not in self.get(client, url)[0], (
+            'Убедитесь, что флаги пользователя не попадают в общий кеш.'
+        )
+
+    def test_list_assembles_from_cache(self, client, recipe):
+        url = reverse('recipes-list')
+        detail, _ = self.get(client, self.detail_url(recipe))
+        cold, cold_queries = self.get(client, url, {'limit': 100})
+        warm, warm_queries = self.get(client, url, {'limit': 100})
+        assert cold == warm
+        assert detail in warm['results'], (
+            'Убедитесь, что список и рецепт используют общий кеш.'
+        )
+        assert warm_queries < cold_queries
+
+    def test_invalidation(self, author_client, recipe, tag_1, tag_2):
+        url = self.detail_url(recipe)
+        self.get(author_client, url)
+        response = author_client.patch(
+            url, {'name': 'Renamed'}, format='json',
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert self.get(author_client, url)[0]['name'] == 'Renamed', (
+            'Убедитесь, что кеш рецепта сбрасывается при изменении рецепта.'
+        )
+        response = author_client.patch(
+            url, {'tags': [tag_1.id, tag_2.id]}, format='json',
+        )
+        assert response.status_code == HTTPStatus.OK, response.json()
+        assert len(self.get(author_client, url)[0]['tags']) == 2, (
+            'Убедитесь, что кеш рецепта сбрасывается при изменении '
+            'только тэгов или ингредиентов.'
+        )
+        tag_1.name = 'Renamed tag'
+        tag_1.save()
+        assert self.get(author_client, url)[0]['tags'][0]['name'] == (
+            'Renamed tag'
+        ), 'Убедитесь, что кеш рецептов сбрасывается при изменении тэгов.'
+        recipe.author.first_name = 'Renamed'
+        recipe.author.save()
+        assert self.get(author_client, url)[0]['author']['first_name'] == (
+            'Renamed'
+        ), 'Убедитесь, что кеш рецептов сбрасывается при изменении автора.'
+        Recipe.objects.filter(pk=recipe.pk).update(
+            image_variants={'card': {'webp': 'card.webp'}},
+        )
+        image_processed.send(sender=Recipe, recipe_id=recipe.pk)
+        assert self.get(author_client, url)[0]['image_variants'] == {
+            'card': {'webp': 'http://testserver/media/card.webp'},
+        }, 'Убедитесь, что кеш сбрасывается после обработки картинки.'
+
+    @pytest.mark.django_db(
+        transaction=True,
+        databases=[DEFAULT_DB_ALIAS, REPLICA],
+    )
+    def test_stale_replica_is_not_cached(
+            self,
+            settings,
+            client,
+            author_client,
+            recipe,
+    ):
+        """
+        Кеш заполняется с основной БД, поэтому отстающая реплика
+        не кеширует старое представление после изменения рецепта.
+        """
+        settings.DATABASE_REPLICAS = [REPLICA]
+        url = self.detail_url(recipe)
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute(
+                'CREATE TABLE stale_recipe_recipe '
+                'AS SELECT * FROM recipe_recipe'
+            )
+        try:
+            response = author_client.patch(
+                url, {'name': 'Renamed'}, format='json',
+            )
+            assert response.status_code == HTTPStatus.OK
+            with connections[REPLICA].execute_wrapper(stale_replica):
+                self.get(client, url)
+            assert self.get(client, url)[0]['name'] == 'Renamed', (
+                'Убедитесь, что кеш рецептов заполняется с основной БД, '
+                'а не с отстающей реплики.'
+            )
+        finally:
+            with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+                cursor.execute('DROP TABLE stale_recipe_recipe')
@@ -0,0 +1,528 @@
+from datetime import timedelta
+from http import HTTPStatus
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from recipe.models import FavoriteRecipe, Ingredient, Recipe, ShoppingCart
+from tests.check_queries_count import check_constant_queries
+from users.models import Follow, User
+
+
+@pytest.mark.django_db(transaction=True)
+class TestRecipesAPI:
+    recipes_url = reverse('recipes-list')
+
+    def test_recipes_list_is_subscribed(self, user, user_client, recipes):
+        """
+        Проверка поля is_subscribed у автора рецепта в списке рецептов.
+        """
+        Follow.objects.create(user=user, author=recipes[0].author)
+        response = user_client.get(self.recipes_url, {'limit': 100})
+        assert response.status_code == HTTPStatus.OK
+        subscriptions = {
+            recipe['author']['id']: recipe['author']['is_subscribed']
+            for recipe in response.json()['results']
+        }
+        assert subscriptions.pop(recipes[0].author.id) is True, (
+            f'Убедитесь, что в ответе на GET-запрос к "{self.recipes_url}" '
+            f'у автора, на которого подписан пользователь, '
+            f'is_subscribed равно True.'
+        )
+        assert not any(subscriptions.values()), (
+            f'Убедитесь, что в ответе на GET-запрос к "{self.recipes_url}" '
+            f'у остальных авторов is_subscribed равно False.'
+        )
+
+    @pytest.mark.query_budget(7)
+    def test_recipes_list_constant_queries(self, user_client, recipes):
+        """
+        Кол-во запросов к БД не зависит от кол-ва рецептов на странице.
+        """
+        check_constant_queries(
+            user_client,
+            self.recipes_url,
+            {'limit': 1},
+            {'limit': 100},
+        )
+
+    @pytest.mark.query_budget(6)
+    def test_recipes_list_constant_queries_anonymous(self, client, recipes):
+        check_constant_queries(
+            client,
+            self.recipes_url,
+            {'limit': 1},
+            {'limit': 100},
+        )
+
+    def test_recipes_cursor_pagination(self, client, recipes):
+        """
+        Курсорная пагинация отдает все рецепты по порядку без повторов,
+        а следующие страницы выбираются без OFFSET и COUNT(*).
+        """
+        expected = [
+            recipe.id for recipe in sorted(
+                recipes,
+                key=lambda recipe: (recipe.pub_date, recipe.id),
+                reverse=True,
+            )
+        ]
+        response = client.get(
+            self.recipes_url, {'pagination': 'cursor', 'limit': 3}
+        )
+        assert response.status_code == HTTPStatus.OK
+        data = response.json()
+        assert data['count'] is None, (
+            'По умолчанию курсорный пагинатор не должен считать count.'
+        )
+        received = [recipe['id'] for recipe in data['results']]
+        while data['next']:
+            with CaptureQueriesContext(connection) as context:
+                data = client.get(data['next']).json()
+            sql = ' '.join(
+                query['sql'].upper() for query in context.captured_queries
+            )
+            assert 'OFFSET' not in sql and 'COUNT(' not in sql, (
+                'Убедитесь, что курсорная пагинация не использует '
+                'OFFSET и COUNT(*).'
+            )
+            received.extend(recipe['id'] for recipe in data['results'])
+        assert received == expected, (
+            'Убедитесь, что курсорная пагинация возвращает рецепты '
+            'в порядке -pub_date, -id без пропусков и повторов.'
+        )
+
+    def test_recipes_cursor_pagination_count(self, client, recipes):
+        response = client.get(
+            self.recipes_url, {'pagination': 'cursor', 'count': 'exact'}
+        )
+        assert response.json()['count'] == len(recipes)
+        response = client.get(
+            self.recipes_url, {'pagination': 'cursor', 'count': 'approximate'}
+        )
+        assert response.json()['count'] is not None
+
+    def test_recipes_popular_ordering(self, user, client, recipes):
+        for recipe, favorites in zip(recipes, (1, 3, 2)):
+            Recipe.objects.filter(pk=recipe.pk).update(
+                favorites_count=favorites
+            )
+        for params in ({}, {'pagination': 'cursor'}):
+            response = client.get(
+                self.recipes_url,
+                {'ordering': 'popular', 'limit': 3, **params},
+            )
+            ids = [recipe['id'] for recipe in response.json()['results']]
+            assert ids == [recipes[1].id, recipes[2].id, recipes[0].id], (
+                'Убедитесь, что ?ordering=popular сортирует рецепты '
+                'по кол-ву добавлений в избранное.'
+            )
+
+    def test_recipes_popular_cursor_pagination_ties(self, client, authors):
+        """
+        Тысячи рецептов с одинаковым счетчиком отдаются курсором
+        целиком и без повторов, следующие страницы - без OFFSET.
+        """
+        Recipe.objects.bulk_create(
+            Recipe(
+                author=authors[number % len(authors)],
+                name=f'Recipe{number}',
+                text='Text',
+                cooking_time=10,
+            )
+            for number in range(1250)
+        )
+        expected = list(
+            Recipe.objects.order_by('-id').values_list('id', flat=True)
+        )
+        data = client.get(self.recipes_url, {
+            'pagination': 'cursor', 'ordering': 'popular', 'limit': 100,
+        }).json()
+        received = [recipe['id'] for recipe in data['results']]
+        while data['next']:
+            with CaptureQueriesContext(connection) as context:
+                data = client.get(data['next']).json()
+            assert not any(
+                'OFFSET' in query['sql'].upper()
+                for query in context.captured_queries
+            ), 'Убедитесь, что курсорная пагинация не использует OFFSET.'
+            received.extend(recipe['id'] for recipe in data['results'])
+            assert len(received) <= len(expected), (
+                'Убедитесь, что курсор не повторяет рецепты '
+                'с одинаковым кол-вом добавлений в избранное.'
+            )
+        assert received == expected, (
+            'Убедитесь, что курсорная пагинация с ?ordering=popular '
+            'возвращает все рецепты с равным счетчиком по -id.'
+        )
+        previous = client.get(data['previous']).json()
+        assert [recipe['id'] for recipe in previous['results']] == (
+            expected[-150:-50]
+        ), 'Убедитесь, что ссылка previous возвращает предыдущую страницу.'
+
+    def test_recipes_trending_ordering(self, user, authors, recipes):
+        old = FavoriteRecipe.objects.create(user=user, recipe=recipes[0])
+        FavoriteRecipe.objects.filter(pk=old.pk).update(
+            created_at=timezone.now() - timedelta(days=3)
+        )
+        FavoriteRecipe.objects.create(user=user, recipe=recipes[1])
+        FavoriteRecipe.objects.create(user=authors[0], recipe=recipes[2])
+        ShoppingCart.objects.create(user=user, recipe=recipes[2])
+        stale = FavoriteRecipe.objects.create(user=user, recipe=recipes[3])
+        FavoriteRecipe.objects.filter(pk=stale.pk).update(
+            created_at=timezone.now() - timedelta(days=30)
+        )
+        call_command('rebuild_trending')
+        response = APIClient().get(
+            self.recipes_url,
+            {'ordering': 'trending', 'limit': 3, 'tags': 'testTag1'},
+        )
+        ids = [recipe['id'] for recipe in response.json()['results']]
+        assert ids == [recipes[2].id, recipes[1].id, recipes[0].id], (
+            'Убедитесь, что ?ordering=trending учитывает свежие добавления '
+            'в избранное и корзину с большим весом и работает с фильтрами.'
+        )
+
+    def test_recipes_tags_filter(self, client, recipes, tag_2):
+        """
+        Рецепт с несколькими запрошенными тэгами отдается один раз,
+        без DISTINCT, а тэги по slug берутся из кеша.
+        """
+        recipes[0].tags.add(tag_2)
+        recipes[1].tags.set([tag_2])
+        params = {'tags': ['testTag1', 'testTag2'], 'limit': 100}
+        client.get(self.recipes_url, params)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(self.recipes_url, params)
+        ids = [recipe['id'] for recipe in response.json()['results']]
+        assert sorted(ids) == sorted(recipe.id for recipe in recipes), (
+            'Убедитесь, что фильтр по нескольким тэгам отдает рецепты '
+            'с любым из них и не дублирует рецепты.'
+        )
+        sql = ' '.join(query['sql'] for query in context.captured_queries)
+        assert 'DISTINCT' not in sql, (
+            'Убедитесь, что фильтр по тэгам не использует DISTINCT.'
+        )
+        assert 'SELECT "recipe_tag"."slug"' not in sql, (
+            'Убедитесь, что тэги по slug берутся из кеша.'
+        )
+        response = client.get(self.recipes_url, {'tags': 'testTag2'})
+        assert sorted(
+            recipe['id'] for recipe in response.json()['results']
+        ) == sorted([recipes[0].id, recipes[1].id])
+        response = client.get(self.recipes_url, {'tags': 'unknown'})
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+
+
+@pytest.mark.django_db(transaction=True)
+class TestCounters:
+
+    def refresh(self, *objects):
+        for obj in objects:
+            obj.refresh_from_db()
+
+    def test_recipe_counters(self, user, user_client, recipes):
+        recipe = recipes[0]
+        user_client.post(reverse('recipes-favorite', args=[recipe.id]))
+        user_client.post(reverse('recipes-shopping-cart', args=[recipe.id]))
+        self.refresh(recipe)
+        assert (recipe.favorites_count, recipe.in_carts_count) == (1, 1), (
+            'Убедитесь, что счетчики рецепта увеличиваются при '
+            'добавлении в избранное и корзину.'
+        )
+        response = user_client.get(reverse('recipes-detail', args=[recipe.id]))
+        assert response.json()['favorites_count'] == 1
+        FavoriteRecipe.objects.filter(recipe=recipe).delete()
+        user.delete()
+        self.refresh(recipe)
+        assert (recipe.favorites_count, recipe.in_carts_count) == (0, 0), (
+            'Убедитесь, что счетчики рецепта уменьшаются при удалении, '
+            'в том числе каскадном.'
+        )
+
+    def test_user_counters(self, user, recipes):
+        author = recipes[0].author
+        self.refresh(author)
+        assert author.recipes_count == 1
+        Follow.objects.create(user=user, author=author)
+        self.refresh(author)
+        assert author.followers_count == 1
+        author.first_name = 'Changed'
+        author.save()
+        self.refresh(author)
+        assert author.followers_count == 1, (
+            'Сохранение пользователя не должно затирать счетчики.'
+        )
+        Recipe.objects.filter(author=author).delete()
+        user.delete()
+        self.refresh(author)
+        assert (author.recipes_count, author.followers_count) == (0, 0)
+
+    def test_rebuild_counters_command(self, user, recipes):
+        FavoriteRecipe.objects.create(user=user, recipe=recipes[0])
+        call_command('rebuild_counters', '--verify')
+        Recipe.objects.update(favorites_count=5)
+        User.objects.filter(pk=recipes[0].author_id).update(recipes_count=0)
+        with pytest.raises(CommandError):
+            call_command('rebuild_counters', '--verify')
+        call_command('rebuild_counters')
+        call_command('rebuild_counters', '--verify')
+        self.refresh(recipes[0], recipes[1])
+        assert recipes[0].favorites_count == 1
+        assert recipes[1].favorites_count == 0
+
+
+@pytest.mark.django_db(transaction=True)
+class TestRecipeUpdate:
+
+    @pytest.fixture
+    def recipe(self, recipes):
+        return recipes[0]
+
+    @pytest.fixture
+    def author_client(self, recipe):
+        client = APIClient()
+        client.force_authenticate(recipe.author)
+        return client
+
+    def payload(self, recipe, **changes):
+        payload = {
+            'ingredients': [
+                {'id': item.ingredient_id, 'amount': item.amount}
+                for item in recipe.recipe_ingredient.all()
+            ],
+            'tags': list(recipe.tags.values_list('id', flat=True)),
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+        }
+        payload.update(changes)
+        return payload
+
+    def writes(self, client, recipe, payload):
+        """
+        Выполняет PATCH и возвращает выполненные INSERT, UPDATE и DELETE.
+        """
+        with CaptureQueriesContext(connection) as context:
+            response = client.patch(
+                reverse('recipes-detail', args=[recipe.id]),
+                payload,
+                format='json',
+            )
+        assert response.status_code == HTTPStatus.OK, response.json()
+        return [
+            query['sql'] for query in context.captured_queries
+            if query['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')
+        ]
+
+    def test_noop_patch_writes_nothing(self, author_client, recipe):
+        writes = self.writes(author_client, recipe, self.payload(recipe))
+        assert writes == [], (
+            f'Убедитесь, что PATCH без изменений не пишет в БД: {writes}'
+        )
+
+    def test_patch_writes_only_diff(
+            self,
+            author_client,
+            recipe,
+            ingredient_1,
+            ingredient_2,
+            tag_1,
+            tag_2,
+    ):
+        writes = self.writes(author_client, recipe, self.payload(
+            recipe,
+            ingredients=[
+                {'id': ingredient_1.id, 'amount': 10},
+                {'id': ingredient_2.id, 'amount': 25},
+            ],
+            tags=[tag_1.id, tag_2.id],
+            cooking_time=recipe.cooking_time + 1,
+        ))
+        assert len(writes) == 3, (
+            f'Убедитесь, что PATCH изменяет только измененное количество, '
+            f'добавляет новый тэг и сохраняет измененное поле: {writes}'
+        )
+        recipe.refresh_from_db()
+        assert recipe.cooking_time == 11
+        assert set(recipe.tags.all()) == {tag_1, tag_2}
+        assert dict(recipe.recipe_ingredient.values_list(
+            'ingredient_id', 'amount'
+        )) == {ingredient_1.id: 10, ingredient_2.id: 25}
+
+    def test_patch_replaces_ingredients(
+            self,
+            author_client,
+            recipe,
+            ingredient_1,
+            tag_2,
+    ):
+        response = author_client.patch(
+            reverse('recipes-detail', args=[recipe.id]),
+            self.payload(
+                recipe,
+                ingredients=[{'id': ingredient_1.id, 'amount': 3}],
+                tags=[tag_2.id],
+            ),
+            format='json',
+        )
+        assert response.status_code == HTTPStatus.OK
+        assert [
+            (item['id'], item['amount'])
+            for item in response.json()['ingredients']
+        ] == [(ingredient_1.id, 3)]
+        assert [tag['id'] for tag in response.json()['tags']] == [tag_2.id]
+
+
+@pytest.mark.django_db(transaction=True)
+class TestRecipeCreate:
+    recipes_url = reverse('recipes-list')
+    image = (
+        'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAf'
+        'FcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=='
+    )
+
+    @pytest.fixture(autouse=True)
+    def media_root(self, settings, tmp_path):
+        settings.MEDIA_ROOT = tmp_path
+
+    @pytest.fixture
+    def many_ingredients(self):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ingredient{number}', measurement_unit='г')
+            for number in range(40)
+        )
+        return list(Ingredient.objects.all())
+
+    def payload(self, ingredient_ids, tag_ids):
+        return {
+            'ingredients': [
+                {'id': ingredient_id, 'amount': 10}
+                for ingredient_id in ingredient_ids
+            ],
+            'tags': tag_ids,
+            'image': self.image,
+            'name': 'Recipe',
+            'text': 'Text',
+            'cooking_time': 10,
+        }
+
+    def create_queries(self, client, payload):
+        with CaptureQueriesContext(connection) as context:
+            response = client.post(self.recipes_url, payload, format='json')
+        assert response.status_code == HTTPStatus.CREATED, response.json()
+        return len(context.captured_queries)
+
+    def test_create_constant_queries(
+            self,
+            user_client,
+            many_ingredients,
+            tag_1,
+            tag_2,
+    ):
+        ids = [ingredient.id for ingredient in many_ingredients]
+        small = self.create_queries(
+            user_client, self.payload(ids[:1], [tag_1.id])
+        )
+        large = self.create_queries(
+            user_client, self.payload(ids, [tag_1.id, tag_2.id])
+        )
+        assert small == large, (
+            f'Убедитесь, что кол-во запросов при создании рецепта не '
+            f'зависит от кол-ва ингредиентов и тэгов: {small} и {large}.'
+        )
+
+    def test_create_author_recipes_count(
+            self,
+            user_client,
+            ingredient_1,
+            tag_1,
+    ):
+        for count in (1, 2):
+            response = user_client.post(
+                self.recipes_url,
+                self.payload([ingredient_1.id], [tag_1.id]),
+                format='json',
+            )
+            assert response.status_code == HTTPStatus.CREATED
+            assert response.json()['author']['recipes_count'] == count, (
+                'Убедитесь, что в ответе на создание рецепта '
+                'recipes_count автора учитывает новый рецепт.'
+            )
+
+    def test_create_reports_all_missing_ids(self, user_client, ingredient_1):
+        response = user_client.post(
+            self.recipes_url,
+            self.payload([ingredient_1.id, 9001, 9002], [9003, 9004]),
+            format='json',
+        )
+        assert response.status_code == HTTPStatus.BAD_REQUEST
+        errors = response.json()
+        assert '9001, 9002' in errors['ingredients'][0], errors
+        assert '9003, 9004' in errors['tags'][0], errors
+
+
+@pytest.mark.django_db(transaction=True)
+class TestRecipeSearch:
+    recipes_url = reverse('recipes-list')
+
+    @pytest.fixture
+    def named_recipes(self, recipes):
+        texts = (
+            ('Борщ украинский', 'Свекла, капуста и картофель.'),
+            ('Салат винегрет', 'Свекла и огурцы, как для борща.'),
+            ('Омлет', 'Яйца и молоко.'),
+        )
+        for recipe, (name, text) in zip(recipes, texts):
+            recipe.name = name
+            recipe.text = text
+            recipe.save()
+        return recipes
+
+    def search(self, client, **params):
+        response = client.get(self.recipes_url, params)
+        assert response.status_code == HTTPStatus.OK, response.json()
+        return [recipe['id'] for recipe in response.json()['results']]
+
+    def test_search_ranks_name_above_text(self, client, named_recipes):
+        ids = self.search(client, search='БОРЩ')
+        assert ids[0] == named_recipes[0].id, (
+            'Убедитесь, что ?search= ищет без учета регистра и рецепты '
+            'с совпадением в названии выше совпадений в описании.'
+        )
+        assert named_recipes[1].id in ids
+        assert named_recipes[2].id not in ids
+
+    def test_search_with_filters(self, client, named_recipes, tag_2):
+        named_recipes[1].tags.set([tag_2])
+        assert self.search(
+            client, search='свекла', tags='testTag2',
+        ) == [named_recipes[1].id], (
+            'Убедитесь, что поиск работает вместе с фильтром по тэгам.'
+        )
+        assert self.search(
+            client, search='свекла', author=named_recipes[0].author_id,
+        ) == [named_recipes[0].id], (
+            'Убедитесь, что поиск работает вместе с фильтром по автору.'
+        )
+
+    def test_search_follows_recipe_updates(self, named_recipes):
+        recipe = named_recipes[2]
+        client = APIClient()
+        client.force_authenticate(recipe.author)
+        client.patch(
+            reverse('recipes-detail', args=[recipe.id]),
+            {'name': 'Яичница'},
+            format='json',
+        )
+        assert self.search(APIClient(), search='яичница') == [recipe.id], (
+            'Убедитесь, что поисковый вектор обновляется '
+            'при изменении названия рецепта.'
+        )
+        assert self.search(APIClient(), search='омлет') == []
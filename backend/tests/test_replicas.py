@@ -0,0 +1,171 @@
+import time
+from http import HTTPStatus
+
+import pytest
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from api.middleware import PRIMARY_COOKIE, ReplicaRoutingMiddleware
+from api.v1.views import RecipeViewSet
+from foodgram.db_router import ReplicaRouter, replica_reads
+from recipe.models import Recipe
+
+REPLICA = 'replica'
+
+
+@pytest.fixture
+def replicas(settings):
+    settings.DATABASE_REPLICAS = [REPLICA]
+    settings.REPLICA_STICKY_SECONDS = 10
+
+
+def read_database(request, view):
+    """
+    Прогоняет запрос через middleware и возвращает,
+    куда представление читало бы данные, и ответ.
+    """
+    used = []
+
+    def get_response(request):
+        middleware.process_view(request, view, (), {})
+        used.append(ReplicaRouter().db_for_read(Recipe))
+        return HttpResponse()
+
+    middleware = ReplicaRoutingMiddleware(get_response)
+    response = middleware(request)
+    return used[0], response
+
+
+class TestReplicaRouting:
+    factory = RequestFactory()
+    recipes_view = RecipeViewSet.as_view({'get': 'list', 'post': 'create'})
+
+    def test_safe_requests_read_from_replica(self, replicas):
+        database, response = read_database(
+            self.factory.get('/api/recipes/'), self.recipes_view,
+        )
+        assert database == REPLICA, (
+            'Убедитесь, что GET-запросы к рецептам читают с реплики.'
+        )
+        assert PRIMARY_COOKIE not in response.cookies
+        assert not replica_reads.get(), (
+            'Убедитесь, что разрешение читать с реплик '
+            'не переживает запрос.'
+        )
+
+    def test_other_views_read_from_primary(self, replicas):
+        database, _ = read_database(
+            self.factory.get('/admin/recipe/recipe/'),
+            lambda request: HttpResponse(),
+        )
+        assert database == DEFAULT_DB_ALIAS, (
+            'Убедитесь, что представления без replica_reads, '
+            'например админка, читают с основной БД.'
+        )
+
+    def test_writes_stick_to_primary(self, replicas):
+        database, response = read_database(
+            self.factory.post('/api/recipes/'), self.recipes_view,
+        )
+        assert database == DEFAULT_DB_ALIAS
+        cookie = response.cookies[PRIMARY_COOKIE]
+        assert cookie['max-age'] == 10, (
+            'Убедитесь, что после изменяющего запроса '
+            'ставится кука чтения с основной БД.'
+        )
+        request = self.factory.get('/api/recipes/')
+        request.COOKIES[PRIMARY_COOKIE] = cookie.value
+        assert read_database(request, self.recipes_view)[0] == (
+            DEFAULT_DB_ALIAS
+        ), 'Убедитесь, что после изменения пользователь читает свои данные.'
+        request.COOKIES[PRIMARY_COOKIE] = str(int(time.time()) - 1)
+        assert read_database(request, self.recipes_view)[0] == REPLICA
+
+    def test_without_replicas(self):
+        database, response = read_database(
+            self.factory.post('/api/recipes/'), self.recipes_view,
+        )
+        assert database == DEFAULT_DB_ALIAS
+        assert PRIMARY_COOKIE not in response.cookies
+        assert read_database(
+            self.factory.get('/api/recipes/'), self.recipes_view,
+        )[0] == DEFAULT_DB_ALIAS
+
+    @pytest.mark.django_db(
+        transaction=True,
+        databases=[DEFAULT_DB_ALIAS, REPLICA],
+    )
+    def test_locking_transactions_stay_on_primary(self, replicas):
+        token = replica_reads.set(True)
+        try:
+            with transaction.atomic():
+                assert ReplicaRouter().db_for_read(Recipe) == (
+                    DEFAULT_DB_ALIAS
+                ), 'Убедитесь, что чтение в транзакции идет с основной БД.'
+            assert ReplicaRouter().db_for_read(Recipe) == REPLICA
+        finally:
+            replica_reads.reset(token)
+
+    @pytest.mark.django_db(
+        transaction=True,
+        databases=[DEFAULT_DB_ALIAS, REPLICA],
+    )
+    def test_recipes_list_reads_from_replica(self, replicas, client, recipes):
+        with CaptureQueriesContext(connections[REPLICA]) as replica_queries:
+            response = client.get(reverse('recipes-list'))
+        assert response.status_code == HTTPStatus.OK
+        assert len(response.json()['results']) == 6
+        assert replica_queries.captured_queries, (
+            'Убедитесь, что список рецептов читается с реплики.'
+        )
+
+    def test_token_writes_stick_to_primary(self, replicas):
+        """
+        Клиент с токеном без кук тоже читает свои изменения
+        с основной БД, а другие клиенты - с реплики.
+        """
+        read_database(
+            self.factory.post(
+                '/api/recipes/', HTTP_AUTHORIZATION='Token first',
+            ),
+            self.recipes_view,
+        )
+        request = self.factory.get(
+            '/api/recipes/', HTTP_AUTHORIZATION='Token first',
+        )
+        assert read_database(request, self.recipes_view)[0] == (
+            DEFAULT_DB_ALIAS
+        ), (
+            'Убедитесь, что после изменения клиент с токеном '
+            'читает с основной БД и без куки.'
+        )
+        request = self.factory.get(
+            '/api/recipes/', HTTP_AUTHORIZATION='Token second',
+        )
+        assert read_database(request, self.recipes_view)[0] == REPLICA
+
+    @pytest.mark.django_db(
+        transaction=True,
+        databases=[DEFAULT_DB_ALIAS, REPLICA],
+    )
+    def test_reference_caches_filled_from_primary(
+        self, replicas, client, tag_1, ingredient_1,
+    ):
+        """
+        Кеши тэгов и ингредиентов заполняются с основной БД:
+        отстающая реплика не должна попасть в кеш новой версии.
+        """
+        with CaptureQueriesContext(connections[REPLICA]) as replica_queries:
+            for url, params in (
+                (reverse('tags-list'), {}),
+                (reverse('ingredients-list'), {}),
+                (reverse('ingredients-list'), {'name': 'ingr'}),
+            ):
+                assert client.get(url, params).status_code == HTTPStatus.OK
+        assert not replica_queries.captured_queries, (
+            'Убедитесь, что кеши тэгов и ингредиентов '
+            'заполняются с основной БД.'
+        )
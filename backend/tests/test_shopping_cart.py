@@ -0,0 +1,226 @@
+import csv
+import io
+import json
+from http import HTTPStatus
+from types import SimpleNamespace
+
+import pytest
+from django.contrib.admin import site
+from django.db.models import prefetch_related_objects
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.urls import reverse
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.v1.serializers import CreateUpdateRecipeSerializer
+
+from recipe.models import (IngredientQuantity, Recipe, ShoppingCart,
+                           ShoppingListItem)
+
+
+@pytest.mark.django_db(transaction=True)
+class TestDownloadShoppingCartAPI:
+    download_url = reverse('recipes-download-shopping-cart')
+
+    @pytest.fixture
+    def shopping_cart(self, user, recipes):
+        for recipe in recipes[:3]:
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+
+    def download(self, user_client, file_format=None):
+        params = {'format': file_format} if file_format else {}
+        response = user_client.get(self.download_url, params)
+        assert response.status_code == HTTPStatus.OK, (
+            f'Убедитесь, что GET-запрос к "{self.download_url}" '
+            f'с параметрами {params} возвращает статус 200.'
+        )
+        assert response.streaming, (
+            'Убедитесь, что список покупок отдается потоком.'
+        )
+        return b''.join(response.streaming_content)
+
+    def test_download_txt(self, user_client, shopping_cart):
+        content = self.download(user_client).decode('utf-8')
+        assert content == 'Ingredient1: 30unit1\nIngredient2: 60unit2\n', (
+            'Убедитесь, что список покупок в txt содержит '
+            'суммы ингредиентов всех рецептов корзины.'
+        )
+
+    def test_download_csv(self, user_client, shopping_cart):
+        content = self.download(user_client, 'csv').decode('utf-8')
+        rows = list(csv.reader(io.StringIO(content)))
+        assert rows == [
+            ['name', 'amount', 'measurement_unit'],
+            ['Ingredient1', '30', 'unit1'],
+            ['Ingredient2', '60', 'unit2'],
+        ]
+
+    def test_download_json(self, user_client, shopping_cart):
+        content = json.loads(self.download(user_client, 'json'))
+        assert content == [
+            {'name': 'Ingredient1', 'amount': 30, 'measurement_unit': 'unit1'},
+            {'name': 'Ingredient2', 'amount': 60, 'measurement_unit': 'unit2'},
+        ]
+
+    def test_download_pdf(self, user_client, shopping_cart):
+        content = self.download(user_client, 'pdf')
+        assert content.startswith(b'%PDF-'), (
+            'Убедитесь, что список покупок в формате pdf является PDF-файлом.'
+        )
+        assert content.rstrip().endswith(b'%%EOF')
+        xref_position = int(content.rsplit(b'startxref', 1)[1].split()[0])
+        assert content[xref_position:].startswith(b'xref'), (
+            'Убедитесь, что смещение таблицы xref в PDF указано верно.'
+        )
+
+    def test_download_unknown_format(self, user_client, shopping_cart):
+        response = user_client.get(self.download_url, {'format': 'doc'})
+        assert response.status_code == HTTPStatus.NOT_FOUND
+
+
+@pytest.mark.django_db(transaction=True)
+class TestShoppingList:
+
+    @staticmethod
+    def shopping_list(user):
+        return dict(
+            ShoppingListItem.objects.filter(user=user).values_list(
+                'ingredient__name',
+                'total_amount',
+            )
+        )
+
+    def test_add_and_remove_recipe(self, user, user_client, recipes):
+        """
+        Добавление и удаление рецепта из корзины меняет список покупок.
+        """
+        url = reverse('recipes-shopping-cart', kwargs={'pk': recipes[0].id})
+        assert user_client.post(url).status_code == HTTPStatus.CREATED
+        assert self.shopping_list(user) == {
+            'Ingredient1': 10,
+            'Ingredient2': 20,
+        }
+        assert user_client.delete(url).status_code == HTTPStatus.NO_CONTENT
+        assert self.shopping_list(user) == {}
+
+    def test_update_recipe(self, user, user_client, recipes, ingredient_1):
+        """
+        Изменение рецепта исправляет списки покупок
+        всех пользователей, у которых он в корзине.
+        """
+        recipe = recipes[0]
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+        ShoppingCart.objects.create(user=recipes[1].author, recipe=recipe)
+        author_client = APIClient()
+        author_client.force_authenticate(recipe.author)
+        response = author_client.patch(
+            reverse('recipes-detail', kwargs={'pk': recipe.id}),
+            {
+                'ingredients': [{'id': ingredient_1.id, 'amount': 5}],
+                'tags': list(recipe.tags.values_list('id', flat=True)),
+                'name': recipe.name,
+                'text': recipe.text,
+                'cooking_time': recipe.cooking_time,
+            },
+            format='json',
+        )
+        assert response.status_code == HTTPStatus.OK, response.json()
+        for cart_user in (user, recipes[1].author):
+            assert self.shopping_list(cart_user) == {'Ingredient1': 5}, (
+                'Убедитесь, что после изменения рецепта списки покупок '
+                'пользователей пересчитываются.'
+            )
+
+    def test_update_interleaved_with_cart_add(
+            self,
+            user,
+            recipes,
+            ingredient_1,
+            ingredient_2,
+    ):
+        """
+        Изменение рецепта, загруженного до параллельного изменения
+        и добавления в корзину, считает списки покупок по ингредиентам,
+        прочитанным после блокировки рецепта.
+        """
+        recipe, other_user = recipes[0], recipes[1].author
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+        stale = Recipe.objects.get(pk=recipe.pk)
+        prefetch_related_objects([stale], 'recipe_ingredient', 'tags')
+        request = APIRequestFactory().patch('/')
+        request.user = recipe.author
+
+        def update(instance, amount):
+            serializer = CreateUpdateRecipeSerializer(
+                instance,
+                data={'ingredients': [
+                    {'id': ingredient_2.id, 'amount': amount},
+                ]},
+                partial=True,
+                context={'request': request},
+            )
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+
+        update(Recipe.objects.get(pk=recipe.pk), 5)
+        ShoppingCart.objects.create(user=other_user, recipe=recipe)
+        update(stale, 7)
+        for cart_user in (user, other_user):
+            assert self.shopping_list(cart_user) == {'Ingredient2': 7}, (
+                'Убедитесь, что изменение рецепта с устаревшими '
+                'ингредиентами не портит списки покупок.'
+            )
+        call_command('rebuild_shopping_lists', '--verify')
+
+    def test_admin_update_recipe(self, user, recipes, ingredient_2):
+        """
+        Изменение ингредиентов в инлайне админки тоже
+        исправляет списки покупок.
+        """
+        recipe = recipes[0]
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+
+        def save_inline():
+            IngredientQuantity.objects.filter(
+                recipe=recipe, ingredient=ingredient_2,
+            ).update(amount=25)
+            IngredientQuantity.objects.filter(recipe=recipe).exclude(
+                ingredient=ingredient_2,
+            ).delete()
+
+        site._registry[Recipe].save_related(
+            request=None,
+            form=SimpleNamespace(instance=recipe, save_m2m=lambda: None),
+            formsets=[SimpleNamespace(save=save_inline)],
+            change=True,
+        )
+        assert self.shopping_list(user) == {'Ingredient2': 25}, (
+            'Убедитесь, что изменение ингредиентов в админке '
+            'исправляет списки покупок.'
+        )
+        call_command('rebuild_shopping_lists', '--verify')
+
+    def test_delete_recipe(self, user, recipes):
+        """
+        Удаление рецепта убирает его ингредиенты из списка покупок.
+        """
+        ShoppingCart.objects.create(user=user, recipe=recipes[0])
+        ShoppingCart.objects.create(user=user, recipe=recipes[1])
+        recipes[0].delete()
+        assert self.shopping_list(user) == {
+            'Ingredient1': 10,
+            'Ingredient2': 20,
+        }
+
+    def test_rebuild_and_verify_command(self, user, recipes):
+        ShoppingCart.objects.create(user=user, recipe=recipes[0])
+        call_command('rebuild_shopping_lists', '--verify')
+        ShoppingListItem.objects.filter(user=user).update(total_amount=1)
+        with pytest.raises(CommandError):
+            call_command('rebuild_shopping_lists', '--verify')
+        call_command('rebuild_shopping_lists')
+        call_command('rebuild_shopping_lists', '--verify')
+        assert self.shopping_list(user) == {
+            'Ingredient1': 10,
+            'Ingredient2': 20,
+        }
@@ -85,3 +85,58 @@ class TestTagsAPI:
             response_json,
             reverse('tags-detail', kwargs={'pk': tag_1.id})
         )
+
+
+@pytest.mark.django_db(transaction=True)
+class TestTagsCache:
+    tags_urls = reverse('tags-list')
+
+    def test_tags_etag(self, client, tag_1):
+        """
+        Ответ содержит ETag и Last-Modified,
+        условный запрос получает 304.
+        """
+        response = client.get(self.tags_urls)
+        assert 'ETag' in response and 'Last-Modified' in response, (
+            f'Убедитесь, что ответ на GET-запрос к "{self.tags_urls}" '
+            f'содержит заголовки ETag и Last-Modified.'
+        )
+        not_modified = client.get(
+            self.tags_urls,
+            HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        assert not_modified.status_code == HTTPStatus.NOT_MODIFIED
+        assert not not_modified.content
+        not_modified = client.get(
+            self.tags_urls,
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'],
+        )
+        assert not_modified.status_code == HTTPStatus.NOT_MODIFIED
+
+    def test_tags_cache_invalidation(self, client, tag_1):
+        """
+        Изменение тэга сбрасывает закешированный список.
+        """
+        response = client.get(self.tags_urls)
+        tag_1.name = 'Renamed'
+        tag_1.save()
+        changed = client.get(
+            self.tags_urls,
+            HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        assert changed.status_code == HTTPStatus.OK
+        assert changed.json()[0]['name'] == 'Renamed', (
+            f'Убедитесь, что после изменения тэга ответ на GET-запрос '
+            f'к "{self.tags_urls}" содержит актуальные данные.'
+        )
+        assert changed['ETag'] != response['ETag']
+
+    def test_tags_cached_without_queries(
+            self,
+            client,
+            tag_1,
+            django_assert_num_queries,
+    ):
+        client.get(self.tags_urls)
+        with django_assert_num_queries(0):
+            client.get(self.tags_urls)
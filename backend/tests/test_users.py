@@ -0,0 +1,115 @@
+from http import HTTPStatus
+
+import pytest
+from django.urls import reverse
+
+from tests.check_queries_count import check_constant_queries
+from users.models import Follow
+
+
+@pytest.mark.django_db(transaction=True)
+class TestUsersAPI:
+    users_url = reverse('users-list')
+
+    def test_users_list_is_subscribed(self, user, user_client, authors):
+        """
+        Проверка поля is_subscribed в списке пользователей.
+        """
+        Follow.objects.create(user=user, author=authors[0])
+        response = user_client.get(self.users_url, {'limit': 100})
+        assert response.status_code == HTTPStatus.OK
+        subscriptions = {
+            author['id']: author['is_subscribed']
+            for author in response.json()['results']
+        }
+        assert subscriptions.pop(authors[0].id) is True, (
+            f'Убедитесь, что в ответе на GET-запрос к "{self.users_url}" '
+            f'у автора, на которого подписан пользователь, '
+            f'is_subscribed равно True.'
+        )
+        assert not any(subscriptions.values()), (
+            f'Убедитесь, что в ответе на GET-запрос к "{self.users_url}" '
+            f'у остальных пользователей is_subscribed равно False.'
+        )
+
+    @pytest.mark.query_budget(3)
+    def test_users_list_constant_queries(self, user_client, authors):
+        """
+        Кол-во запросов к БД не зависит от кол-ва пользователей на странице.
+        """
+        check_constant_queries(
+            user_client,
+            self.users_url,
+            {'limit': 1},
+            {'limit': 100},
+        )
+
+
+@pytest.mark.django_db(transaction=True)
+class TestSubscriptionsAPI:
+    subscriptions_url = reverse('users-subscriptions')
+
+    def test_subscriptions_recipes_limit(self, user, user_client, recipes):
+        """
+        Проверка recipes_limit и recipes_count в подписках.
+        """
+        author = recipes[0].author
+        Follow.objects.create(user=user, author=author)
+        for number in range(3):
+            author.recipe.create(
+                name=f'Extra{number}',
+                text='Text',
+                cooking_time=5,
+            )
+        response = user_client.get(
+            self.subscriptions_url,
+            {'recipes_limit': 2},
+        )
+        assert response.status_code == HTTPStatus.OK
+        subscription = response.json()['results'][0]
+        assert subscription['recipes_count'] == 4, (
+            f'Убедитесь, что в ответе на GET-запрос к '
+            f'"{self.subscriptions_url}" recipes_count содержит '
+            f'кол-во всех рецептов автора.'
+        )
+        assert len(subscription['recipes']) == 2, (
+            f'Убедитесь, что в ответе на GET-запрос к '
+            f'"{self.subscriptions_url}" кол-во рецептов автора '
+            f'ограничено параметром recipes_limit.'
+        )
+        assert subscription['is_subscribed'] is True
+
+    @pytest.mark.query_budget(4)
+    def test_subscriptions_constant_queries(
+            self,
+            user,
+            user_client,
+            recipes,
+    ):
+        """
+        Кол-во запросов к БД не зависит от кол-ва подписок на странице.
+        """
+        Follow.objects.bulk_create(
+            Follow(user=user, author=recipe.author) for recipe in recipes
+        )
+        check_constant_queries(
+            user_client,
+            self.subscriptions_url,
+            {'limit': 1, 'recipes_limit': 1},
+            {'limit': 100, 'recipes_limit': 1},
+        )
+
+    def test_subscriptions_cursor_pagination(self, user, user_client, authors):
+        for author in authors:
+            Follow.objects.create(user=user, author=author)
+        data = user_client.get(
+            self.subscriptions_url, {'pagination': 'cursor', 'limit': 4}
+        ).json()
+        usernames = [author['username'] for author in data['results']]
+        while data['next']:
+            data = user_client.get(data['next']).json()
+            usernames.extend(author['username'] for author in data['results'])
+        assert usernames == sorted(author.username for author in authors), (
+            f'Убедитесь, что курсорная пагинация "{self.subscriptions_url}" '
+            f'возвращает все подписки по порядку.'
+        )
@@ -1,4 +1,4 @@
-from django.contrib.admin import ModelAdmin, display, register
+from django.contrib.admin import ModelAdmin, register
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
 from .models import Follow, User
@@ -12,8 +12,8 @@ class UserAdmin(BaseUserAdmin):
         'last_name',
         'email',
         'is_staff',
-        'recipe_count',
-        'follow_count',
+        'recipes_count',
+        'followers_count',
     )
     list_filter = (
         'email',
@@ -22,20 +22,6 @@ class UserAdmin(BaseUserAdmin):
     )
     empty_value_display = '-пусто-'
 
-    @display(
-        description='кол-во рецептов',
-        empty_value='-пусто-',
-    )
-    def recipe_count(self, user):
-        return user.recipe.count()
-
-    @display(
-        description='кол-во подписок',
-        empty_value='-пусто-',
-    )
-    def follow_count(self, user):
-        return user.following.count()
-
 
 @register(Follow)
 class FollowAdmin(ModelAdmin):
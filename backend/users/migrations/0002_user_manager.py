@@ -0,0 +1,20 @@
+# Generated by Django 3.2.3 on 2026-10-18 18:03
+
+from django.db import migrations
+import users.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', users.models.CustomUserManager()),
+            ],
+        ),
+    ]
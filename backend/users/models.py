@@ -1,10 +1,31 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
+from django.db.models import Exists, OuterRef
 
 from foodgram import constants
+from foodgram.counters import CounterFieldsMixin
 
 
-class User(AbstractUser):
+class UserQuerySet(models.QuerySet):
+    """
+    Возвращает queryset с аннотацией is_subscribed,
+    показывающей подписан ли пользователь на автора,
+    если пользователь аутентифицирован.
+    Если пользователь анонимен, метод возвращает базовый queryset.
+    """
+    def annotate_is_subscribed(self, user_id):
+        return self.annotate(
+            is_subscribed=Exists(
+                Follow.objects.filter(user=user_id, author=OuterRef('pk'))
+            )
+        ) if user_id else self
+
+
+class CustomUserManager(UserManager.from_queryset(UserQuerySet)):
+    pass
+
+
+class User(CounterFieldsMixin, AbstractUser):
     email = models.EmailField(
         'Email адрес',
         unique=True,
@@ -23,12 +44,24 @@ class User(AbstractUser):
         'Фамилия',
         max_length=constants.USER_NAME_MAX_LENGTH,
     )
+    recipes_count = models.PositiveIntegerField(
+        'Кол-во рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        'Кол-во подписчиков',
+        default=0,
+        editable=False,
+    )
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = (
         'first_name',
         'last_name',
         'username',
     )
+    objects = CustomUserManager()
+    counter_fields = ('recipes_count', 'followers_count')
 
     class Meta:
         ordering = (
@@ -48,14 +81,16 @@ class Follow(models.Model):
         verbose_name='Подписчик',
         related_name='follower',
         on_delete=models.CASCADE,
-        help_text='Подписчик'
+        help_text='Подписчик',
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
         verbose_name='Автор',
         related_name='following',
         on_delete=models.CASCADE,
-        help_text='Автор контента'
+        help_text='Автор контента',
+        db_index=False,
     )
 
     class Meta:
@@ -70,6 +105,12 @@ class Follow(models.Model):
                 check=~models.Q(user=models.F('author')),
             )
         ]
+        indexes = [
+            models.Index(
+                fields=('author', 'user'),
+                name='follow_author_user_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         return (f'Пользователь: {self.user.username},'
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from foodgram.counters import change_counter
+
+from .models import Follow, User
+
+
+@receiver(post_save, sender=Follow)
+def increment_followers_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, 'followers_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def decrement_followers_count(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, 'followers_count', -1)